@@ -0,0 +1,156 @@
+"""
+Batched embedding wrappers
+- BatchedEmbeddings splits document lists into fixed-size batches and sends
+  them to a remote embedding service with bounded concurrency, retrying
+  rate-limited batches with exponential backoff. Used by improved_qabot.py
+  (WatsonX) and by mock_embedding_server.py for offline throughput testing.
+- The benchmark measures local (sentence-transformers) embedding throughput
+  for several model batch sizes (CPU_EMBED_BATCH_SIZE in local_qabot.py).
+
+Usage (batch sizes on the bundled PDFs):
+    python3 batched_embeddings.py --benchmark --batch-sizes 4 8 16 32
+"""
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30.0
+
+
+def is_rate_limit_error(error):
+    """True if `error` looks like an HTTP 429 / rate-limit response"""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status == 429:
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "too many requests" in message
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Wraps another Embeddings object and parallelizes embed_documents.
+
+    Args:
+        base: Embeddings implementation that performs one remote call per embed_documents
+        batch_size: Texts per request
+        max_concurrency: Maximum requests in flight at once
+        max_retries: Retries per batch on rate-limit errors
+        backoff_seconds: Initial backoff, doubled on every retry (with jitter)
+    """
+
+    def __init__(self, base, batch_size=DEFAULT_BATCH_SIZE,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_seconds=DEFAULT_BACKOFF_SECONDS):
+        if batch_size < 1 or max_concurrency < 1:
+            raise ValueError("batch_size and max_concurrency must be at least 1")
+        self.base = base
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.retries = 0  # Total rate-limit retries, for reporting
+
+    def _with_retry(self, func, *args):
+        delay = self.backoff_seconds
+        for attempt in range(self.max_retries + 1):
+            try:
+                return func(*args)
+            except Exception as e:
+                if attempt == self.max_retries or not is_rate_limit_error(e):
+                    raise
+                self.retries += 1
+                time.sleep(delay * (1 + random.random()))
+                delay = min(delay * 2, MAX_BACKOFF_SECONDS)
+
+    def _embed_batch(self, batch):
+        return self._with_retry(self.base.embed_documents, batch)
+
+    def embed_documents(self, texts):
+        """Embed texts in batches, preserving input order"""
+        texts = list(texts)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1 or self.max_concurrency == 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                results = list(pool.map(self._embed_batch, batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def embed_query(self, text):
+        return self._with_retry(self.base.embed_query, text)
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def padding_ratio(lengths, batch_size, call_size):
+    """
+    Real tokens / padded tokens when every call of `call_size` texts is sorted
+    by length and cut into batches of `batch_size`, as encode() does
+    """
+    real = padded = 0
+    for i in range(0, len(lengths), call_size):
+        call = sorted(lengths[i:i + call_size], reverse=True)
+        for j in range(0, len(call), batch_size):
+            batch = call[j:j + batch_size]
+            real += sum(batch)
+            padded += len(batch) * batch[0]
+    return real / padded if padded else 1.0
+
+
+def run_benchmark(batch_sizes, call_size, rounds=2):
+    """Chunks/s of local embedding per model batch size on the bundled PDFs"""
+    import local_qabot
+
+    pages = local_qabot.load_all_pdfs_from_directory(local_qabot.PDF_DIRECTORY)
+    texts = [c.page_content for c in local_qabot.text_splitter_func(pages)]
+    base = local_qabot.get_local_embeddings(device="cpu")
+    base.embed_documents(texts[:8])  # Load weights before timing
+    model = base.client
+    encoded = model.tokenizer(texts, truncation=True, max_length=model.max_seq_length)
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+
+    def measure():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            # Ingestion hands the embedder one call per `call_size` chunks
+            for i in range(0, len(texts), call_size):
+                base.embed_documents(texts[i:i + call_size])
+        return rounds * len(texts) / (time.perf_counter() - start)
+
+    print(f"\nEmbedding {len(texts)} chunks from {local_qabot.PDF_DIRECTORY}, "
+          f"{call_size} chunks per call")
+    print(f"{'batch size':<12} {'chunks/s':>10} {'real/padded tokens':>20}")
+    for batch_size in batch_sizes:
+        base.encode_kwargs["batch_size"] = batch_size
+        print(f"{batch_size:<12} {measure():>10.1f} "
+              f"{padding_ratio(lengths, batch_size, call_size):>20.0%}")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Embedding batching benchmark")
+    parser.add_argument("--benchmark", action="store_true", help="Run the throughput benchmark")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[4, 8, 16, 32])
+    parser.add_argument("--call-size", type=int, default=64,
+                        help="Chunks per embed_documents call (INGEST_BATCH_SIZE)")
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        return
+    run_benchmark(args.batch_sizes, args.call_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Compressed chunk text store for the Medical Guidelines QA Bot
+Chunks overlap (CHUNK_OVERLAP characters) and Chroma keeps every chunk's text
+uncompressed, so the index ends up larger than the PDFs. With this store each
+PDF page's text is stored once, compressed, and the vector store keeps only
+the chunk's vector plus its position on the page (page, start_index,
+text_chars). Text is decompressed only for the top-k hits of a query.
+
+One append-only file per source PDF, one record per page:
+    4 bytes   page number (uint32, little endian)
+    4 bytes   raw text length in bytes (uint32)
+    4 bytes   compressed length (uint32)
+    1 byte    codec (0 = zlib, 1 = zstd)
+    N bytes   compressed UTF-8 page text
+
+The newest record for a page wins, so a re-processed page simply appends; a
+record truncated by a crash is ignored when the file is scanned.
+
+Usage:
+    python3 chunk_store.py stats ./vector_db_local/chunk_text
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:  # Optional: falls back to zlib
+    zstandard = None
+
+RECORD_HEADER = struct.Struct("<IIIB")
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+CODEC_NAMES = {CODEC_ZLIB: "zlib", CODEC_ZSTD: "zstd"}
+DEFAULT_CACHE_PAGES = 64  # Decompressed pages kept in memory
+
+
+def store_filename(source_file):
+    stem = re.sub(r"[^A-Za-z0-9_-]+", "-", os.path.splitext(source_file)[0]).strip("-_")
+    digest = hashlib.sha1(source_file.encode("utf-8")).hexdigest()[:10]
+    return f"{stem[:60]}-{digest}.pages"
+
+
+def is_stored_chunk(doc):
+    """True for chunks whose text lives in the store rather than in Chroma"""
+    return not doc.page_content and "text_chars" in doc.metadata
+
+
+class ChunkTextStore:
+    """Page-addressable compressed text, one file per source PDF"""
+
+    def __init__(self, directory, codec=None, cache_pages=DEFAULT_CACHE_PAGES):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        if codec is None:
+            codec = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+        if codec == CODEC_ZSTD and zstandard is None:
+            raise ValueError("zstd requested but the zstandard package is not installed")
+        self.codec = codec
+        self.cache_pages = cache_pages
+        self.indexes = {}           # source file -> {page: (offset, compressed length, codec)}
+        self.cache = OrderedDict()  # (source file, page) -> text
+        self.lock = threading.RLock()
+
+    def _path(self, source_file):
+        return os.path.join(self.directory, store_filename(source_file))
+
+    # ------------------------------------------------------------------------
+    # Codec
+    # ------------------------------------------------------------------------
+
+    def _compress(self, data):
+        if self.codec == CODEC_ZSTD:
+            return zstandard.ZstdCompressor(level=10).compress(data)
+        return zlib.compress(data, 9)
+
+    @staticmethod
+    def _decompress(data, codec):
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("Chunk store uses zstd; install the zstandard package")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+    # ------------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------------
+
+    def _index(self, source_file):
+        """Page -> record location, scanned from the file on first use"""
+        index = self.indexes.get(source_file)
+        if index is not None:
+            return index
+        index = {}
+        path = self._path(source_file)
+        if os.path.exists(path):
+            size = os.path.getsize(path)
+            with open(path, "rb") as f:
+                offset = 0
+                while offset + RECORD_HEADER.size <= size:
+                    page, _, length, codec = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                    data_offset = offset + RECORD_HEADER.size
+                    if data_offset + length > size:
+                        break  # Truncated last record
+                    index[page] = (data_offset, length, codec)
+                    offset = data_offset + length
+                    f.seek(offset)
+        self.indexes[source_file] = index
+        return index
+
+    # ------------------------------------------------------------------------
+    # Read / write
+    # ------------------------------------------------------------------------
+
+    def put_page(self, source_file, page, text):
+        """Store the text of one page (replacing any earlier version)"""
+        raw = text.encode("utf-8")
+        data = self._compress(raw)
+        with self.lock:
+            index = self._index(source_file)
+            path = self._path(source_file)
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(RECORD_HEADER.pack(page, len(raw), len(data), self.codec))
+                f.write(data)
+            index[page] = (offset + RECORD_HEADER.size, len(data), self.codec)
+            self.cache.pop((source_file, page), None)
+
+    def page_text(self, source_file, page):
+        key = (source_file, page)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            location = self._index(source_file).get(page)
+        if location is None:
+            raise KeyError(f"No stored text for {source_file} page {page}")
+        offset, length, codec = location
+        with open(self._path(source_file), "rb") as f:
+            f.seek(offset)
+            text = self._decompress(f.read(length), codec).decode("utf-8")
+        with self.lock:
+            self.cache[key] = text
+            while len(self.cache) > self.cache_pages:
+                self.cache.popitem(last=False)
+        return text
+
+    def chunk_text(self, metadata):
+        """Text of the chunk described by `metadata` (source_file, page, start_index, text_chars)"""
+        text = self.page_text(metadata["source_file"], int(metadata["page"]))
+        start = int(metadata["start_index"])
+        return text[start:start + int(metadata["text_chars"])]
+
+    def hydrate(self, docs):
+        """Fill in the text of stored chunks (in place); returns `docs`"""
+        for doc in docs:
+            if is_stored_chunk(doc):
+                doc.page_content = self.chunk_text(doc.metadata)
+        return docs
+
+    def remove(self, source_file):
+        with self.lock:
+            path = self._path(source_file)
+            if os.path.exists(path):
+                os.remove(path)
+            self.indexes.pop(source_file, None)
+            for key in [key for key in self.cache if key[0] == source_file]:
+                del self.cache[key]
+
+    def clear(self):
+        with self.lock:
+            for name in os.listdir(self.directory):
+                if name.endswith(".pages"):
+                    os.remove(os.path.join(self.directory, name))
+            self.indexes.clear()
+            self.cache.clear()
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+def scan_stats(directory):
+    """Raw vs. compressed bytes of the newest record of every page"""
+    stats = {"files": 0, "pages": 0, "raw_bytes": 0, "compressed_bytes": 0, "file_bytes": 0}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".pages"):
+            continue
+        path = os.path.join(directory, name)
+        size = os.path.getsize(path)
+        pages = {}
+        with open(path, "rb") as f:
+            offset = 0
+            while offset + RECORD_HEADER.size <= size:
+                page, raw_length, length, _ = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                offset += RECORD_HEADER.size + length
+                if offset > size:
+                    break
+                pages[page] = (raw_length, length)
+                f.seek(offset)
+        stats["files"] += 1
+        stats["pages"] += len(pages)
+        stats["raw_bytes"] += sum(raw for raw, _ in pages.values())
+        stats["compressed_bytes"] += sum(length for _, length in pages.values())
+        stats["file_bytes"] += size
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the compressed chunk text store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    stats_parser = sub.add_parser("stats", help="Show the size of a store")
+    stats_parser.add_argument("directory")
+    args = parser.parse_args()
+
+    stats = scan_stats(args.directory)
+    ratio = stats["compressed_bytes"] / stats["raw_bytes"] if stats["raw_bytes"] else 0.0
+    print(f"Files:      {stats['files']}")
+    print(f"Pages:      {stats['pages']}")
+    print(f"Raw text:   {stats['raw_bytes'] / (1024 * 1024):.2f} MB")
+    print(f"Compressed: {stats['compressed_bytes'] / (1024 * 1024):.2f} MB ({ratio:.0%} of raw)")
+    print(f"On disk:    {stats['file_bytes'] / (1024 * 1024):.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Named collections for the Medical Guidelines QA Bot
+One process can serve several corpora (e.g. vascular, diabetic foot, wound
+care), each with its own PDF directory and index directory. A collection's
+index is loaded the first time a question is asked against it and kept in an
+LRU; when more than `max_loaded` collections are resident, or their estimated
+memory exceeds `memory_cap_mb`, the least recently used ones are unloaded.
+Pinned collections (the default one, which the ingestion UI writes to) are
+never unloaded.
+
+Memory is estimated from the size of a collection's index directory: Chroma
+keeps the HNSW vectors of a loaded collection in memory, and they make up
+most of that directory. Dropping the langchain wrapper alone frees none of
+it (chromadb caches one System per persist path), so an unloaded index is
+handed to the `close` callable once no request is using it anymore.
+"""
+
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def directory_size_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total / (1024 * 1024)
+
+
+class NamedCollection:
+    """A corpus: its directories and, while loaded, its index and chunk text store"""
+
+    def __init__(self, name, pdf_directory, vector_db_directory):
+        self.name = name
+        self.pdf_directory = pdf_directory
+        self.vector_db_directory = vector_db_directory
+        self.vectordb = None
+        self.text_store = None
+        self.memory_mb = 0.0
+        self.lock = threading.Lock()  # Serializes loading
+
+    @property
+    def loaded(self):
+        return self.vectordb is not None
+
+
+class CollectionRegistry:
+    """
+    Lazily loads named collections and keeps at most `max_loaded` of them
+    (and at most `memory_cap_mb` of estimated index memory) resident.
+
+    Args:
+        collections: name -> {"pdf_directory": ..., "vector_db_directory": ...}
+        load: callable(NamedCollection) -> (vectordb, text_store or None)
+        close: callable(vectordb) releasing an unloaded index's memory (None = just drop it)
+        max_loaded: Resident collections allowed at once (None = no limit)
+        memory_cap_mb: Estimated index memory allowed (None = no limit)
+        pinned: Names that are never unloaded
+    """
+
+    def __init__(self, collections, load, close=None, max_loaded=None, memory_cap_mb=None,
+                 pinned=()):
+        self.collections = {
+            name: NamedCollection(name, spec["pdf_directory"], spec["vector_db_directory"])
+            for name, spec in collections.items()
+        }
+        self.load = load
+        self.close = close
+        self.max_loaded = max_loaded
+        self.memory_cap_mb = memory_cap_mb
+        self.pinned = set(pinned)
+        self.resident = OrderedDict()  # name -> NamedCollection, least recently used first
+        self.users = {}     # id(vectordb) -> requests currently using it
+        self.retired = {}   # id(vectordb) -> unloaded index, closed when its last user is done
+        self.lock = threading.Lock()
+        self.stats = {"loads": 0, "evictions": 0}
+
+    def names(self):
+        return list(self.collections)
+
+    def is_loaded(self, name):
+        collection = self.collections.get(name)
+        return collection is not None and collection.loaded
+
+    @contextmanager
+    def use(self, name):
+        """
+        (vectordb, text_store) of collection `name` for the duration of a
+        request, loading it (and evicting others) if needed. An index unloaded
+        while requests use it is only closed once they are done.
+        """
+        collection = self.collections.get(name)
+        if collection is None:
+            raise KeyError(f"Unknown collection '{name}'. Available: {', '.join(self.collections)}")
+        index = self._acquire_resident(collection)
+        if index is None:
+            # The loader runs under the collection's own lock only, never under
+            # self.lock, and must not call back into the registry
+            with collection.lock:
+                index = self._acquire_resident(collection)
+                if index is None:
+                    start = time.perf_counter()
+                    index = self.load(collection)
+                    memory_mb = directory_size_mb(collection.vector_db_directory)
+                    print(f"Loaded collection '{name}' ({memory_mb:.0f} MB) in "
+                          f"{time.perf_counter() - start:.1f}s")
+                    with self.lock:
+                        self.stats["loads"] += 1
+                        to_close = self._make_resident(collection, index, memory_mb, users=1)
+                    self._close_all(to_close)
+        try:
+            yield index
+        finally:
+            self._release(index[0])
+
+    def _acquire_resident(self, collection):
+        """The index of a resident collection, counted as in use; None if not loaded"""
+        with self.lock:
+            if not collection.loaded:
+                return None
+            self.resident.move_to_end(collection.name)
+            index = collection.vectordb, collection.text_store
+            self.users[id(index[0])] = self.users.get(id(index[0]), 0) + 1
+            return index
+
+    def _release(self, vectordb):
+        with self.lock:
+            key = id(vectordb)
+            self.users[key] -= 1
+            if self.users[key] > 0:
+                return
+            del self.users[key]
+            retired = self.retired.pop(key, None)
+        if retired is not None:
+            self._close_all([retired])
+
+    def set_loaded(self, name, vectordb, text_store=None):
+        """Register an index loaded elsewhere (e.g. by initialize_system) as resident"""
+        collection = self.collections[name]
+        memory_mb = directory_size_mb(collection.vector_db_directory)
+        with collection.lock:
+            with self.lock:
+                to_close = self._make_resident(collection, (vectordb, text_store), memory_mb)
+        self._close_all(to_close)
+
+    def _make_resident(self, collection, index, memory_mb, users=0):
+        """Store a loaded index and evict others; returns indexes to close (holds self.lock)"""
+        collection.vectordb, collection.text_store = index
+        collection.memory_mb = memory_mb
+        if users:
+            self.users[id(index[0])] = self.users.get(id(index[0]), 0) + users
+        self.resident[collection.name] = collection
+        self.resident.move_to_end(collection.name)
+        return self._evict(keep=collection.name)
+
+    def _over_limit(self):
+        if self.max_loaded is not None and len(self.resident) > self.max_loaded:
+            return True
+        if self.memory_cap_mb is not None:
+            return sum(c.memory_mb for c in self.resident.values()) > self.memory_cap_mb
+        return False
+
+    def _evict(self, keep):
+        """Unload least recently used collections until within limits (holds self.lock)"""
+        to_close = []
+        for name in list(self.resident):
+            if not self._over_limit():
+                break
+            if name == keep or name in self.pinned:
+                continue
+            to_close += self.unload(name)
+        return to_close
+
+    def unload(self, name):
+        """
+        Drop a collection from the registry (holds self.lock). Returns the
+        indexes that can be closed now; one still in use is closed by its last user.
+        """
+        collection = self.resident.pop(name, None)
+        if collection is None:
+            return []
+        vectordb = collection.vectordb
+        collection.vectordb = None
+        collection.text_store = None
+        self.stats["evictions"] += 1
+        print(f"Unloaded collection '{name}' ({collection.memory_mb:.0f} MB)")
+        if self.users.get(id(vectordb)):
+            self.retired[id(vectordb)] = vectordb
+            return []
+        return [vectordb]
+
+    def _close_all(self, indexes):
+        """Close unloaded indexes outside self.lock (closing stops Chroma's segment threads)"""
+        for vectordb in indexes:
+            if self.close is not None:
+                try:
+                    self.close(vectordb)
+                except Exception as e:
+                    print(f"Error closing an unloaded index: {e}")
+        if indexes:
+            gc.collect()
+
+    def status_text(self):
+        """One line per collection for the UI"""
+        with self.lock:
+            resident = list(self.resident)
+        lines = []
+        for name, collection in self.collections.items():
+            if name in resident:
+                state = f"loaded, ~{collection.memory_mb:.0f} MB"
+            else:
+                state = "not loaded"
+            pin = " (default)" if name in self.pinned else ""
+            lines.append(f"- **{name}**{pin}: {state} - {collection.pdf_directory}")
+        return "\n".join(lines)
@@ -37,6 +37,13 @@ LLM_MAX_TOKENS = 512   # Maximum length of generated answers
 #   - "pritamdeka/S-PubMedBert-MS-MARCO" (medical-specific)
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
+# Models compared by evaluate_retrieval.py
+EMBEDDING_MODEL_OPTIONS = [
+    "sentence-transformers/all-MiniLM-L6-v2",
+    "sentence-transformers/all-mpnet-base-v2",
+    "pritamdeka/S-PubMedBert-MS-MARCO",
+]
+
 # Device for embeddings: "cpu" or "cuda" (if you have GPU)
 EMBEDDING_DEVICE = "cpu"
 
@@ -64,6 +71,10 @@ DEFAULT_NUM_SOURCES = 3
 # Maximum number of sources users can select
 MAX_NUM_SOURCES = 10
 
+# MMR lambdas compared by evaluate_retrieval.py (1.0 = plain similarity search,
+# lower = more diverse). The app's own MMR settings are in local_qabot.py.
+MMR_LAMBDA_OPTIONS = [1.0, 0.7, 0.5]
+
 # ============================================================================
 # UI SETTINGS
 # ============================================================================
@@ -0,0 +1,233 @@
+"""
+Near-duplicate chunk detection for the Medical Guidelines QA Bot
+Uses MinHash signatures + LSH banding to find chunks that are almost identical
+(author lists, disclosures, recommendation text repeated across guideline parts)
+so they are embedded and stored only once.
+"""
+
+import hashlib
+import re
+
+import numpy as np
+
+# ============================================================================
+# SETTINGS
+# ============================================================================
+
+DEFAULT_THRESHOLD = 0.85   # Estimated Jaccard similarity above which chunks are merged
+DEFAULT_NUM_PERM = 128     # Number of MinHash permutations (signature length)
+DEFAULT_BANDS = 16         # LSH bands (rows per band = num_perm / bands)
+SHINGLE_SIZE = 3           # Words per shingle
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r"\w+")
+
+# ============================================================================
+# MINHASH
+# ============================================================================
+
+def _shingle_hashes(text, shingle_size=SHINGLE_SIZE):
+    """Return the set of 32-bit hashes of word shingles in `text`"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < shingle_size:
+        shingles = {" ".join(words)} if words else set()
+    else:
+        shingles = {
+            " ".join(words[i:i + shingle_size])
+            for i in range(len(words) - shingle_size + 1)
+        }
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+         for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+
+
+class MinHasher:
+    """Computes fixed-length MinHash signatures (vectorized over shingles)"""
+
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, seed=1):
+        rng = np.random.RandomState(seed)
+        # a, b < 2**32 and hashes < 2**32, so a * x + b fits in uint64
+        self.a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, text):
+        """Return the MinHash signature of `text` as a uint32 array"""
+        hashes = _shingle_hashes(text)
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        permuted = (np.outer(self.a, hashes) + self.b[:, None]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+# ============================================================================
+# LSH INDEX
+# ============================================================================
+
+class NearDuplicateFilter:
+    """
+    Incremental near-duplicate filter for LangChain Documents.
+
+    Chunks are processed in order: the first occurrence is kept and later
+    near-duplicates are merged into it, recording their file/page in the
+    kept chunk's `duplicate_sources` metadata so provenance is not lost.
+
+    With keep_documents=False only signatures and a key per kept chunk are
+    held (for streaming ingestion); merged provenance is then read back with
+    pop_merged_metadata() after every batch and applied to the already-written
+    chunks.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                 bands=DEFAULT_BANDS, keep_documents=True):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = []
+        self.keep_documents = keep_documents
+        self.kept = []          # Kept Documents (only if keep_documents)
+        self.keys = []          # Caller-supplied key per kept chunk
+        self.labels = []        # "file p.N" per kept chunk
+        self.provenance = {}    # kept index -> list of duplicate labels
+        self.changed = set()    # kept indices whose provenance changed since pop_merged_metadata()
+        self.duplicate_counts = {}
+        self.seen = 0
+        self.seen_chars = 0
+        self.kept_chars = 0
+
+    def _band_keys(self, signature):
+        return [
+            signature[i * self.rows:(i + 1) * self.rows].tobytes()
+            for i in range(self.bands)
+        ]
+
+    def _best_match(self, signature, keys):
+        candidates = set()
+        for band, key in enumerate(keys):
+            candidates.update(self.buckets[band].get(key, ()))
+        best, best_score = None, 0.0
+        for idx in candidates:
+            score = float(np.mean(self.signatures[idx] == signature))
+            if score > best_score:
+                best, best_score = idx, score
+        if best is not None and best_score >= self.threshold:
+            return best
+        return None
+
+    def add(self, doc, key=None):
+        """
+        Offer a chunk to the filter.
+
+        Args:
+            doc: The chunk
+            key: Identifier reported by merged_metadata() (e.g. the chunk's vector store ID)
+
+        Returns:
+            True if the chunk was kept, False if it was merged into an earlier one
+        """
+        self.seen += 1
+        self.seen_chars += len(doc.page_content)
+
+        signature = self.hasher.signature(doc.page_content)
+        band_keys = self._band_keys(signature)
+        match = self._best_match(signature, band_keys)
+
+        if match is not None:
+            self._merge_provenance(match, doc)
+            return False
+
+        idx = len(self.signatures)
+        self.signatures.append(signature)
+        self.keys.append(key)
+        self.labels.append(_source_label(doc))
+        if self.keep_documents:
+            self.kept.append(doc)
+        self.kept_chars += len(doc.page_content)
+        for band, band_key in enumerate(band_keys):
+            self.buckets[band].setdefault(band_key, []).append(idx)
+        return True
+
+    def _merge_provenance(self, idx, duplicate_doc):
+        """Record the duplicate's file/page against kept chunk `idx`"""
+        labels = self.provenance.setdefault(idx, [])
+        label = _source_label(duplicate_doc)
+        if label != self.labels[idx] and label not in labels:
+            labels.append(label)
+        self.duplicate_counts[idx] = self.duplicate_counts.get(idx, 0) + 1
+        self.changed.add(idx)
+        if self.keep_documents:
+            self.kept[idx].metadata.update(self._metadata(idx))
+
+    def _metadata(self, idx):
+        # Chroma metadata values must be scalars, so provenance is a "; "-joined string
+        metadata = {'duplicate_count': self.duplicate_counts[idx]}
+        if self.provenance[idx]:
+            metadata['duplicate_sources'] = "; ".join(self.provenance[idx])
+        return metadata
+
+    def merged_metadata(self):
+        """(key, provenance metadata) for every kept chunk that absorbed duplicates"""
+        return [(self.keys[idx], self._metadata(idx)) for idx in self.provenance]
+
+    def pop_merged_metadata(self):
+        """Like merged_metadata(), but only chunks that absorbed duplicates since the last call"""
+        merged = [(self.keys[idx], self._metadata(idx)) for idx in sorted(self.changed)]
+        self.changed.clear()
+        return merged
+
+    def stats(self):
+        """Return a dict describing how much the pass shrank the index"""
+        kept = len(self.signatures)
+        removed = self.seen - kept
+        return {
+            "input_chunks": self.seen,
+            "kept_chunks": kept,
+            "removed_chunks": removed,
+            "input_chars": self.seen_chars,
+            "kept_chars": self.kept_chars,
+            "chunk_reduction": removed / self.seen if self.seen else 0.0,
+            "char_reduction": (
+                (self.seen_chars - self.kept_chars) / self.seen_chars
+                if self.seen_chars else 0.0
+            ),
+        }
+
+
+def _source_label(doc):
+    source_file = doc.metadata.get('source_file', 'Unknown')
+    page = doc.metadata.get('page', 'Unknown')
+    return f"{source_file} p.{page}"
+
+
+def format_stats(stats):
+    """Human-readable one-line summary of a dedup pass"""
+    return (
+        f"Near-duplicate pass: {stats['input_chunks']} -> {stats['kept_chunks']} chunks "
+        f"({stats['removed_chunks']} merged, {stats['chunk_reduction']:.1%} fewer chunks, "
+        f"{stats['char_reduction']:.1%} less text to embed)"
+    )
+
+
+def deduplicate_chunks(chunks, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                       bands=DEFAULT_BANDS):
+    """
+    Drop near-identical chunks, keeping provenance of all sources.
+
+    Args:
+        chunks: List of LangChain Documents (output of the text splitter)
+        threshold: Estimated Jaccard similarity at or above which chunks are merged
+
+    Returns:
+        (kept_chunks, stats) tuple
+    """
+    dedup_filter = NearDuplicateFilter(threshold=threshold, num_perm=num_perm, bands=bands)
+    for chunk in chunks:
+        dedup_filter.add(chunk)
+    return dedup_filter.kept, dedup_filter.stats()
@@ -0,0 +1,260 @@
+"""
+Retrieval quality-vs-latency evaluation for the Medical Guidelines QA Bot
+Sweeps embedding model, chunk size/overlap, k and MMR lambda over the gold
+question set and reports recall@k, MRR@k, unique pages and characters in the top
+k, index build time, index size and query latency. --parent-child adds the
+app's parent-child chunking (local_qabot.py, parent size>child size) to the sweep.
+
+Runs entirely offline (no Ollama, no network). Embedding models must already
+be in the local HuggingFace cache - run the app once per model to download it.
+
+Usage:
+    python3 evaluate_retrieval.py
+    python3 evaluate_retrieval.py --models sentence-transformers/all-MiniLM-L6-v2 \\
+        --chunk-sizes 500 1000 --overlaps 100 200 --k 1 3 5 --csv results.csv
+    python3 evaluate_retrieval.py --mmr-lambdas 1.0 0.5 --k 3 5
+    python3 evaluate_retrieval.py --chunk-sizes 1000 --overlaps 200 --parent-child --k 3 5
+"""
+
+import os
+
+# Must be set before huggingface_hub / transformers are imported
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import argparse
+import csv
+import json
+import statistics
+import tempfile
+import time
+
+from langchain_chroma import Chroma
+
+import config
+from collection_registry import directory_size_mb
+from dedup import deduplicate_chunks
+from mmr import mmr_search, unique_pages
+from parent_child import parent_documents
+from local_qabot import (
+    DEDUP_ENABLED,
+    CHILD_CHUNK_OVERLAP,
+    CHILD_CHUNK_SIZE,
+    CHILD_FETCH_PER_SOURCE,
+    DEDUP_THRESHOLD,
+    MMR_FETCH_K,
+    PARENT_CHUNK_SIZE,
+    PDF_DIRECTORY,
+    get_local_embeddings,
+    load_all_pdfs_from_directory,
+    text_splitter_func,
+)
+
+GOLD_SET_PATH = "./gold_questions.json"
+
+# ============================================================================
+# GOLD SET AND METRICS
+# ============================================================================
+
+def load_gold_set(path=GOLD_SET_PATH):
+    """Load gold questions as a list of (question, set of (file, page)) tuples"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [
+        (item["question"], {(source_file, int(page)) for source_file, page in item["relevant"]})
+        for item in data["questions"]
+    ]
+
+
+def ranked_locations(docs):
+    """(source_file, page) of each retrieved chunk, in rank order"""
+    return [(d.metadata.get("source_file"), d.metadata.get("page")) for d in docs]
+
+
+def recall_at_k(ranked, relevant, k):
+    """Fraction of the relevant (file, page) locations found in the top k"""
+    return len(relevant.intersection(ranked[:k])) / len(relevant)
+
+
+def reciprocal_rank(ranked, relevant):
+    for rank, location in enumerate(ranked, 1):
+        if location in relevant:
+            return 1.0 / rank
+    return 0.0
+
+# ============================================================================
+# SWEEP
+# ============================================================================
+
+def evaluate_configuration(pages, embeddings, chunk_size, chunk_overlap, k_values, gold,
+                           dedup=DEDUP_ENABLED, mmr_lambdas=(1.0,), parent_child=False):
+    """
+    Build a throwaway index for one configuration and score it. With
+    `parent_child` the app's child chunks are indexed (chunk_size and
+    chunk_overlap are not used) and the top k are the parents of the best
+    child hits.
+
+    Returns:
+        List of result rows (one per k and MMR lambda)
+    """
+    # The splitter mode is passed explicitly: the app's PARENT_CHILD_ENABLED
+    # must not turn the plain chunk-size sweep into child chunks
+    chunks = text_splitter_func(pages, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                parent_child=parent_child)
+    if dedup:
+        chunks, _ = deduplicate_chunks(chunks, threshold=DEDUP_THRESHOLD)
+
+    with tempfile.TemporaryDirectory(prefix="qabot_eval_") as db_dir:
+        start = time.perf_counter()
+        vectordb = Chroma.from_documents(chunks, embeddings, persist_directory=db_dir)
+        build_time = time.perf_counter() - start
+        index_size = directory_size_mb(db_dir)
+
+        rows = []
+        for k in k_values:
+            for mmr_lambda in mmr_lambdas:
+                latencies, recalls, ranks, pages_in_prompt, chars_in_prompt = [], [], [], [], []
+                fetch = k * CHILD_FETCH_PER_SOURCE if parent_child else k
+                for question, relevant in gold:
+                    start = time.perf_counter()
+                    docs = mmr_search(vectordb, embeddings.embed_query(question), fetch,
+                                      fetch_k=MMR_FETCH_K, lambda_mult=mmr_lambda)
+                    if parent_child:
+                        docs = parent_documents(docs, k)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    # Recall and MRR of the same ranking (what this row's retriever returned)
+                    recalls.append(recall_at_k(ranked_locations(docs), relevant, k))
+                    ranks.append(reciprocal_rank(ranked_locations(docs)[:k], relevant))
+                    pages_in_prompt.append(unique_pages(docs))
+                    # Parents carry their length; their text is not read here
+                    chars_in_prompt.append(sum(doc.metadata.get("text_chars", len(doc.page_content))
+                                               for doc in docs))
+                latencies.sort()
+                rows.append({
+                    "chunk_size": (f"{PARENT_CHUNK_SIZE}>{CHILD_CHUNK_SIZE}" if parent_child
+                                   else chunk_size),
+                    "chunk_overlap": CHILD_CHUNK_OVERLAP if parent_child else chunk_overlap,
+                    "k": k,
+                    "mmr_lambda": mmr_lambda,
+                    "chunks": len(chunks),
+                    "recall@k": statistics.mean(recalls),
+                    "unique_pages": statistics.mean(pages_in_prompt),
+                    "context_chars": statistics.mean(chars_in_prompt),
+                    "mrr@k": statistics.mean(ranks),
+                    "build_s": build_time,
+                    "index_mb": index_size,
+                    "query_ms_p50": statistics.median(latencies),
+                    "query_ms_p95": latencies[int(0.95 * (len(latencies) - 1))],
+                })
+        # Release the client before the temp directory is removed
+        del vectordb
+    return rows
+
+
+def run_sweep(models, chunk_sizes, overlaps, k_values, gold, device, mmr_lambdas=(1.0,),
+              parent_child=False):
+    pages = load_all_pdfs_from_directory(PDF_DIRECTORY)
+    if not pages:
+        raise SystemExit(f"No documents found in {PDF_DIRECTORY}")
+
+    results = []
+    for model_name in models:
+        print(f"\nEmbedding model: {model_name}")
+        start = time.perf_counter()
+        embeddings = get_local_embeddings(model_name=model_name, device=device)
+        load_time = time.perf_counter() - start
+        configurations = [(chunk_size, chunk_overlap, False)
+                          for chunk_size in chunk_sizes
+                          for chunk_overlap in overlaps
+                          if chunk_overlap < chunk_size]
+        if parent_child:
+            configurations.append((None, None, True))
+        for chunk_size, chunk_overlap, parents in configurations:
+            if parents:
+                print(f"  parent-child parent={PARENT_CHUNK_SIZE} child={CHILD_CHUNK_SIZE} "
+                      f"overlap={CHILD_CHUNK_OVERLAP} ...")
+            else:
+                print(f"  chunk_size={chunk_size} overlap={chunk_overlap} ...")
+            for row in evaluate_configuration(
+                pages, embeddings, chunk_size, chunk_overlap, k_values, gold,
+                mmr_lambdas=mmr_lambdas, parent_child=parents,
+            ):
+                row = {"model": model_name.split("/")[-1], "model_load_s": load_time, **row}
+                results.append(row)
+    return results
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+COLUMNS = [
+    ("model", "{}"),
+    ("chunk_size", "{}"),
+    ("chunk_overlap", "{}"),
+    ("k", "{}"),
+    ("mmr_lambda", "{:.2f}"),
+    ("chunks", "{}"),
+    ("recall@k", "{:.3f}"),
+    ("unique_pages", "{:.2f}"),
+    ("context_chars", "{:.0f}"),
+    ("mrr@k", "{:.3f}"),
+    ("build_s", "{:.1f}"),
+    ("index_mb", "{:.1f}"),
+    ("query_ms_p50", "{:.1f}"),
+    ("query_ms_p95", "{:.1f}"),
+]
+
+
+def format_table(results):
+    header = [name for name, _ in COLUMNS]
+    lines = [[fmt.format(row[name]) for name, fmt in COLUMNS] for row in results]
+    widths = [max(len(h), *(len(line[i]) for line in lines)) for i, h in enumerate(header)]
+    out = ["  ".join(h.ljust(w) for h, w in zip(header, widths))]
+    out.append("  ".join("-" * w for w in widths))
+    out += ["  ".join(cell.ljust(w) for cell, w in zip(line, widths)) for line in lines]
+    return "\n".join(out)
+
+
+def write_csv(results, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality vs latency")
+    parser.add_argument("--gold", default=GOLD_SET_PATH, help="Gold question set (JSON)")
+    parser.add_argument("--models", nargs="+", default=config.EMBEDDING_MODEL_OPTIONS)
+    parser.add_argument("--chunk-sizes", nargs="+", type=int, default=[500, 1000, 1500])
+    parser.add_argument("--overlaps", nargs="+", type=int, default=[100, 200])
+    parser.add_argument("--k", nargs="+", type=int, default=[1, 3, 5, 10])
+    parser.add_argument("--mmr-lambdas", nargs="+", type=float, default=config.MMR_LAMBDA_OPTIONS,
+                        help="MMR lambdas to compare (1.0 = plain similarity search)")
+    parser.add_argument("--parent-child", action="store_true",
+                        help="Also evaluate parent-child chunks (sizes from local_qabot.py)")
+    parser.add_argument("--device", default=config.EMBEDDING_DEVICE)
+    parser.add_argument("--csv", help="Also write results to this CSV file")
+    args = parser.parse_args()
+
+    gold = load_gold_set(args.gold)
+    print(f"Loaded {len(gold)} gold questions from {args.gold}")
+
+    results = run_sweep(args.models, args.chunk_sizes, args.overlaps, sorted(args.k), gold,
+                        args.device, args.mmr_lambdas,
+                        parent_child=args.parent_child)
+    if not results:
+        raise SystemExit("No configurations evaluated")
+
+    print()
+    print(format_table(results))
+    if args.csv:
+        write_csv(results, args.csv)
+        print(f"\nResults written to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
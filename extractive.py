@@ -0,0 +1,81 @@
+"""
+Extractive answers for the Medical Guidelines QA Bot
+Scores every sentence of the retrieved chunks against the query embedding
+(one batched embedding call + one matrix-vector product) so the most relevant
+guideline sentences can be shown while the LLM is still generating.
+"""
+
+import re
+
+import numpy as np
+
+DEFAULT_NUM_SENTENCES = 3
+MIN_SENTENCE_CHARS = 40   # Skips headings, reference fragments and table debris
+MAX_SENTENCE_CHARS = 400
+
+_HYPHEN_BREAK_RE = re.compile(r"(\w)-\s*\n\s*(\w)")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\"'])")
+
+
+def split_sentences(text):
+    """Split PDF chunk text into sentences, undoing line-break hyphenation"""
+    text = _HYPHEN_BREAK_RE.sub(r"\1\2", text)
+    text = " ".join(text.split())
+    return [s.strip() for s in _SENTENCE_END_RE.split(text) if s.strip()]
+
+
+def candidate_sentences(sources, min_chars=MIN_SENTENCE_CHARS, max_chars=MAX_SENTENCE_CHARS):
+    """All distinct usable sentences from the retrieved chunks, with their chunk"""
+    seen = set()
+    candidates = []
+    for doc in sources:
+        for sentence in split_sentences(doc.page_content):
+            if not (min_chars <= len(sentence) <= max_chars) or sentence in seen:
+                continue
+            seen.add(sentence)
+            candidates.append((sentence, doc))
+    return candidates
+
+
+def top_sentences(query_vector, sources, embeddings, limit=DEFAULT_NUM_SENTENCES):
+    """
+    Rank the sentences of the retrieved chunks by similarity to the query.
+
+    Args:
+        query_vector: Embedding of the query (same model as `embeddings`)
+        sources: Retrieved LangChain Documents
+        embeddings: Embeddings object used to embed the sentences in one batch
+        limit: Number of sentences to return
+
+    Returns:
+        List of (sentence, source document, score), best first
+    """
+    candidates = candidate_sentences(sources)
+    if not candidates:
+        return []
+
+    sentence_vectors = np.asarray(
+        embeddings.embed_documents([sentence for sentence, _ in candidates]), dtype=np.float32
+    )
+    query = np.asarray(query_vector, dtype=np.float32)
+
+    # Cosine similarity for all candidates at once
+    norms = np.linalg.norm(sentence_vectors, axis=1) * np.linalg.norm(query)
+    scores = sentence_vectors @ query / np.maximum(norms, 1e-12)
+
+    limit = min(limit, len(candidates))
+    best = np.argpartition(-scores, limit - 1)[:limit]
+    best = best[np.argsort(-scores[best])]
+    return [(candidates[i][0], candidates[i][1], float(scores[i])) for i in best]
+
+
+def format_key_passages(selected, title="Key passages from the guidelines"):
+    """Markdown list of extracted sentences with page citations"""
+    if not selected:
+        return ""
+    text = f"**{title}:**\n"
+    for sentence, doc, _ in selected:
+        source_file = doc.metadata.get('source_file', 'Unknown')
+        page = doc.metadata.get('page', 'Unknown')
+        text += f"\n- {sentence} _[{source_file}, Page {page}]_\n"
+    return text
@@ -22,6 +22,8 @@ import os
 import glob
 from pathlib import Path
 
+from batched_embeddings import BatchedEmbeddings
+
 # Suppress warnings
 import warnings
 warnings.filterwarnings('ignore')
@@ -35,6 +37,13 @@ PDF_DIRECTORY = "./medical_pdfs"
 # Directory for vector database (persistent storage)
 VECTOR_DB_DIRECTORY = "./vector_db"
 
+# Embedding request settings
+EMBED_BATCH_SIZE = 32        # Chunks per embedding request
+EMBED_MAX_CONCURRENCY = 4    # Embedding requests in flight at once
+EMBED_MAX_RETRIES = 5        # Retries per batch when rate limited (HTTP 429)
+# slate-125m-english-rtrvr-v2 accepts at most 512 tokens; longer inputs are truncated
+EMBED_TRUNCATE_INPUT_TOKENS = 512
+
 # Create directories if they don't exist
 os.makedirs(PDF_DIRECTORY, exist_ok=True)
 os.makedirs(VECTOR_DB_DIRECTORY, exist_ok=True)
@@ -107,10 +116,10 @@ def text_splitter(data):
 # ============================================================================
 
 def watsonx_embedding():
-    """Initialize embedding model"""
+    """Initialize embedding model (batched, concurrent requests with retry)"""
+    # Input text is not echoed back: it only inflates every response
     embed_params = {
-        EmbedTextParamsMetaNames.TRUNCATE_INPUT_TOKENS: 3,
-        EmbedTextParamsMetaNames.RETURN_OPTIONS: {"input_text": True},
+        EmbedTextParamsMetaNames.TRUNCATE_INPUT_TOKENS: EMBED_TRUNCATE_INPUT_TOKENS,
     }
 
     watsonx_embedding_model = WatsonxEmbeddings(
@@ -120,7 +129,12 @@ def watsonx_embedding():
         params=embed_params,
     )
     
-    return watsonx_embedding_model
+    return BatchedEmbeddings(
+        watsonx_embedding_model,
+        batch_size=EMBED_BATCH_SIZE,
+        max_concurrency=EMBED_MAX_CONCURRENCY,
+        max_retries=EMBED_MAX_RETRIES,
+    )
 
 def create_or_load_vector_database(force_recreate=False):
     """
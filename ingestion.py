@@ -0,0 +1,445 @@
+"""
+Streaming ingestion pipeline for the Medical Guidelines QA Bot
+PDF pages are parsed, split, de-duplicated, embedded and written to the
+vector store batch by batch (page -> chunk -> embed batch -> write batch):
+
+- Memory stays bounded: a parser thread feeds a small queue of chunk batches
+  while the main thread embeds and writes, so neither the pages nor the
+  chunks of the whole corpus are ever held at once.
+- Progress is checkpointed after every written batch. An interrupted build
+  resumes where it stopped; chunk IDs are deterministic, so re-processing the
+  last partial page overwrites rather than duplicates.
+- A bad PDF is reported and skipped without losing work already written.
+- With a text store (see chunk_store.py) page text is written there once,
+  compressed, and the vector store only gets vectors and chunk offsets.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+from langchain_community.document_loaders import PyMuPDFLoader
+
+import profiling
+from dedup import NearDuplicateFilter, format_stats
+
+CHECKPOINT_FILENAME = "ingest_checkpoint.json"
+DEFAULT_BATCH_SIZE = 64      # Chunks per embed/write batch
+DEFAULT_QUEUE_BATCHES = 4    # Parsed batches buffered ahead of the embedder
+
+# ============================================================================
+# CHECKPOINT
+# ============================================================================
+
+def file_fingerprint(path):
+    """Cheap change detector for a source file"""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+class IngestCheckpoint:
+    """
+    Records which files (and which pages of the current file) are fully
+    written to the vector store, together with the settings they were built
+    with. Written atomically after every batch.
+    """
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings
+        self.completed_files = {}   # file name -> fingerprint
+        self.partial_file = None    # file currently being ingested
+        self.partial_pages = 0      # pages of partial_file that are fully written
+        self.complete = False
+
+    @classmethod
+    def load(cls, path, settings):
+        """Load a checkpoint; returns None if missing or built with other settings"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("settings") != settings:
+            return None
+        checkpoint = cls(path, settings)
+        checkpoint.completed_files = data.get("completed_files", {})
+        checkpoint.partial_file = data.get("partial_file")
+        checkpoint.partial_pages = data.get("partial_pages", 0)
+        checkpoint.complete = data.get("complete", False)
+        return checkpoint
+
+    @staticmethod
+    def stale(path, settings):
+        """True if a checkpoint exists at `path` but records other settings (or cannot be read)"""
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f).get("settings") != settings
+        except (OSError, ValueError):
+            return True
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "settings": self.settings,
+                "completed_files": self.completed_files,
+                "partial_file": self.partial_file,
+                "partial_pages": self.partial_pages,
+                "complete": self.complete,
+                "updated_at": time.time(),
+            }, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, pdf_file):
+        name = os.path.basename(pdf_file)
+        return self.completed_files.get(name) == file_fingerprint(pdf_file)
+
+    def pages_to_skip(self, pdf_file):
+        return self.partial_pages if os.path.basename(pdf_file) == self.partial_file else 0
+
+# ============================================================================
+# PIPELINE STAGES
+# ============================================================================
+
+def iter_pdf_pages(pdf_file, skip_pages=0):
+    """Yield the pages of one PDF lazily, tagged with their source file"""
+    loader = PyMuPDFLoader(pdf_file)
+    source_file = os.path.basename(pdf_file)
+    for page_number, page in enumerate(loader.lazy_load()):
+        if page_number < skip_pages:
+            continue
+        page.metadata['source_file'] = source_file
+        yield page
+
+
+def chunk_id(chunk, index):
+    """Deterministic ID so a re-processed page overwrites its earlier chunks"""
+    key = f"{chunk.metadata.get('source_file')}|{chunk.metadata.get('page')}|{index}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class _Stopped(Exception):
+    pass
+
+
+def _put(out, item, stop):
+    """Blocking put that gives up once the consumer has stopped"""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+    raise _Stopped
+
+
+def _produce_batches(pdf_files, checkpoint, splitter, dedup_filter, batch_size, out, stop, stats,
+                     text_store=None):
+    """
+    Parser thread: page -> chunks -> batches on the bounded `out` queue.
+
+    Each queue item is (chunks, ids, finished_files, provenance): finished_files
+    lists the files whose every chunk is in this batch or an earlier one, and
+    provenance the (id, metadata) updates for chunks in this batch or an
+    earlier one that absorbed near-duplicates since the previous batch.
+    """
+    batch, ids, finished = [], [], []
+    try:
+        for pdf_file in pdf_files:
+            name = os.path.basename(pdf_file)
+            try:
+                for page in iter_pdf_pages(pdf_file, checkpoint.pages_to_skip(pdf_file)):
+                    if stop.is_set():
+                        raise _Stopped
+                    stats["pages"] += 1
+                    if text_store is not None:
+                        # Stored before its chunks are queued, so every written chunk can be read back
+                        text_store.put_page(name, page.metadata.get('page', 0), page.page_content)
+                    for index, chunk in enumerate(splitter.split_documents([page])):
+                        key = chunk_id(chunk, index)
+                        if dedup_filter is not None and not dedup_filter.add(chunk, key):
+                            continue
+                        if text_store is not None:
+                            chunk.metadata['text_chars'] = len(chunk.page_content)
+                        batch.append(chunk)
+                        ids.append(key)
+                        if len(batch) >= batch_size:
+                            _put(out, (batch, ids, finished, _take_provenance(dedup_filter)), stop)
+                            batch, ids, finished = [], [], []
+            except _Stopped:
+                raise
+            except Exception as e:
+                print(f"Error loading {pdf_file}: {str(e)} - skipping")
+                stats["failed_files"].append(name)
+                continue
+            finished.append(pdf_file)
+        _put(out, (batch, ids, finished, _take_provenance(dedup_filter)), stop)
+        _put(out, None, stop)
+    except _Stopped:
+        pass
+    except BaseException as e:
+        try:
+            _put(out, e, stop)
+        except _Stopped:
+            pass
+
+def _take_provenance(dedup_filter):
+    return dedup_filter.pop_merged_metadata() if dedup_filter is not None else []
+
+# ============================================================================
+# INGESTION
+# ============================================================================
+
+def apply_merged_provenance(vectordb, merged, batch_size=DEFAULT_BATCH_SIZE):
+    """Write duplicate provenance ((id, metadata) pairs) onto chunks already stored"""
+    for i in range(0, len(merged), batch_size):
+        batch = merged[i:i + batch_size]
+        # Chroma merges updated metadata keys into the existing metadata
+        vectordb._collection.update(
+            ids=[key for key, _ in batch],
+            metadatas=[metadata for _, metadata in batch],
+        )
+
+
+def format_progress(stats, elapsed):
+    elapsed = max(elapsed, 1e-6)
+    return (
+        f"[ingest] files {stats['files_done']}/{stats['files_total']} | "
+        f"pages {stats['pages']} | chunks {stats['chunks']} | "
+        f"{stats['pages'] / elapsed:.1f} pages/s, {stats['chunks'] / elapsed:.1f} chunks/s"
+    )
+
+
+def import_pymupdf():
+    """The PyMuPDF module, which is only importable as fitz before 1.24"""
+    try:
+        import pymupdf  # Already required by PyMuPDFLoader
+    except ImportError:
+        import fitz as pymupdf  # PyMuPDF < 1.24
+    return pymupdf
+
+
+def count_pages(pdf_files):
+    """Total page count of `pdf_files` (for progress/ETA); unreadable files count as 0"""
+    pymupdf = import_pymupdf()
+    total = 0
+    for pdf_file in pdf_files:
+        try:
+            with pymupdf.open(pdf_file) as doc:
+                total += doc.page_count
+        except Exception:
+            continue
+    return total
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+
+
+class IngestJob:
+    """
+    A batch of PDFs ingested in the background. The worker feeds ingest_pdfs
+    stats into progress() / end_part(); the UI polls describe().
+    """
+
+    def __init__(self, pdf_files):
+        self.pdf_files = list(pdf_files)
+        self.total_pages = count_pages(self.pdf_files)
+        self.status = "queued"
+        self.error = None
+        self.failed_files = []
+        self.stop = threading.Event()
+        self.done = threading.Event()
+        self.started = None
+        self.finished = None
+        self.lock = threading.Lock()
+        self.completed = {"files_done": 0, "pages": 0, "chunks": 0}  # Finished ingest_pdfs runs
+        self.current = {"files_done": 0, "pages": 0, "chunks": 0}    # Run in progress
+
+    def start(self):
+        self.status = "running"
+        self.started = time.perf_counter()
+
+    def progress(self, stats):
+        """Progress callback for ingest_pdfs"""
+        with self.lock:
+            self.current = {key: stats[key] for key in self.completed}
+
+    def end_part(self, stats):
+        """Fold the final stats of one ingest_pdfs run into the totals"""
+        with self.lock:
+            for key in self.completed:
+                self.completed[key] += stats[key]
+            self.current = dict.fromkeys(self.completed, 0)
+            self.failed_files += stats["failed_files"]
+
+    def finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.finished = time.perf_counter()
+        self.done.set()
+
+    def totals(self):
+        with self.lock:
+            return {key: self.completed[key] + self.current[key] for key in self.completed}
+
+    def describe(self):
+        """Markdown status: files, pages, chunks, elapsed time and ETA"""
+        totals = self.totals()
+        lines = [f"Ingestion job ({len(self.pdf_files)} files): {self.status}"]
+        if self.started is not None:
+            elapsed = (self.finished or time.perf_counter()) - self.started
+            pages = f"{totals['pages']}/{self.total_pages}" if self.total_pages else totals['pages']
+            lines.append(f"Files {totals['files_done']}/{len(self.pdf_files)} | pages {pages} | "
+                         f"chunks {totals['chunks']}")
+            timing = f"Elapsed {format_duration(elapsed)}"
+            if self.status == "running" and totals["pages"] and self.total_pages:
+                remaining = max(self.total_pages - totals["pages"], 0)
+                timing += f" | ETA {format_duration(elapsed / totals['pages'] * remaining)}"
+            lines.append(timing)
+        if self.failed_files:
+            lines.append(f"Skipped unreadable PDFs: {', '.join(self.failed_files)}")
+        if self.error:
+            lines.append(f"Error: {self.error}")
+        return "\n".join(lines)
+
+
+def ingest_pdfs(pdf_files, vectordb, embedding_model, splitter, checkpoint,
+                batch_size=DEFAULT_BATCH_SIZE, queue_batches=DEFAULT_QUEUE_BATCHES,
+                dedup_threshold=None, progress=None, stop=None, text_store=None):
+    """
+    Stream PDFs into `vectordb`, resuming from `checkpoint`.
+
+    Args:
+        pdf_files: PDF paths to ingest (already-completed ones are skipped)
+        vectordb: langchain Chroma instance to write into
+        embedding_model: Embeddings used for the chunks
+        splitter: Text splitter applied page by page
+        checkpoint: IngestCheckpoint, saved after every batch
+        dedup_threshold: If set, drop near-duplicate chunks (see dedup.py)
+        progress: Optional callback(stats dict) called after every batch
+        stop: Optional threading.Event; when set, ingestion stops after the current batch
+        text_store: Optional ChunkTextStore; chunk text is kept there instead of in `vectordb`
+            (the splitter must set add_start_index)
+
+    Returns:
+        Stats dict (files, pages, chunks, elapsed seconds, ...)
+    """
+    pending = [f for f in sorted(pdf_files) if not checkpoint.is_done(f)]
+    stats = {
+        "files_total": len(pdf_files),
+        "files_done": len(pdf_files) - len(pending),
+        "pages": 0,
+        "chunks": 0,
+        "failed_files": [],
+        "current_file": None,
+        "elapsed": 0.0,
+    }
+    if not pending:
+        checkpoint.complete = True
+        checkpoint.save()
+        return stats
+
+    checkpoint.complete = False
+    dedup_filter = None
+    if dedup_threshold:
+        dedup_filter = NearDuplicateFilter(threshold=dedup_threshold, keep_documents=False)
+    batches = queue.Queue(maxsize=queue_batches)
+    stop = stop or threading.Event()
+    halt = threading.Event()  # Tells the parser thread to exit
+    producer = threading.Thread(
+        target=profiling.bind_thread(_produce_batches),
+        args=(pending, checkpoint, splitter, dedup_filter, batch_size, batches, halt, stats,
+              text_store),
+        name="ingest-parser",
+        daemon=True,
+    )
+    producer.start()
+    start = time.perf_counter()
+
+    try:
+        _consume_batches(batches, vectordb, embedding_model, checkpoint, stats, start,
+                         progress, stop, store_text=text_store is None)
+    finally:
+        # Release the parser thread if we stopped early or failed
+        halt.set()
+        producer.join()
+
+    if stats.get("stopped"):
+        return stats
+
+    checkpoint.partial_file = None
+    checkpoint.partial_pages = 0
+    checkpoint.complete = True
+    checkpoint.save()
+
+    stats["elapsed"] = time.perf_counter() - start
+    if dedup_filter is not None:
+        print(format_stats(dedup_filter.stats()))
+        stats["dedup"] = dedup_filter.stats()
+    return stats
+
+
+def _consume_batches(batches, vectordb, embedding_model, checkpoint, stats, start, progress, stop,
+                     store_text=True):
+    """Main loop: embed and write each batch, then checkpoint it"""
+    while True:
+        try:
+            item = batches.get(timeout=0.5)
+        except queue.Empty:
+            if stop.is_set():
+                stats["stopped"] = True
+                return
+            continue
+        if stop.is_set():
+            stats["stopped"] = True
+            return
+        if item is None:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        chunks, ids, finished, provenance = item
+
+        if chunks:
+            vectors = embedding_model.embed_documents([c.page_content for c in chunks])
+            vectordb._collection.upsert(
+                ids=ids,
+                embeddings=vectors,
+                # Empty documents when the text lives in the chunk store
+                documents=[c.page_content if store_text else "" for c in chunks],
+                metadatas=[c.metadata for c in chunks],
+            )
+            stats["chunks"] += len(chunks)
+        if provenance:
+            # Written with the batch, so a resumed build does not lose it
+            apply_merged_provenance(vectordb, provenance)
+
+        for pdf_file in finished:
+            checkpoint.completed_files[os.path.basename(pdf_file)] = file_fingerprint(pdf_file)
+            stats["files_done"] += 1
+        if chunks:
+            # Pages before the last chunk's page are complete; that page may continue
+            last = chunks[-1].metadata
+            if last['source_file'] not in checkpoint.completed_files:
+                checkpoint.partial_file = last['source_file']
+                checkpoint.partial_pages = last.get('page', 0)
+                stats["current_file"] = last['source_file']
+            else:
+                checkpoint.partial_file = None
+                checkpoint.partial_pages = 0
+        checkpoint.save()
+
+        stats["elapsed"] = time.perf_counter() - start
+        print(format_progress(stats, stats["elapsed"]))
+        if progress is not None:
+            progress(dict(stats))
+
@@ -4,26 +4,58 @@ This version runs completely locally without cloud dependencies
 Uses: Ollama for LLM and HuggingFace for embeddings
 """
 
+# CPU thread budgets (see resources.py). On CPU-only machines Ollama and the
+# embedding model compete for the same cores; cap each side so neither
+# oversubscribes the CPU. Only CPU embedding is governed: with
+# EMBEDDING_DEVICE = "cuda" the budgets do not affect the embedding model.
+# Benchmark with: python3 resources.py --benchmark
+EMBEDDING_THREADS_QUERY = 2      # Embedding while no ingestion runs (Ollama may be generating)
+EMBEDDING_THREADS_INGEST = None  # Embedding during ingestion runs; None = all available cores
+EMBEDDING_CPU_AFFINITY = None    # e.g. range(0, 4) pins this process to cores 0-3
+OLLAMA_NUM_THREAD = None         # Ollama generation threads; None lets Ollama decide
+
+# Apply CPU budgets before anything below imports numpy / torch / ONNX Runtime:
+# OpenBLAS, MKL and OpenMP read their thread counts once, at import
+import resources
+resources.pin_process(EMBEDDING_CPU_AFFINITY)
+resources.set_thread_env(EMBEDDING_THREADS_INGEST or resources.available_cpus())
+
 from langchain_ollama import OllamaLLM # New package
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_chroma import Chroma # New package
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_classic.chains import RetrievalQA
 from langchain_core.prompts import PromptTemplate
-
-# Note: RetrievalQA is being replaced by 'create_retrieval_chain', 
-# but updating the imports above will fix your immediate error.
+from langchain_core.callbacks import BaseCallbackHandler
 
 import gradio as gr
 import os
 import glob
+import queue
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 
 # Suppress warnings
 import warnings
 warnings.filterwarnings('ignore')
 
+from query_log import QueryLog, normalize_question
+from extractive import format_key_passages, top_sentences
+from snapshot import SnapshotError, export_snapshot, import_snapshot, pdf_manifest
+from ingestion import CHECKPOINT_FILENAME, IngestCheckpoint, IngestJob, file_fingerprint, ingest_pdfs
+from resources import GovernedEmbeddings
+import profiling
+from sharding import ShardedIndex
+from chunk_store import ChunkTextStore
+from ollama_health import CLOSED, CircuitBreaker, OllamaHealthMonitor
+from prefetch import RetrievalPrefetcher
+from collection_registry import CollectionRegistry
+from query_expansion import MultiQuerySearcher
+from mmr import mmr_search, unique_pages
+from parent_child import ParentChildSplitter, parent_documents
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -33,6 +65,143 @@ VECTOR_DB_DIRECTORY = "./vector_db_local"
 
 # Ollama model to use (make sure it's installed)
 OLLAMA_MODEL = "llama2"  # or "mistral", "llama3", etc.
+OLLAMA_BASE_URL = "http://localhost:11434"
+
+# Health monitor (see ollama_health.py): while Ollama is down, questions fail
+# fast to cached / extractive answers instead of waiting for a timeout
+OLLAMA_HEALTH_INTERVAL = 5        # Seconds between /api/version probes
+OLLAMA_BREAKER_FAILURES = 2       # Consecutive failures before failing fast
+OLLAMA_BREAKER_RESET_SECONDS = 15  # Wait before letting a trial request through
+
+# How long Ollama keeps the model loaded after a request.
+# Use -1 to pin it in memory, or a duration such as "30m" / "24h".
+OLLAMA_KEEP_ALIVE = -1
+
+# Context window. Keep this fixed: a different num_ctx forces Ollama to reload the model.
+OLLAMA_NUM_CTX = 4096
+
+# Maximum answer length in tokens
+OLLAMA_NUM_PREDICT = 512
+
+# Append Ollama's prompt-eval / generation timings to each answer
+SHOW_LLM_TIMINGS = True
+
+# Latency SLO for one answer. Past this the Ollama request is cancelled and
+# the retrieved passages are shown instead.
+GENERATION_TIMEOUT_SECONDS = 60
+
+# Target time for a full answer. `python3 tune_ollama.py --write` picks the
+# model, OLLAMA_NUM_PREDICT and OLLAMA_NUM_CTX that meet it on this machine.
+ANSWER_LATENCY_SLO_SECONDS = 30
+FALLBACK_PASSAGE_CHARS = 600  # Characters shown per passage in the fallback answer
+
+# Extractive answer shown immediately while the LLM generates (see extractive.py)
+INSTANT_ANSWER_ENABLED = True
+INSTANT_ANSWER_SENTENCES = 3
+
+# Speculative retrieval while the question is typed (see prefetch.py)
+PREFETCH_ENABLED = True
+PREFETCH_DEBOUNCE_SECONDS = 0.4  # Pause in typing before retrieving
+PREFETCH_MIN_CHARS = 15
+
+# Multi-query expansion (see query_expansion.py): search a few rephrasings of the
+# question (abbreviations, guideline wording) and fuse the results, instead of
+# raising the number of sources. Variants not done within the budget are skipped.
+QUERY_EXPANSION_ENABLED = False
+QUERY_EXPANSION_MAX_VARIANTS = 3
+QUERY_EXPANSION_BUDGET_SECONDS = 0.5  # Added retrieval latency allowed
+QUERY_EXPANSION_LLM_REWRITE = False   # Also ask Ollama for a rewrite (needs a budget of ~2-3s)
+
+# Maximal marginal relevance (see mmr.py): pick diverse chunks from the
+# MMR_FETCH_K nearest instead of near-duplicate overlapping ones. Lambda 1.0 is
+# plain similarity search, lower values favour diversity; adjustable in the UI.
+MMR_ENABLED = False
+MMR_LAMBDA = 0.7
+MMR_FETCH_K = 20
+
+# Embedding model and device ("cuda" or "cpu")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DEVICE = "cuda"
+# Chunks per model batch on CPU (sentence-transformers' default is 32). encode()
+# already sorts each call by length, so smaller batches mostly cut padding and
+# cache pressure. Measure with: python3 batched_embeddings.py --benchmark
+CPU_EMBED_BATCH_SIZE = 8
+
+# Text splitting
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Parent-child chunks (see parent_child.py): small child chunks are embedded and
+# searched; the prompt gets the parent section of each of the top hits instead.
+# Parent text is read from the chunk text store, so this needs CHUNK_STORE_ENABLED.
+# The setting is recorded in the ingest checkpoint: changing any of these
+# rebuilds the index from the PDFs at the next start (no snapshot import).
+PARENT_CHILD_ENABLED = False
+PARENT_CHUNK_SIZE = 1000
+CHILD_CHUNK_SIZE = 250
+CHILD_CHUNK_OVERLAP = 50
+CHILD_FETCH_PER_SOURCE = 4  # Child hits fetched per requested source (several share a parent)
+
+# Streaming ingestion (see ingestion.py): chunks per embed/write batch and how
+# many parsed batches may wait for the embedder
+INGEST_BATCH_SIZE = 64
+INGEST_QUEUE_BATCHES = 4
+
+# Sharded index (see sharding.py): one collection per guideline PDF, searched
+# concurrently. Adding or updating a PDF then rebuilds only that PDF's shard.
+SHARDED_INDEX = False
+SHARD_DIRECTORY = "./vector_db_shards"
+SHARD_SEARCH_WORKERS = 8
+
+# Compressed chunk text store (see chunk_store.py): page text is kept once,
+# compressed, next to the index; Chroma only holds vectors and chunk offsets
+CHUNK_STORE_ENABLED = True
+
+# Named collections (see collection_registry.py): one PDF directory and index per
+# specialty, chosen per question. The default collection is the one built from
+# PDF_DIRECTORY and managed in the UI; the others are loaded (built if needed) on
+# first use and the least recently used are unloaded beyond these limits.
+DEFAULT_COLLECTION = "vascular"
+COLLECTIONS = {
+    DEFAULT_COLLECTION: {
+        "pdf_directory": PDF_DIRECTORY,
+        "vector_db_directory": SHARD_DIRECTORY if SHARDED_INDEX else VECTOR_DB_DIRECTORY,
+    },
+    # "diabetic_foot": {
+    #     "pdf_directory": "./collections/diabetic_foot/pdfs",
+    #     "vector_db_directory": "./collections/diabetic_foot/vector_db",
+    # },
+}
+COLLECTIONS_MAX_LOADED = 3         # Resident collections, including the default
+COLLECTIONS_MEMORY_CAP_MB = None   # Estimated index memory cap; None = no cap
+
+# Near-duplicate chunk removal before embedding (see dedup.py)
+DEDUP_ENABLED = True
+DEDUP_THRESHOLD = 0.85  # Estimated Jaccard similarity above which chunks are merged
+
+# Single-file index snapshot (see snapshot.py). If no index exists at startup
+# and this file is present, it is loaded instead of re-embedding the PDFs.
+SNAPSHOT_PATH = "./index_snapshot.qabot"
+
+# Query log and answer cache
+QUERY_LOG_PATH = "./logs/query_log.jsonl"
+ANSWER_CACHE_SIZE = 256  # Number of answers kept in memory
+
+# Background prewarm at startup (hot questions from the query log + examples)
+PREWARM_ON_STARTUP = True
+PREWARM_HOT_QUESTIONS = 10  # How many frequent recent questions to replay
+PREWARM_MAX_AGE_DAYS = 7
+
+EXAMPLE_QUESTIONS = [
+    "What are the diagnostic criteria for peripheral artery disease in diabetic patients?",
+    "What is the WIfI classification system and how is it used?",
+    "What are the recommendations for revascularization in diabetic foot ulcers?",
+    "What bedside tests should be performed for PAD diagnosis?",
+    "What are the target HbA1c levels for patients with diabetes and PAD?",
+]
+
+# Query and ingestion embedding thread budgets (environment set at the top)
+resources.governor.configure(EMBEDDING_THREADS_QUERY, EMBEDDING_THREADS_INGEST)
 
 # Create directories
 os.makedirs(PDF_DIRECTORY, exist_ok=True)
@@ -42,13 +211,21 @@ os.makedirs(VECTOR_DB_DIRECTORY, exist_ok=True)
 # LOCAL LLM CONFIGURATION
 # ============================================================================
 
-def get_local_llm():
+def get_local_llm(num_predict=OLLAMA_NUM_PREDICT):
     """Initialize local LLM using Ollama"""
     try:
+        # Every request uses the same load-time options (model, num_ctx, keep_alive)
+        # so Ollama keeps one resident instance and can reuse its prompt cache
         llm = OllamaLLM(
             model=OLLAMA_MODEL,
+            base_url=OLLAMA_BASE_URL,
             temperature=0.5,
-            num_predict=512,  # Max tokens to generate
+            num_predict=num_predict,  # Max tokens to generate
+            num_ctx=OLLAMA_NUM_CTX,
+            num_thread=OLLAMA_NUM_THREAD,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            # Read timeout so a hung server cannot pin the streaming thread forever
+            client_kwargs={"timeout": GENERATION_TIMEOUT_SECONDS},
         )
         return llm
     except Exception as e:
@@ -56,20 +233,115 @@ def get_local_llm():
         print("Make sure Ollama is installed and running: https://ollama.ai")
         raise
 
+class OllamaStatsHandler(BaseCallbackHandler):
+    """Captures Ollama's response stats (load / prompt eval / generation timings)"""
+
+    def __init__(self):
+        self.stats = {}
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                if generation.generation_info:
+                    self.stats = generation.generation_info
+
+    def summary(self):
+        """One-line timing summary, or empty string if Ollama returned no stats"""
+        stats = self.stats
+        if not stats.get("eval_duration"):
+            return ""
+        ns = 1e9
+        load = stats.get("load_duration", 0) / ns
+        prompt_tokens = stats.get("prompt_eval_count", 0)
+        prompt_time = stats.get("prompt_eval_duration", 0) / ns
+        gen_tokens = stats.get("eval_count", 0)
+        gen_time = stats["eval_duration"] / ns
+        return (
+            f"load {load:.2f}s | prompt eval {prompt_tokens} tok in {prompt_time:.2f}s | "
+            f"generation {gen_tokens} tok in {gen_time:.2f}s ({gen_tokens / gen_time:.1f} tok/s)"
+        )
+
+def warm_up_llm():
+    """
+    Load the model and evaluate the shared system prompt once, so the first
+    real question starts from a resident model with the prefix already cached
+    """
+    llm = get_local_llm(num_predict=1)
+    llm.invoke(SYSTEM_PROMPT)
+
+def warm_up_after_recovery():
+    """Health monitor hook: reload the model once Ollama is reachable again"""
+    try:
+        warm_up_llm()
+        print("Ollama is back; model reloaded")
+    except Exception as e:
+        print(f"Ollama is back but warm-up failed: {e}")
+
+# ============================================================================
+# PROMPT
+# ============================================================================
+
+# The system prompt is the byte-identical prefix of every request. Anything that
+# varies (context, question) goes after it so Ollama can reuse the cached prefix.
+SYSTEM_PROMPT = (
+    "You are a medical assistant specialized in vascular surgery and diabetic foot guidelines.\n"
+    "Use the following pieces of context to answer the question at the end.\n"
+    "If you don't know the answer, just say that you don't know, don't try to make up an answer.\n"
+    "Always cite the specific recommendations or guidelines when applicable."
+)
+
+PROMPT_TEMPLATE = SYSTEM_PROMPT + "\n\nContext: {context}\n\nQuestion: {question}\n\nAnswer:"
+
+PROMPT = PromptTemplate(
+    template=PROMPT_TEMPLATE,
+    input_variables=["context", "question"]
+)
+
+# Query expansion's rewrite request starts with the same prefix, so it does not
+# evict the cached system prompt the answer request that follows will reuse
+QUERY_REWRITE_PROMPT = SYSTEM_PROMPT + (
+    "\n\nBefore answering, rewrite the following clinical question using the terminology "
+    "of vascular surgery and diabetic foot guidelines. Reply with the rewritten question "
+    "only, on one line.\n\n"
+    "Question: {question}\n\nRewritten question:"
+)
+
 # ============================================================================
 # LOCAL EMBEDDINGS
 # ============================================================================
 
-def get_local_embeddings():
+def get_local_embeddings(model_name=EMBEDDING_MODEL, device=EMBEDDING_DEVICE):
     """Initialize local embeddings using HuggingFace"""
     # Using a lightweight but effective model
+    encode_kwargs = {'normalize_embeddings': True}
+    if device == "cpu":
+        encode_kwargs['batch_size'] = CPU_EMBED_BATCH_SIZE
     embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cuda'},  # Use 'cuda' if you have GPU
-        encode_kwargs={'normalize_embeddings': True}
+        model_name=model_name,
+        model_kwargs={'device': device},
+        encode_kwargs=encode_kwargs
     )
     return embeddings
 
+shared_embeddings = None
+shared_embeddings_lock = threading.Lock()
+
+def get_shared_embeddings():
+    """The embedding model, loaded once and shared by every collection"""
+    global shared_embeddings
+    with shared_embeddings_lock:
+        if shared_embeddings is None:
+            shared_embeddings = get_local_embeddings()
+        return shared_embeddings
+
+def get_query_embeddings():
+    """Query-time embedder (runs under the governor's current thread budget)"""
+    return GovernedEmbeddings(get_shared_embeddings())
+
+def get_ingest_embeddings(base_embeddings):
+    """Ingestion embedder; the ingest budget applies inside resources.governor.ingesting()"""
+    return GovernedEmbeddings(base_embeddings)
+
 # ============================================================================
 # DOCUMENT PROCESSING
 # ============================================================================
@@ -97,15 +369,26 @@ def load_all_pdfs_from_directory(directory):
     print(f"Loaded {len(all_documents)} pages from {len(pdf_files)} PDF files")
     return all_documents
 
-def text_splitter_func(data):
-    """Split documents into chunks"""
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
+def get_text_splitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+                      parent_child=PARENT_CHILD_ENABLED):
+    """
+    Splitter used for ingestion. With `parent_child` it returns child chunks
+    (PARENT_/CHILD_CHUNK_* sizes) and the chunk size arguments are not used.
+    """
+    if parent_child:
+        return ParentChildSplitter(PARENT_CHUNK_SIZE, CHILD_CHUNK_SIZE, CHILD_CHUNK_OVERLAP)
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
         length_function=len,
-        separators=["\n\n", "\n", ". ", " ", ""]
+        separators=["\n\n", "\n", ". ", " ", ""],
+        add_start_index=True  # Chunk offset on its page, used by the chunk text store
     )
-    chunks = text_splitter.split_documents(data)
+
+def text_splitter_func(data, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+                       parent_child=PARENT_CHILD_ENABLED):
+    """Split documents into chunks"""
+    chunks = get_text_splitter(chunk_size, chunk_overlap, parent_child).split_documents(data)
     return chunks
 
 # ============================================================================
@@ -114,42 +397,389 @@ def text_splitter_func(data):
 
 global_vectordb = None
 
-def create_or_load_vector_database(force_recreate=True):
-    """Create or load persistent vector database"""
-    embedding_model = get_local_embeddings()
+# Chunk text for the active index (single-collection or sharded); None keeps text in Chroma
+chunk_store = ChunkTextStore(
+    os.path.join(SHARD_DIRECTORY if SHARDED_INDEX else VECTOR_DB_DIRECTORY, "chunk_text")
+) if CHUNK_STORE_ENABLED else None
+
+def vector_db_exists(directory=VECTOR_DB_DIRECTORY):
+    """True if `directory` holds a persisted Chroma index"""
+    # The directory itself is always created at import time, so look for the index file
+    return os.path.exists(os.path.join(directory, "chroma.sqlite3"))
+
+def close_vector_database(vectordb):
+    """
+    Stop the chromadb System behind a Chroma store so its HNSW segments are
+    freed; chromadb caches one System per persist directory for the life of the
+    process, so dropping the wrapper alone keeps the index in memory
+    """
+    client = vectordb._client
+    if hasattr(client, "close"):
+        client.close()  # chromadb >= 1.1: releases the System once no client uses it
+        return
+    from chromadb.api.shared_system_client import SharedSystemClient
+    system = SharedSystemClient._identifier_to_system.pop(client._identifier, None)
+    if system is not None:
+        system.stop()
+
+def document_count(vectordb):
+    """Number of chunks in a Chroma store or sharded index"""
+    if isinstance(vectordb, ShardedIndex):
+        return vectordb.count()
+    return vectordb._collection.count()
+
+def export_index_snapshot(vectordb, path=SNAPSHOT_PATH):
+    """Write the vector database to a single snapshot file"""
+    if isinstance(vectordb, ShardedIndex):
+        raise SnapshotError("Snapshots of a sharded index are not supported")
+    if PARENT_CHILD_ENABLED:
+        # A snapshot carries chunk text, not the page text parents are cut from
+        raise SnapshotError("Snapshots of a parent-child index are not supported")
+    return export_snapshot(
+        vectordb,
+        path,
+        embedding_model=EMBEDDING_MODEL,
+        manifest=pdf_manifest(PDF_DIRECTORY),
+        extra={"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP,
+               "ingest_settings": ingest_settings()},
+        text_store=chunk_store,
+    )
+
+def import_index_snapshot(path=SNAPSHOT_PATH, vector_db_directory=VECTOR_DB_DIRECTORY,
+                          pdf_directory=PDF_DIRECTORY, embedding_function=None):
+    """
+    Load a snapshot built from this node's PDFs with this node's settings, and
+    checkpoint the PDFs it covers as ingested
+    Returns:
+        (vectordb, header, names of local PDFs the snapshot does not cover)
+    """
+    if PARENT_CHILD_ENABLED:
+        # A snapshot carries chunk text, not the page text parents are cut from
+        raise SnapshotError("Snapshots cannot provide a parent-child index")
+    checkpoint = IngestCheckpoint(os.path.join(vector_db_directory, CHECKPOINT_FILENAME),
+                                  ingest_settings())
+    # Saved incomplete first: an interrupted import is then finished by
+    # ingestion (same chunk IDs) instead of being loaded as a complete index
+    os.makedirs(vector_db_directory, exist_ok=True)
+    checkpoint.save()
+    vectordb, header, uncovered = import_snapshot(
+        path, vector_db_directory, embedding_function or get_query_embeddings(), EMBEDDING_MODEL,
+        manifest=pdf_manifest(pdf_directory), settings=ingest_settings(),
+    )
+    for pdf_file in glob.glob(os.path.join(pdf_directory, "*.pdf")):
+        name = os.path.basename(pdf_file)
+        if name not in uncovered:
+            checkpoint.completed_files[name] = file_fingerprint(pdf_file)
+    checkpoint.complete = not uncovered
+    checkpoint.save()
+    return vectordb, header, uncovered
+
+def ingest_settings():
+    """Settings an index was built with; an index or checkpoint is only used if they match"""
+    settings = {
+        "embedding_model": EMBEDDING_MODEL,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "dedup_threshold": DEDUP_THRESHOLD if DEDUP_ENABLED else None,
+        "chunk_store": CHUNK_STORE_ENABLED,
+    }
+    if PARENT_CHILD_ENABLED:
+        # Recorded only when on, so indexes built before this setting existed
+        # still match; switching it either way then forces a rebuild
+        settings["parent_child"] = [PARENT_CHUNK_SIZE, CHILD_CHUNK_SIZE, CHILD_CHUNK_OVERLAP]
+    return settings
+
+def create_or_load_vector_database(force_recreate=True, progress=None,
+                                   pdf_directory=PDF_DIRECTORY,
+                                   vector_db_directory=VECTOR_DB_DIRECTORY,
+                                   text_store=chunk_store, snapshot_path=SNAPSHOT_PATH,
+                                   sharded=SHARDED_INDEX):
+    """
+    Create or load persistent vector database
+    Args:
+        force_recreate: If True, rebuild the index from the PDFs from scratch
+        progress: Optional callback receiving ingestion stats after every batch
+        pdf_directory, vector_db_directory, text_store: Where the collection lives
+            (defaults: the default collection)
+        snapshot_path: Snapshot imported when no index exists yet (None = never)
+    """
+    if PARENT_CHILD_ENABLED and not CHUNK_STORE_ENABLED:
+        raise ValueError("PARENT_CHILD_ENABLED needs CHUNK_STORE_ENABLED (parent text is read from it)")
+    if sharded:
+        return create_or_load_sharded_database(force_recreate, progress)
     
-    if os.path.exists(VECTOR_DB_DIRECTORY) and not force_recreate:
-        print("Loading existing vector database...")
+    base_embeddings = get_shared_embeddings()
+    # Same model, separate thread budgets for queries and ingestion
+    embedding_model = get_query_embeddings()
+    checkpoint_path = os.path.join(vector_db_directory, CHECKPOINT_FILENAME)
+    index_exists = vector_db_exists(vector_db_directory)
+    # A parent-child index always has a checkpoint; one without (older build,
+    # imported snapshot) has no parents
+    unchecked_parents = PARENT_CHILD_ENABLED and not os.path.exists(checkpoint_path)
+    if index_exists and not force_recreate \
+            and (IngestCheckpoint.stale(checkpoint_path, ingest_settings()) or unchecked_parents):
+        # Built (or partly built) with another model, chunking or dedup setting:
+        # neither loadable as is nor resumable
+        print(f"Index in {vector_db_directory} was built with other settings; rebuilding...")
+        force_recreate = True
+    checkpoint = None if force_recreate else IngestCheckpoint.load(checkpoint_path, ingest_settings())
+    
+    if index_exists and not force_recreate and (checkpoint is None or checkpoint.complete):
+        print(f"Loading existing vector database from {vector_db_directory}...")
         vectordb = Chroma(
-            persist_directory=VECTOR_DB_DIRECTORY,
+            persist_directory=vector_db_directory,
             embedding_function=embedding_model
         )
         print(f"Loaded vector database with {vectordb._collection.count()} documents")
-    else:
+        return vectordb
+    
+    if not index_exists and snapshot_path and os.path.exists(snapshot_path) and not force_recreate \
+            and not PARENT_CHILD_ENABLED:  # Snapshots do not carry the parents' page text
+        try:
+            print(f"Importing index snapshot {snapshot_path}...")
+            start = time.perf_counter()
+            vectordb, header, uncovered = import_index_snapshot(
+                snapshot_path, vector_db_directory, pdf_directory, embedding_model
+            )
+            print(f"Imported {header['count']} chunks from snapshot "
+                  f"({header['created_at']}) in {time.perf_counter() - start:.1f}s")
+            if not uncovered:
+                return vectordb
+            # The checkpoint lists the covered PDFs; ingestion below adds the rest
+            print(f"Embedding PDFs the snapshot does not cover: {', '.join(uncovered)}")
+            checkpoint = IngestCheckpoint.load(checkpoint_path, ingest_settings())
+        except SnapshotError as e:
+            print(f"Snapshot refused: {e}")
+            print("Rebuilding the index from the PDFs instead")
+    
+    pdf_files = glob.glob(os.path.join(pdf_directory, "*.pdf"))
+    if not pdf_files:
+        raise ValueError(f"No documents found in {pdf_directory}. Please add PDF files.")
+    
+    vectordb = Chroma(
+        persist_directory=vector_db_directory,
+        embedding_function=embedding_model
+    )
+    if checkpoint is None:
         print("Creating new vector database...")
-        documents = load_all_pdfs_from_directory(PDF_DIRECTORY)
-        
-        if not documents:
-            raise ValueError(f"No documents found in {PDF_DIRECTORY}. Please add PDF files.")
-        
-        chunks = text_splitter_func(documents)
-        print(f"Created {len(chunks)} chunks from documents")
-        
-        vectordb = Chroma.from_documents(
-            chunks, 
-            embedding_model,
-            persist_directory=VECTOR_DB_DIRECTORY
+        vectordb.delete_collection()  # Start clean instead of appending to an old index
+        if text_store is not None:
+            text_store.clear()
+        vectordb = Chroma(
+            client=vectordb._client,  # One client per index, so closing it frees the index
+            embedding_function=embedding_model
+        )
+        checkpoint = IngestCheckpoint(checkpoint_path, ingest_settings())
+    else:
+        print(f"Resuming interrupted build ({len(checkpoint.completed_files)} files already done)...")
+    
+    with profiling.profile("ingest"), resources.governor.ingesting():
+        stats = ingest_pdfs(
+            pdf_files,
+            vectordb,
+            get_ingest_embeddings(base_embeddings),
+            get_text_splitter(),
+            checkpoint,
+            batch_size=INGEST_BATCH_SIZE,
+            queue_batches=INGEST_QUEUE_BATCHES,
+            dedup_threshold=DEDUP_THRESHOLD if DEDUP_ENABLED else None,
+            progress=progress,
+            text_store=text_store,
         )
-        print("Vector database created and persisted")
+    if stats["failed_files"]:
+        print(f"Skipped unreadable PDFs: {', '.join(stats['failed_files'])}")
+    print(f"Vector database created and persisted ({vectordb._collection.count()} chunks)")
     
     return vectordb
 
+def ingest_shard(index, pdf_file, ingest_embeddings, force=False, progress=None, stop=None):
+    """
+    Build, resume or skip the shard of one PDF
+    Returns:
+        Ingestion stats, or None if the shard was already up to date
+    """
+    source_file = os.path.basename(pdf_file)
+    checkpoint_path = index.checkpoint_path(source_file)
+    checkpoint = None if force else IngestCheckpoint.load(checkpoint_path, ingest_settings())
+    
+    if checkpoint is not None and checkpoint.complete and checkpoint.is_done(pdf_file) \
+            and source_file in index.source_files():
+        return None
+    
+    if checkpoint is None or checkpoint.complete:
+        # New, changed or forced: rebuild this shard from scratch
+        print(f"Building shard for {source_file}...")
+        vectordb = index.reset_shard(source_file)
+        if chunk_store is not None:
+            chunk_store.remove(source_file)
+        checkpoint = IngestCheckpoint(checkpoint_path, ingest_settings())
+    else:
+        print(f"Resuming interrupted shard build for {source_file}...")
+        vectordb = index.shard(source_file)
+    
+    stats = ingest_pdfs(
+        [pdf_file],
+        vectordb,
+        ingest_embeddings,
+        get_text_splitter(),
+        checkpoint,
+        batch_size=INGEST_BATCH_SIZE,
+        queue_batches=INGEST_QUEUE_BATCHES,
+        dedup_threshold=DEDUP_THRESHOLD if DEDUP_ENABLED else None,
+        progress=progress,
+        stop=stop,
+        text_store=chunk_store,
+    )
+    if stats["failed_files"]:
+        print(f"Skipped unreadable PDF: {source_file}")
+    return stats
+
+def create_or_load_sharded_database(force_recreate=False, progress=None):
+    """
+    Load the sharded index, (re)building only the shards whose PDF is new,
+    changed or was interrupted mid-build, and dropping shards of removed PDFs
+    """
+    base_embeddings = get_shared_embeddings()
+    index = ShardedIndex(SHARD_DIRECTORY, get_query_embeddings(),
+                         max_workers=SHARD_SEARCH_WORKERS)
+    ingest_embeddings = get_ingest_embeddings(base_embeddings)
+    
+    pdf_files = sorted(glob.glob(os.path.join(PDF_DIRECTORY, "*.pdf")))
+    if not pdf_files:
+        raise ValueError(f"No documents found in {PDF_DIRECTORY}. Please add PDF files.")
+    
+    present = {os.path.basename(pdf_file) for pdf_file in pdf_files}
+    for source_file in sorted(index.source_files() - present):
+        print(f"Dropping shard of removed file {source_file}")
+        index.drop_shard(source_file)
+        if chunk_store is not None:
+            chunk_store.remove(source_file)
+    
+    rebuilt = 0
+    with profiling.profile("ingest"), resources.governor.ingesting():
+        for pdf_file in pdf_files:
+            if ingest_shard(index, pdf_file, ingest_embeddings, force_recreate, progress) is not None:
+                rebuilt += 1
+    print(f"Sharded index: {len(index.source_files())} shards ({rebuilt} rebuilt), "
+          f"{index.count()} chunks")
+    return index
+
 # ============================================================================
 # QA SYSTEM
 # ============================================================================
 
+query_log = QueryLog(QUERY_LOG_PATH)
+
+# Answers keyed by (normalized question, k, MMR lambda, collection); cleared
+# whenever the index changes
+answer_cache = OrderedDict()
+answer_cache_lock = threading.Lock()
+init_lock = threading.Lock()
+
+ollama_breaker = CircuitBreaker(
+    failure_threshold=OLLAMA_BREAKER_FAILURES, reset_timeout=OLLAMA_BREAKER_RESET_SECONDS
+)
+ollama_monitor = OllamaHealthMonitor(
+    OLLAMA_BASE_URL, OLLAMA_MODEL, breaker=ollama_breaker,
+    interval=OLLAMA_HEALTH_INTERVAL, on_recover=warm_up_after_recovery
+)
+
+def ollama_status():
+    return ollama_monitor.status_text()
+
+def retrieval_lambda(mmr_lambda=None):
+    """MMR lambda for a request; 1.0 means plain similarity search"""
+    if mmr_lambda is None:
+        mmr_lambda = MMR_LAMBDA if MMR_ENABLED else 1.0
+    return round(min(max(float(mmr_lambda), 0.0), 1.0), 2)
+
+def answer_key(query, num_sources, mmr_lambda=None, collection=None):
+    return (normalize_question(query), int(num_sources), retrieval_lambda(mmr_lambda),
+            collection or DEFAULT_COLLECTION)
+
+def get_cached_answer(query, num_sources, mmr_lambda=None, collection=None):
+    """Return a cached (answer, source labels) tuple or None"""
+    key = answer_key(query, num_sources, mmr_lambda, collection)
+    with answer_cache_lock:
+        entry = answer_cache.get(key)
+        if entry is not None:
+            answer_cache.move_to_end(key)
+        return entry
+
+def cache_answer(query, num_sources, answer, source_labels, mmr_lambda=None, collection=None):
+    """Store an answer, evicting the least recently used entries"""
+    key = answer_key(query, num_sources, mmr_lambda, collection)
+    with answer_cache_lock:
+        answer_cache[key] = (answer, source_labels)
+        answer_cache.move_to_end(key)
+        while len(answer_cache) > ANSWER_CACHE_SIZE:
+            answer_cache.popitem(last=False)
+
+# Retrieval results computed while the user types, consumed by answer_question
+retrieval_prefetcher = RetrievalPrefetcher(
+    lambda query, k, mmr_lambda, collection: retrieve_sources(query, k, mmr_lambda, collection),
+    debounce=PREFETCH_DEBOUNCE_SECONDS,
+    min_chars=PREFETCH_MIN_CHARS,
+)
+
+def rewrite_query_with_llm(query):
+    """One-line rewrite of the question in guideline wording (query expansion)"""
+    if ollama_breaker.state != CLOSED:
+        return None  # Never spend the budget waiting on an Ollama that is down
+    llm = get_local_llm(num_predict=48)
+    text = llm.invoke(QUERY_REWRITE_PROMPT.format(question=query))
+    return text.strip().splitlines()[0] if text.strip() else None
+
+query_searcher = MultiQuerySearcher(
+    max_variants=QUERY_EXPANSION_MAX_VARIANTS,
+    budget_seconds=QUERY_EXPANSION_BUDGET_SECONDS,
+    rewrite=rewrite_query_with_llm if QUERY_EXPANSION_LLM_REWRITE else None,
+)
+
+def clear_answer_cache():
+    with answer_cache_lock:
+        answer_cache.clear()
+    retrieval_prefetcher.clear()  # Prefetched chunks are stale too
+
+def load_collection(collection):
+    """Registry loader: the default collection comes from initialize_system, others are loaded or built"""
+    if collection.name == DEFAULT_COLLECTION:
+        # initialize_system registers the default collection itself; calling it
+        # from here would re-enter the registry while it holds the collection lock
+        if global_vectordb is None:
+            raise RuntimeError("Please initialize the system first by clicking 'Initialize System'")
+        return global_vectordb, chunk_store
+    os.makedirs(collection.vector_db_directory, exist_ok=True)
+    text_store = ChunkTextStore(
+        os.path.join(collection.vector_db_directory, "chunk_text")
+    ) if CHUNK_STORE_ENABLED else None
+    vectordb = create_or_load_vector_database(
+        force_recreate=False,
+        pdf_directory=collection.pdf_directory,
+        vector_db_directory=collection.vector_db_directory,
+        text_store=text_store,
+        snapshot_path=None,
+        sharded=False,
+    )
+    return vectordb, text_store
+
+collection_registry = CollectionRegistry(
+    COLLECTIONS, load_collection,
+    close=close_vector_database,
+    max_loaded=COLLECTIONS_MAX_LOADED,
+    memory_cap_mb=COLLECTIONS_MEMORY_CAP_MB,
+    pinned=[DEFAULT_COLLECTION],  # Ingestion and snapshots work on the default collection
+)
+
+def collection_status():
+    return "**Collections:**\n" + collection_registry.status_text()
+
 def initialize_system():
     """Initialize the QA system"""
+    with init_lock:
+        return _initialize_system()
+
+def _initialize_system():
     global global_vectordb
     
     # Check if already initialized
@@ -157,112 +787,468 @@ def initialize_system():
         return "✓ System already initialized! Ready to answer questions."
     
     try:
-        # Test Ollama connection
+        # Test Ollama connection (this also loads the model and caches the prompt prefix)
+        ollama_error = None
         try:
-            test_llm = get_local_llm()
-            test_response = test_llm.invoke("test")
+            warm_up_llm()
+            ollama_breaker.record_success()
             print("Ollama connection successful")
         except Exception as e:
-            return f"✗ Ollama not available: {str(e)}\nPlease install Ollama from https://ollama.ai and run: ollama pull {OLLAMA_MODEL}"
+            # Keep going: the index still serves extractive answers, and the
+            # health monitor reloads the model once Ollama is back
+            ollama_error = str(e)
+            ollama_breaker.record_failure(e)
+            print(f"Ollama not available: {e}")
         
         global_vectordb = create_or_load_vector_database(force_recreate=False)  # CHANGED: False instead of no parameter
+        collection_registry.set_loaded(DEFAULT_COLLECTION, global_vectordb, chunk_store)
+        if ollama_error:
+            return (f"⚠️  Documents loaded, but Ollama is not available: {ollama_error}\n"
+                    f"Answers show guideline passages until it is back. Install Ollama from "
+                    f"https://ollama.ai and run: ollama pull {OLLAMA_MODEL}")
         return "✓ System initialized successfully! You can now ask questions."
     except Exception as e:
         return f"✗ Error initializing system: {str(e)}"
         
-def add_new_pdf(pdf_file):
-    """Add a new PDF to the system"""
-    global global_vectordb
+def add_to_vector_database(vectordb, pdf_files, progress=None, stop=None):
+    """
+    Embed `pdf_files` into the existing single-collection index without
+    rebuilding it; files already recorded in the checkpoint are skipped
+    """
+    checkpoint_path = os.path.join(VECTOR_DB_DIRECTORY, CHECKPOINT_FILENAME)
+    checkpoint = IngestCheckpoint.load(checkpoint_path, ingest_settings()) \
+        or IngestCheckpoint(checkpoint_path, ingest_settings())
+    return ingest_pdfs(
+        pdf_files,
+        vectordb,
+        get_ingest_embeddings(vectordb.embeddings.base),
+        get_text_splitter(),
+        checkpoint,
+        batch_size=INGEST_BATCH_SIZE,
+        queue_batches=INGEST_QUEUE_BATCHES,
+        dedup_threshold=DEDUP_THRESHOLD if DEDUP_ENABLED else None,
+        progress=progress,
+        stop=stop,
+        text_store=chunk_store,
+    )
+
+# Uploaded batches wait here and are ingested one job at a time in the background
+ingest_jobs = queue.Queue()
+ingest_worker = None
+ingest_worker_lock = threading.Lock()
+current_ingest_job = None
+
+def run_ingest_job(job):
+    """Ingest one uploaded batch into the live index; questions keep being answered meanwhile"""
+    job.start()
+    if global_vectordb is None:
+        # No index yet: initializing builds it from every PDF, including this batch
+        status = initialize_system()
+        job.finish("done" if global_vectordb is not None else "failed",
+                   None if global_vectordb is not None else status)
+        return
+    
+    with profiling.profile("ingest"), resources.governor.ingesting():
+        if SHARDED_INDEX:
+            ingest_embeddings = get_ingest_embeddings(global_vectordb.embeddings.base)
+            for pdf_file in job.pdf_files:
+                if job.stop.is_set():
+                    break
+                stats = ingest_shard(global_vectordb, pdf_file, ingest_embeddings,
+                                     progress=job.progress, stop=job.stop)
+                if stats is not None:
+                    job.end_part(stats)
+        else:
+            stats = add_to_vector_database(global_vectordb, job.pdf_files,
+                                           progress=job.progress, stop=job.stop)
+            job.end_part(stats)
     
-    if pdf_file is None:
-        return "Please upload a PDF file"
+    clear_answer_cache()  # Cached answers predate the new documents
+    job.finish("stopped" if job.stop.is_set() else "done")
+
+def ingest_worker_loop():
+    global current_ingest_job
+    while True:
+        job = ingest_jobs.get()
+        current_ingest_job = job
+        try:
+            run_ingest_job(job)
+        except Exception as e:
+            print(f"Ingestion job failed: {e}")
+            job.finish("failed", str(e))
+        finally:
+            current_ingest_job = None
+
+def submit_ingest_job(pdf_files):
+    """Queue `pdf_files` as one background ingestion job"""
+    global ingest_worker
+    job = IngestJob(pdf_files)
+    with ingest_worker_lock:
+        if ingest_worker is None:
+            ingest_worker = threading.Thread(target=ingest_worker_loop, name="ingest-jobs",
+                                             daemon=True)
+            ingest_worker.start()
+    ingest_jobs.put(job)
+    return job
+
+def add_new_pdfs(pdf_files):
+    """
+    Copy uploaded PDFs into PDF_DIRECTORY and ingest them as one background
+    job, yielding its progress until it finishes
+    """
+    if not pdf_files:
+        yield "Please upload one or more PDF files"
+        return
+    if not isinstance(pdf_files, list):
+        pdf_files = [pdf_files]
     
+    import shutil
+    added, skipped = [], []
     try:
-        # Get filename
-        if hasattr(pdf_file, 'name'):
-            filename = os.path.basename(pdf_file.name)
-            source_path = pdf_file.name
-        else:
-            filename = os.path.basename(pdf_file)
-            source_path = pdf_file
-            
-        destination = os.path.join(PDF_DIRECTORY, filename)
-        
-        # Check if file already exists
-        if os.path.exists(destination):
-            return f"⚠️  {filename} already exists in database. Please reinitialize system to update."
-        
-        # Copy file
-        import shutil
-        shutil.copy2(source_path, destination)
-        
-        # Force recreate ONLY if a new file was added
-        global_vectordb = None  # Reset global
-        global_vectordb = create_or_load_vector_database(force_recreate=True)
-        
-        return f"✓ Successfully added {filename} to the database!\nTotal documents: {global_vectordb._collection.count()}"
+        for pdf_file in pdf_files:
+            source_path = pdf_file.name if hasattr(pdf_file, 'name') else pdf_file
+            filename = os.path.basename(source_path)
+            destination = os.path.join(PDF_DIRECTORY, filename)
+            # Check if file already exists
+            if os.path.exists(destination):
+                skipped.append(filename)
+                continue
+            shutil.copy2(source_path, destination)
+            added.append(destination)
+    except Exception as e:
+        yield f"✗ Error adding PDF: {str(e)}"
+        return
+    
+    notes = ""
+    if skipped:
+        notes = f"⚠️  Already in database (reinitialize to update): {', '.join(skipped)}\n"
+    if not added:
+        yield notes + "No new PDFs to add"
+        return
+    
+    job = submit_ingest_job(added)
+    # Closing this generator (leaving the page) does not stop the job
+    while not job.done.wait(1.0):
+        yield notes + job.describe()
+    
+    result = notes + job.describe()
+    if job.status == "done" and global_vectordb is not None:
+        result += f"\n✓ Added {len(added)} PDF(s). Total chunks: {document_count(global_vectordb)}"
+    yield result
+
+def stop_ingestion():
+    """Stop the running ingestion job after its current batch; it resumes on next startup"""
+    job = current_ingest_job
+    if job is None:
+        return "No ingestion job is running"
+    job.stop.set()
+    return "Stopping after the current batch..."
+
+class GenerationTimeout(Exception):
+    """Raised when the LLM does not finish within GENERATION_TIMEOUT_SECONDS"""
+
+def search_by_vector(vectordb, vector, k, mmr_lambda=None):
+    """Top-k chunks for an embedding, diversified by MMR unless lambda is 1.0"""
+    return mmr_search(vectordb, vector, k, fetch_k=MMR_FETCH_K,
+                      lambda_mult=retrieval_lambda(mmr_lambda))
+
+def retrieve_sources(query, num_sources, mmr_lambda=None, collection=None):
+    """
+    Return (top `num_sources` chunks, query embedding) for `query` in `collection`.
+    With parent-child chunks these are the parent sections of the best child hits.
+    """
+    with collection_registry.use(collection or DEFAULT_COLLECTION) as (vectordb, text_store):
+        return _retrieve_sources(vectordb, text_store, query, num_sources, mmr_lambda)
+
+def _retrieve_sources(vectordb, text_store, query, num_sources, mmr_lambda):
+    # Child hits often share a parent, so fetch more of them than sources wanted
+    k = num_sources * CHILD_FETCH_PER_SOURCE if PARENT_CHILD_ENABLED else num_sources
+    if QUERY_EXPANSION_ENABLED:
+        sources, query_vector, stats = query_searcher.search(
+            query, vectordb.embeddings,
+            lambda vector, n: search_by_vector(vectordb, vector, n, mmr_lambda),
+            k,
+        )
+        print(f"Query expansion: {stats['fused']}/{len(stats['variants'])} variants fused "
+              f"in {stats['elapsed'] * 1000:.0f} ms")
+    else:
+        query_vector = vectordb.embeddings.embed_query(query)
+        sources = search_by_vector(vectordb, query_vector, k, mmr_lambda)
+    if PARENT_CHILD_ENABLED:
+        sources = parent_documents(sources, num_sources)
+    if text_store is not None:
+        text_store.hydrate(sources)  # Decompress only the pages of the top-k hits
+    return sources, query_vector
+
+def key_passages(query_vector, sources):
+    """Top-scoring sentences of the retrieved chunks, formatted with page citations"""
+    if not INSTANT_ANSWER_ENABLED:
+        return ""
+    try:
+        selected = top_sentences(query_vector, sources, get_query_embeddings(),
+                                 limit=INSTANT_ANSWER_SENTENCES)
     except Exception as e:
-        return f"✗ Error adding PDF: {str(e)}"
+        print(f"Extractive answer failed: {e}")
+        return ""
+    return format_key_passages(selected)
+
+def build_prompt(query, sources):
+    """Fill the shared prompt template ("stuff" the retrieved chunks into the context)"""
+    context = "\n\n".join(doc.page_content for doc in sources)
+    return PROMPT.format(context=context, question=query)
 
-def answer_question(query, num_sources=3):
-    """Answer a question using the RAG system"""
+def source_label(doc):
+    return f"{doc.metadata.get('source_file', 'Unknown')} p.{doc.metadata.get('page', 'Unknown')}"
+
+def format_sources(sources):
+    """Sources section appended to every answer"""
+    if not sources:
+        return ""
+    text = "\n\n---\n**Sources:**\n"
+    for i, doc in enumerate(sources, 1):
+        source_file = doc.metadata.get('source_file', 'Unknown')
+        page = doc.metadata.get('page', 'Unknown')
+        preview = doc.page_content[:150].replace('\n', ' ')
+        text += f"\n{i}. **{source_file}** (Page {page})\n   Preview: {preview}...\n"
+        if doc.metadata.get('duplicate_sources'):
+            text += f"   Also in: {doc.metadata['duplicate_sources']}\n"
+    return text
+
+def format_extractive_fallback(notice, sources, partial_answer="", key_text=""):
+    """Answer built only from the retrieved passages, used when the LLM cannot answer"""
+    text = f"⚠️ **{notice}** - showing the most relevant guideline passages instead.\n"
+    if partial_answer.strip():
+        text += f"\n**Partial answer (incomplete):**\n{partial_answer.strip()}\n"
+    if key_text:
+        text += f"\n{key_text}\n**Retrieved passages:**\n"
+    for i, doc in enumerate(sources, 1):
+        source_file = doc.metadata.get('source_file', 'Unknown')
+        page = doc.metadata.get('page', 'Unknown')
+        passage = " ".join(doc.page_content[:FALLBACK_PASSAGE_CHARS].split())
+        text += f"\n{i}. **{source_file}** (Page {page})\n   {passage}...\n"
+    return text
+
+def stream_llm_tokens(prompt, timeout, cancel_event, callbacks=()):
+    """
+    Yield tokens from Ollama, enforcing an overall deadline.
+
+    The Ollama stream is consumed in a worker thread so a hung server cannot
+    block the caller past the deadline. Setting `cancel_event` (or closing this
+    generator) makes the worker close the stream, which drops the HTTP
+    connection and stops Ollama from generating for nobody.
+    """
+    tokens = queue.Queue()
+    done = object()
+    
+    def worker():
+        stream = None
+        try:
+            stream = get_local_llm().stream(prompt, config={"callbacks": list(callbacks)})
+            for token in stream:
+                if cancel_event.is_set():
+                    break
+                tokens.put(token)
+        except Exception as e:
+            tokens.put(e)
+        finally:
+            if stream is not None:
+                stream.close()
+            tokens.put(done)
+    
+    threading.Thread(target=profiling.bind_thread(worker), name="ollama-stream",
+                     daemon=True).start()
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise queue.Empty
+                item = tokens.get(timeout=remaining)
+            except queue.Empty:
+                raise GenerationTimeout(f"LLM timed out after {timeout:g}s")
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancel_event.set()
+
+def answer_question(query, num_sources=3, mmr_lambda=None, collection=None, log_query=True):
+    """
+    Answer a question using the RAG system.
+    
+    Yields the answer progressively as the LLM streams it. If generation fails
+    or exceeds GENERATION_TIMEOUT_SECONDS, the retrieved passages are returned
+    instead. Closing the generator (Stop button / client disconnect) cancels
+    the Ollama request.
+    """
+    request_id = profiling.new_request_id()
+    yield from profiling.profile_generator(
+        _answer_question(query, num_sources, mmr_lambda, collection, log_query, request_id),
+        "answer", request_id
+    )
+
+def _answer_question(query, num_sources, mmr_lambda, collection, log_query, request_id):
     global global_vectordb
     
-    if global_vectordb is None:
-        return "Please initialize the system first by clicking 'Initialize System'"
+    collection = collection or DEFAULT_COLLECTION
+    if collection == DEFAULT_COLLECTION and global_vectordb is None:
+        yield "Please initialize the system first by clicking 'Initialize System'"
+        return
     
     if not query or query.strip() == "":
-        return "Please enter a question"
+        yield "Please enter a question"
+        return
+    
+    start = time.perf_counter()
+    mmr_lambda = retrieval_lambda(mmr_lambda)
+    cached = get_cached_answer(query, num_sources, mmr_lambda, collection)
+    if cached is not None:
+        answer, source_labels = cached
+        if log_query:
+            query_log.log(query, num_sources, time.perf_counter() - start, True, source_labels,
+                          request_id=request_id, mmr_lambda=mmr_lambda, collection=collection)
+        yield answer
+        return
     
+    prefetched = (retrieval_prefetcher.take(query, num_sources, (mmr_lambda, collection))
+                  if PREFETCH_ENABLED else None)
     try:
-        llm = get_local_llm()
-        retriever = global_vectordb.as_retriever(
-            search_kwargs={"k": num_sources}
-        )
+        if prefetched is not None:
+            sources, query_vector = prefetched
+        else:
+            if not collection_registry.is_loaded(collection):
+                yield f"⏳ Loading the '{collection}' collection..."
+            sources, query_vector = retrieve_sources(query, num_sources, mmr_lambda, collection)
+    except Exception as e:
+        yield f"Error: {str(e)}"
+        return
+    
+    source_labels = [source_label(doc) for doc in sources]
+    sources_text = format_sources(sources)
+    
+    # Show the best guideline sentences right away; the LLM answer is placed
+    # above them as it streams in
+    key_text = key_passages(query_vector, sources)
+    if key_text:
+        key_text = "\n\n---\n" + key_text
+        yield "⏳ Generating full answer..." + key_text + sources_text
+    stats_handler = OllamaStatsHandler()
+    cancel_event = threading.Event()
+    status = "ok"
+    answer = ""
+    completed = False
+    
+    try:
+        if not ollama_breaker.allow_request():
+            # Fail fast instead of waiting for a connection timeout
+            status = "ollama_down"
+            yield format_extractive_fallback("Ollama is unavailable", sources, "", key_text)
+            return
         
-        # Custom prompt for medical context
+        for token in stream_llm_tokens(build_prompt(query, sources), GENERATION_TIMEOUT_SECONDS,
+                                       cancel_event, [stats_handler]):
+            answer += token
+            yield answer + key_text + sources_text
+        ollama_breaker.record_success()
         
-        prompt_template = """You are a medical assistant specialized in vascular surgery and diabetic foot guidelines. 
-        Use the following pieces of context to answer the question at the end. 
-        If you don't know the answer, just say that you don't know, don't try to make up an answer.
-        Always cite the specific recommendations or guidelines when applicable.
-
-        Context: {context}
+        final = answer + key_text + sources_text
+        # Cached without the timing line, which describes this generation only
+        cache_answer(query, num_sources, final, source_labels, mmr_lambda, collection)
+        timings = stats_handler.summary()
+        if timings:
+            print(f"Ollama timings: {timings}")
+            if SHOW_LLM_TIMINGS:
+                final += f"\n_Timing: {timings}_\n"
+        completed = True
+        yield final
+    except GenerationTimeout as e:
+        status = "timeout"
+        # Slow but streaming is alive; no tokens at all counts as a failure
+        if answer:
+            ollama_breaker.record_success()
+        else:
+            ollama_breaker.record_failure(e)
+        yield format_extractive_fallback(str(e), sources, answer, key_text)
+    except GeneratorExit:
+        if not completed:
+            status = "cancelled"
+            ollama_breaker.cancel_trial()
+        raise
+    except Exception as e:
+        status = "llm_error"
+        ollama_breaker.record_failure(e)
+        print(f"LLM error: {e}")
+        yield format_extractive_fallback(f"LLM unavailable ({e})", sources, answer, key_text)
+    finally:
+        cancel_event.set()
+        if log_query:
+            query_log.log(query, num_sources, time.perf_counter() - start, False, source_labels,
+                          status=status, request_id=request_id,
+                          prefetched=prefetched is not None, mmr_lambda=mmr_lambda,
+                          unique_pages=unique_pages(sources), collection=collection)
 
-        Question: {question}
+def prewarm(questions):
+    """
+    Replay questions through retrieval and generation so their answers are
+    cached and the Ollama model is resident before real users arrive.
+    `questions` are (question, k, mmr_lambda, collection) tuples, i.e. the
+    answer-cache key each was asked with (None = default).
+    """
+    seen = set()
+    warmed = 0
+    start = time.perf_counter()
+    for question, k, mmr_lambda, collection in questions:
+        key = answer_key(question, k, mmr_lambda, collection)
+        # Never load (or build) a collection speculatively
+        if key in seen or not collection_registry.is_loaded(key[3]):
+            continue
+        seen.add(key)
+        for _ in answer_question(question, k, mmr_lambda, collection, log_query=False):
+            pass
+        if get_cached_answer(question, k, mmr_lambda, collection) is not None:
+            warmed += 1
+    print(f"Prewarm complete: {warmed}/{len(seen)} questions cached in "
+          f"{time.perf_counter() - start:.1f}s")
 
-        Answer:"""
-        
-        PROMPT = PromptTemplate(
-            template=prompt_template, 
-            input_variables=["context", "question"]
+def start_background_prewarm():
+    """Initialize the system and prewarm hot questions without blocking startup"""
+    def run():
+        status = initialize_system()
+        print(status)
+        if global_vectordb is None:
+            return
+        questions = query_log.hot_questions(
+            limit=PREWARM_HOT_QUESTIONS, max_age_days=PREWARM_MAX_AGE_DAYS
         )
-        
-        qa = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=retriever,
-            return_source_documents=True,
-            chain_type_kwargs={"prompt": PROMPT}
-        )
-        
-        response = qa.invoke({"query": query})
-        
-        answer = response['result']
-        sources = response['source_documents']
-        
-        if sources:
-            answer += "\n\n---\n**Sources:**\n"
-            for i, doc in enumerate(sources, 1):
-                source_file = doc.metadata.get('source_file', 'Unknown')
-                page = doc.metadata.get('page', 'Unknown')
-                preview = doc.page_content[:150].replace('\n', ' ')
-                answer += f"\n{i}. **{source_file}** (Page {page})\n   Preview: {preview}...\n"
-        
-        return answer
+        questions += [(q, 3, None, None) for q in EXAMPLE_QUESTIONS]
+        prewarm(questions)
     
-    except Exception as e:
-        return f"Error: {str(e)}"
+    thread = threading.Thread(target=run, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
+def prefetch_retrieval(query, num_sources, mmr_lambda, collection, request: gr.Request = None):
+    """Textbox change handler: schedule speculative retrieval for the text so far"""
+    collection = collection or DEFAULT_COLLECTION
+    # Never load (or build) a collection speculatively
+    if not PREFETCH_ENABLED or not collection_registry.is_loaded(collection):
+        return
+    session = getattr(request, "session_hash", None)
+    retrieval_prefetcher.submit(session, query, num_sources,
+                                (retrieval_lambda(mmr_lambda), collection))
+
+def set_profiling_mode(mode):
+    """Admin toggle for per-request profiling (see profiling.py)"""
+    try:
+        profiling.set_mode(mode)
+    except ValueError as e:
+        return f"✗ {e}"
+    if mode == "off":
+        return "Profiling disabled"
+    return f"Profiling new requests with {mode}; profiles are written to {profiling.PROFILE_DIR}"
 
 def list_available_pdfs():
     """List all PDFs in the database"""
@@ -295,6 +1281,8 @@ def create_interface():
             - Embeddings: HuggingFace (sentence-transformers)
             """.format(model=OLLAMA_MODEL)
         )
+        # Refreshed from the health monitor's last probe
+        gr.Markdown(value=ollama_status, every=OLLAMA_HEALTH_INTERVAL)
         
         with gr.Tab("💬 Ask Questions"):
             gr.Markdown("### Ask questions about the medical guidelines")
@@ -306,6 +1294,12 @@ def create_interface():
                         placeholder="e.g., What are the recommendations for diagnosing PAD in diabetic patients?",
                         lines=3
                     )
+                    collection = gr.Dropdown(
+                        choices=list(COLLECTIONS),
+                        value=DEFAULT_COLLECTION,
+                        label="Guideline collection",
+                        visible=len(COLLECTIONS) > 1
+                    )
                     num_sources = gr.Slider(
                         minimum=1,
                         maximum=10,
@@ -313,7 +1307,16 @@ def create_interface():
                         step=1,
                         label="Number of source documents to consider"
                     )
-                    ask_button = gr.Button("🔍 Get Answer", variant="primary", size="lg")
+                    mmr_lambda = gr.Slider(
+                        minimum=0.0,
+                        maximum=1.0,
+                        value=retrieval_lambda(),
+                        step=0.05,
+                        label="Relevance vs. diversity of sources (MMR λ; 1 = most similar only)"
+                    )
+                    with gr.Row():
+                        ask_button = gr.Button("🔍 Get Answer", variant="primary", size="lg")
+                        stop_button = gr.Button("⏹ Stop", variant="stop", size="lg")
                 
                 with gr.Column(scale=3):
                     answer_output = gr.Textbox(
@@ -322,34 +1325,36 @@ def create_interface():
                         show_copy_button=True
                     )
             
-            ask_button.click(
+            ask_event = ask_button.click(
                 fn=answer_question,
-                inputs=[query_input, num_sources],
+                inputs=[query_input, num_sources, mmr_lambda, collection],
                 outputs=answer_output
             )
+            # Cancelling the event closes the answer generator, which stops the Ollama request
+            stop_button.click(fn=None, cancels=[ask_event])
+            
+            # Retrieve in the background while the question is typed; cheap, so not queued
+            for trigger in (query_input.change, num_sources.change, mmr_lambda.change,
+                            collection.change):
+                trigger(
+                    fn=prefetch_retrieval,
+                    inputs=[query_input, num_sources, mmr_lambda, collection],
+                    outputs=None,
+                    queue=False,
+                    show_progress="hidden"
+                )
             
             gr.Markdown("### 💡 Example Questions:")
             
             with gr.Row():
-                examples = [
-                    "What are the diagnostic criteria for peripheral artery disease in diabetic patients?",
-                    "What is the WIfI classification system and how is it used?",
-                    "What are the recommendations for revascularization in diabetic foot ulcers?",
-                ]
-                
-                for question in examples:
+                for question in EXAMPLE_QUESTIONS[:3]:
                     gr.Button(question, size="sm").click(
                         lambda q=question: q,
                         outputs=query_input
                     )
             
             with gr.Row():
-                examples2 = [
-                    "What bedside tests should be performed for PAD diagnosis?",
-                    "What are the target HbA1c levels for patients with diabetes and PAD?"
-                ]
-                
-                for question in examples2:
+                for question in EXAMPLE_QUESTIONS[3:]:
                     gr.Button(question, size="sm").click(
                         lambda q=question: q,
                         outputs=query_input
@@ -365,36 +1370,62 @@ def create_interface():
                     init_output = gr.Textbox(label="Status", lines=3)
                     
                     gr.Markdown("---")
-                    gr.Markdown("#### Add New PDF")
+                    gr.Markdown(f"#### Add New PDFs (to the '{DEFAULT_COLLECTION}' collection)")
                     
                     pdf_upload = gr.File(
-                        label="Upload PDF File",
+                        label="Upload PDF Files",
                         file_types=[".pdf"],
+                        file_count="multiple",
                         type="filepath"
                     )
-                    add_button = gr.Button("➕ Add PDF to Database", variant="secondary")
-                    add_output = gr.Textbox(label="Status", lines=3)
+                    with gr.Row():
+                        add_button = gr.Button("➕ Add PDFs to Database", variant="secondary")
+                        stop_ingest_button = gr.Button("⏹ Stop Ingestion", variant="stop")
+                    add_output = gr.Textbox(label="Status", lines=5)
+                    
+                    gr.Markdown("---")
+                    gr.Markdown("#### Profiling")
+                    profile_mode = gr.Radio(
+                        choices=list(profiling.PROFILE_MODES),
+                        value=profiling.get_mode(),
+                        label="Per-request profiling"
+                    )
+                    profile_output = gr.Textbox(label="Status", lines=2)
                 
                 with gr.Column():
                     gr.Markdown("#### Current Documents")
                     list_button = gr.Button("📋 List Available PDFs")
                     list_output = gr.Textbox(label="Available Documents", lines=15)
+                    if len(COLLECTIONS) > 1:
+                        gr.Markdown(value=collection_status, every=OLLAMA_HEALTH_INTERVAL)
             
             init_button.click(
                 fn=initialize_system,
                 outputs=init_output
             )
             
+            # Ingestion runs in a background thread; this only streams its progress
             add_button.click(
-                fn=add_new_pdf,
+                fn=add_new_pdfs,
                 inputs=pdf_upload,
                 outputs=add_output
             )
             
+            stop_ingest_button.click(
+                fn=stop_ingestion,
+                outputs=add_output
+            )
+            
             list_button.click(
                 fn=list_available_pdfs,
                 outputs=list_output
             )
+            
+            profile_mode.change(
+                fn=set_profiling_mode,
+                inputs=profile_mode,
+                outputs=profile_output
+            )
         
         with gr.Tab("⚙️ Setup Guide"):
             gr.Markdown(
@@ -449,6 +1480,12 @@ def create_interface():
                 - `llama3` (8B) - Latest, very good
                 - `mixtral` (47B) - Very powerful but slower
                 
+                To measure your installed models on this machine and pick the one
+                that meets `ANSWER_LATENCY_SLO_SECONDS`, run:
+                ```bash
+                python3 tune_ollama.py          # add --write to apply the result
+                ```
+                
                 ### System Requirements
                 
                 - **RAM**: 8GB minimum (16GB+ recommended for larger models)
@@ -491,6 +1528,11 @@ if __name__ == "__main__":
     print(f"LLM Model: {OLLAMA_MODEL}")
     print("="*60)
     
+    ollama_monitor.start()
+    
+    if PREWARM_ON_STARTUP:
+        start_background_prewarm()
+    
     app = create_interface()
     app.launch(
         server_name="0.0.0.0",
@@ -0,0 +1,83 @@
+"""
+Maximal marginal relevance (MMR) retrieval for the Medical Guidelines QA Bot
+With 200-character chunk overlap and guideline text repeated across
+documents, a plain top-k often holds near-identical chunks. MMR over-fetches
+candidates and picks each next chunk by
+
+    lambda * sim(query, chunk) - (1 - lambda) * max sim(chunk, already picked)
+
+lambda = 1 is plain similarity search; lower values favour diversity.
+
+Candidates come from Chroma together with their stored vectors (no
+re-embedding). The selection is vectorized: the candidate similarity matrix
+is computed once and each step is one numpy update of the "max similarity to
+the picked set" vector.
+"""
+
+import numpy as np
+from langchain_core.documents import Document
+
+DEFAULT_LAMBDA = 0.7
+DEFAULT_FETCH_K = 20  # Candidates fetched per query before MMR selection
+
+
+def query_candidates(vectordb, embedding, fetch_k):
+    """
+    Nearest `fetch_k` chunks of a langchain Chroma store with their stored
+    vectors. Returns (documents, vectors array, distances).
+    """
+    result = vectordb._collection.query(
+        query_embeddings=[embedding],
+        n_results=fetch_k,
+        include=["documents", "metadatas", "embeddings", "distances"],
+    )
+    docs = [Document(page_content=text or "", metadata=metadata or {})
+            for text, metadata in zip(result["documents"][0], result["metadatas"][0])]
+    vectors = np.asarray(result["embeddings"][0], dtype=np.float32)
+    return docs, vectors, list(result["distances"][0])
+
+
+def mmr_select(query_vector, candidate_vectors, k, lambda_mult=DEFAULT_LAMBDA):
+    """Indices of the `k` candidates chosen by MMR, in selection order"""
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    if len(candidates) == 0 or k <= 0:
+        return []
+    query = np.asarray(query_vector, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    first = int(np.argmax(relevance))
+    selected = [first]
+    max_similarity = similarity[first].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[first] = False
+    for _ in range(min(k, len(candidates)) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
+
+def mmr_search(vectordb, query_vector, k, fetch_k=DEFAULT_FETCH_K, lambda_mult=DEFAULT_LAMBDA):
+    """
+    Top-`k` chunks by MMR from `vectordb` (langchain Chroma or ShardedIndex).
+    `lambda_mult` >= 1 skips MMR and returns the plain similarity top-k.
+    """
+    if lambda_mult >= 1:
+        return vectordb.similarity_search_by_vector(query_vector, k=k)
+    fetch_k = max(fetch_k, k)
+    if hasattr(vectordb, "query_candidates"):
+        docs, vectors, _ = vectordb.query_candidates(query_vector, fetch_k)
+    else:
+        docs, vectors, _ = query_candidates(vectordb, query_vector, fetch_k)
+    return [docs[i] for i in mmr_select(query_vector, vectors, k, lambda_mult)]
+
+
+def unique_pages(docs):
+    """Number of distinct (source file, page) locations among `docs`"""
+    return len({(doc.metadata.get("source_file"), doc.metadata.get("page")) for doc in docs})
@@ -0,0 +1,221 @@
+"""
+Mock WatsonX embedding server
+Local stand-in for the /ml/v1/text/embeddings endpoint so the throughput of
+the batched embedding path can be measured without IBM Cloud. It simulates
+per-request round-trip latency, per-text compute time, a concurrency limit
+that answers HTTP 429, and the model's input token limit.
+
+Usage:
+    # Run the server
+    python3 mock_embedding_server.py --port 8089
+
+    # Benchmark batch size / concurrency combinations against an in-process server
+    python3 mock_embedding_server.py --benchmark
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.embeddings import Embeddings
+
+from batched_embeddings import BatchedEmbeddings
+
+EMBEDDING_PATH = "/ml/v1/text/embeddings"
+DEFAULT_DIMENSIONS = 768
+DEFAULT_MAX_INPUT_TOKENS = 512  # ibm/slate-125m-english-rtrvr-v2
+
+# ============================================================================
+# SERVER
+# ============================================================================
+
+def fake_embedding(text, dimensions):
+    """Deterministic unit vector derived from the text"""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class MockEmbeddingHandler(BaseHTTPRequestHandler):
+    server_version = "MockWatsonx/1.0"
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output readable
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        settings = self.server.settings
+        if self.path.split("?")[0] != EMBEDDING_PATH:
+            self._send_json(404, {"errors": [{"message": "not found"}]})
+            return
+
+        with self.server.lock:
+            if self.server.in_flight >= settings["max_concurrent"]:
+                self.server.rejected += 1
+                self._send_json(429, {"errors": [{"code": "too_many_requests",
+                                                  "message": "Rate limit exceeded"}]})
+                return
+            self.server.in_flight += 1
+            self.server.requests += 1
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            inputs = request.get("inputs", [])
+            truncate = request.get("parameters", {}).get("truncate_input_tokens")
+            limit = settings["max_input_tokens"]
+
+            token_count = 0
+            for text in inputs:
+                tokens = len(text.split())
+                if tokens > limit and not truncate:
+                    self._send_json(400, {"errors": [{
+                        "code": "invalid_input",
+                        "message": f"Token sequence length {tokens} exceeds the maximum "
+                                   f"sequence length {limit} for this model",
+                    }]})
+                    return
+                token_count += min(tokens, truncate or limit, limit)
+
+            time.sleep((settings["latency_ms"] + settings["per_text_ms"] * len(inputs)) / 1000)
+            self._send_json(200, {
+                "model_id": request.get("model_id", "mock"),
+                "results": [{"embedding": fake_embedding(t, settings["dimensions"])}
+                            for t in inputs],
+                "input_token_count": token_count,
+            })
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+
+def start_mock_server(port=0, latency_ms=80, per_text_ms=2, max_concurrent=8,
+                      max_input_tokens=DEFAULT_MAX_INPUT_TOKENS, dimensions=DEFAULT_DIMENSIONS):
+    """Start the mock server in a background thread; returns the server (use .server_port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockEmbeddingHandler)
+    server.daemon_threads = True
+    server.settings = {
+        "latency_ms": latency_ms,
+        "per_text_ms": per_text_ms,
+        "max_concurrent": max_concurrent,
+        "max_input_tokens": max_input_tokens,
+        "dimensions": dimensions,
+    }
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.requests = 0
+    server.rejected = 0
+    threading.Thread(target=server.serve_forever, name="mock-embeddings", daemon=True).start()
+    return server
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+class MockEmbeddingClient(Embeddings):
+    """Minimal client for the mock endpoint (one HTTP request per call)"""
+
+    def __init__(self, url, truncate_input_tokens=DEFAULT_MAX_INPUT_TOKENS, timeout=60):
+        self.url = url.rstrip("/") + EMBEDDING_PATH
+        self.truncate_input_tokens = truncate_input_tokens
+        self.timeout = timeout
+
+    def embed_documents(self, texts):
+        payload = json.dumps({
+            "inputs": list(texts),
+            "model_id": "mock",
+            "parameters": {"truncate_input_tokens": self.truncate_input_tokens},
+        }).encode("utf-8")
+        request = urllib.request.Request(
+            self.url, data=payload, headers={"Content-Type": "application/json"}
+        )
+        # urllib.error.HTTPError carries .code, which is_rate_limit_error understands
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.loads(response.read())
+        return [item["embedding"] for item in data["results"]]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def synthetic_chunks(count, words=180, seed=0):
+    """Chunk-sized texts (~1000 characters, like the app's splitter output)"""
+    rng = random.Random(seed)
+    vocabulary = ("peripheral artery disease diabetic foot ulcer ischaemia toe pressure "
+                  "revascularisation ankle brachial index recommendation guideline wound "
+                  "healing amputation perfusion doppler waveform infection").split()
+    return [" ".join(rng.choice(vocabulary) for _ in range(words)) for _ in range(count)]
+
+
+def run_benchmark(num_texts=1000, configs=None, **server_kwargs):
+    """Embed the same texts with each (batch_size, concurrency) pair and print throughput"""
+    configs = configs or [(1, 1), (32, 1), (32, 4), (64, 8), (128, 16)]
+    server = start_mock_server(**server_kwargs)
+    url = f"http://127.0.0.1:{server.server_port}"
+    texts = synthetic_chunks(num_texts)
+
+    print(f"Mock server on {url} ({server.settings})")
+    print(f"Embedding {num_texts} chunk-sized texts\n")
+    print(f"{'batch':>6} {'conc':>5} {'seconds':>8} {'texts/s':>9} {'requests':>9} {'429s':>5}")
+    try:
+        for batch_size, concurrency in configs:
+            server.requests = server.rejected = 0
+            embedder = BatchedEmbeddings(
+                MockEmbeddingClient(url), batch_size=batch_size,
+                max_concurrency=concurrency, backoff_seconds=0.05,
+            )
+            start = time.perf_counter()
+            vectors = embedder.embed_documents(texts)
+            elapsed = time.perf_counter() - start
+            assert len(vectors) == num_texts
+            print(f"{batch_size:>6} {concurrency:>5} {elapsed:>8.2f} {num_texts / elapsed:>9.1f} "
+                  f"{server.requests:>9} {server.rejected:>5}")
+    finally:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock WatsonX embedding server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=80, help="Round-trip latency per request")
+    parser.add_argument("--per-text-ms", type=float, default=2, help="Compute time per input text")
+    parser.add_argument("--max-concurrent", type=int, default=8, help="Requests before HTTP 429")
+    parser.add_argument("--benchmark", action="store_true", help="Run the throughput benchmark")
+    parser.add_argument("--num-texts", type=int, default=1000)
+    args = parser.parse_args()
+
+    server_kwargs = dict(latency_ms=args.latency_ms, per_text_ms=args.per_text_ms,
+                         max_concurrent=args.max_concurrent)
+    if args.benchmark:
+        run_benchmark(num_texts=args.num_texts, **server_kwargs)
+        return
+
+    server = start_mock_server(port=args.port, **server_kwargs)
+    print(f"Mock embedding server listening on http://127.0.0.1:{server.server_port}{EMBEDDING_PATH}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
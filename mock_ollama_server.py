@@ -0,0 +1,161 @@
+"""
+Mock Ollama server
+Local stand-in for the Ollama endpoints the app and tune_ollama.py use
+(/api/version, /api/tags, /api/ps, streaming /api/generate), so the tuner and
+the health monitor can be exercised without installing models. Each fake
+model has its own load time, prompt-eval speed, generation speed and memory
+footprint; responses carry Ollama's timing fields.
+
+Usage:
+    # Run the server
+    python3 mock_ollama_server.py --port 11435
+
+    # Tune against it
+    python3 tune_ollama.py --stub
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# name -> simulated characteristics
+DEFAULT_MODELS = {
+    "tiny-stub:1b": {"size_mb": 800, "load_s": 0.2, "prompt_tps": 4000, "gen_tps": 120},
+    "small-stub:7b": {"size_mb": 4100, "load_s": 0.5, "prompt_tps": 1500, "gen_tps": 45},
+    "large-stub:13b": {"size_mb": 7400, "load_s": 0.8, "prompt_tps": 600, "gen_tps": 18},
+}
+VERSION = "0.0.0-mock"
+
+
+def estimate_tokens(text):
+    return max(1, int(len(text.split()) * 1.3))
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    server_version = "MockOllama/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        models = self.server.models
+        if self.path == "/api/version":
+            self._send_json(200, {"version": VERSION})
+        elif self.path == "/api/tags":
+            self._send_json(200, {"models": [
+                {"name": name, "model": name, "size": spec["size_mb"] * 1024 * 1024}
+                for name, spec in models.items()
+            ]})
+        elif self.path == "/api/ps":
+            with self.server.lock:
+                loaded = list(self.server.loaded)
+            self._send_json(200, {"models": [
+                {"name": name, "model": name,
+                 "size": models[name]["size_mb"] * 1024 * 1024,
+                 "size_vram": 0}
+                for name in loaded
+            ]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        name = request.get("model")
+        spec = self.server.models.get(name)
+        if spec is None:
+            self._send_json(404, {"error": f"model '{name}' not found"})
+            return
+
+        keep_alive = request.get("keep_alive")
+        if keep_alive == 0 or keep_alive == "0":
+            with self.server.lock:
+                self.server.loaded.discard(name)
+            self._send_json(200, {"model": name, "response": "", "done": True,
+                                  "done_reason": "unload"})
+            return
+
+        start = time.perf_counter()
+        with self.server.lock:
+            needs_load = name not in self.server.loaded
+            self.server.loaded.add(name)
+        load = spec["load_s"] if needs_load else 0.0
+        time.sleep(load)
+
+        options = request.get("options", {})
+        prompt_tokens = estimate_tokens(request.get("prompt", ""))
+        prompt_time = prompt_tokens / spec["prompt_tps"]
+        time.sleep(prompt_time)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")  # Stream ends when the connection closes
+        self.end_headers()
+        num_predict = int(options.get("num_predict", 128))
+        if num_predict < 0:
+            num_predict = 128
+        gen_start = time.perf_counter()
+        for i in range(num_predict):
+            time.sleep(1.0 / spec["gen_tps"])
+            self.wfile.write(json.dumps({"model": name, "response": f"tok{i} ",
+                                         "done": False}).encode("utf-8") + b"\n")
+            self.wfile.flush()
+        gen_time = time.perf_counter() - gen_start
+        self.wfile.write(json.dumps({
+            "model": name,
+            "response": "",
+            "done": True,
+            "done_reason": "length",
+            "total_duration": int((time.perf_counter() - start) * 1e9),
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_time * 1e9),
+            "eval_count": num_predict,
+            "eval_duration": int(gen_time * 1e9),
+        }).encode("utf-8") + b"\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def start_mock_server(port=0, models=None):
+    """Start the mock server in a background thread; returns the server (use .server_port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockOllamaHandler)
+    server.daemon_threads = True
+    server.models = dict(models or DEFAULT_MODELS)
+    server.loaded = set()
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name="mock-ollama", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server")
+    parser.add_argument("--port", type=int, default=11435)
+    args = parser.parse_args()
+
+    server = start_mock_server(port=args.port)
+    print(f"Mock Ollama server listening on http://127.0.0.1:{server.server_port} "
+          f"with models: {', '.join(server.models)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
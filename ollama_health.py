@@ -0,0 +1,178 @@
+"""
+Ollama health monitoring for the Medical Guidelines QA Bot
+A background thread probes Ollama's cheap status endpoints (/api/version,
+/api/ps) and drives a circuit breaker. While the breaker is open, questions
+fail fast to the extractive / cached answer instead of each one waiting for
+a connection timeout. Probes only count against the breaker: a probe that
+succeeds never clears failures recorded by real requests (Ollama may answer
+/api/version while generation hangs). Once RESET_TIMEOUT has passed a
+successful probe can serve as the half-open trial; the breaker then closes
+and an optional recovery hook (e.g. reloading the model) runs.
+
+Breaker states:
+    closed     requests go to Ollama
+    open       Ollama is considered down; requests are refused
+    half_open  after RESET_TIMEOUT one trial request is let through; its
+               outcome closes or re-opens the breaker
+"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+DEFAULT_PROBE_INTERVAL = 5.0   # Seconds between health probes
+DEFAULT_PROBE_TIMEOUT = 1.0    # Seconds per probe request
+DEFAULT_FAILURE_THRESHOLD = 2  # Consecutive failures that open the breaker
+DEFAULT_RESET_TIMEOUT = 15.0   # Seconds before an open breaker lets a trial request through
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker shared by the monitor and the answer path"""
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        """True if a request may go to Ollama now"""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def _close(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.trial_in_flight = False
+
+    def record_success(self):
+        """Returns True if this success closed an open breaker"""
+        with self.lock:
+            recovered = self.state != CLOSED
+            self._close()
+            return recovered
+
+    def record_probe_success(self):
+        """
+        A status probe answered. Leaves a closed breaker (and its failure count)
+        alone; an open one closes only if the probe may act as the half-open
+        trial. Returns True if this closed the breaker.
+        """
+        with self.lock:
+            if self.state == CLOSED:
+                return False
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state != HALF_OPEN or self.trial_in_flight:
+                return False
+            self._close()
+            return True
+
+    def record_failure(self, error=None):
+        with self.lock:
+            self.failures += 1
+            self.last_error = str(error) if error else self.last_error
+            self.trial_in_flight = False
+            if self.state != CLOSED or self.failures >= self.failure_threshold:
+                # Every further failure pushes the next trial request back
+                self.opened_at = time.monotonic()
+                self.state = OPEN
+
+    def cancel_trial(self):
+        """Release a trial request that ended without a verdict (e.g. cancelled)"""
+        with self.lock:
+            self.trial_in_flight = False
+
+
+class OllamaHealthMonitor:
+    """Periodically probes Ollama and feeds the results into a CircuitBreaker"""
+
+    def __init__(self, base_url, model, breaker=None, interval=DEFAULT_PROBE_INTERVAL,
+                 timeout=DEFAULT_PROBE_TIMEOUT, on_recover=None):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.breaker = breaker or CircuitBreaker()
+        self.interval = interval
+        self.timeout = timeout
+        self.on_recover = on_recover
+        self.version = None
+        self.model_loaded = None
+        self.last_probe = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _get(self, path):
+        with urllib.request.urlopen(self.base_url + path, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def probe(self):
+        """One health check; returns True if Ollama is reachable"""
+        self.last_probe = time.time()
+        try:
+            self.version = self._get("/api/version").get("version")
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            self.model_loaded = None
+            self.breaker.record_failure(e)
+            return False
+
+        try:
+            running = self._get("/api/ps").get("models", [])
+            self.model_loaded = any(
+                m.get("name", "").split(":")[0] == self.model.split(":")[0] for m in running
+            )
+        except (urllib.error.URLError, OSError, ValueError):
+            self.model_loaded = None  # Older servers have no /api/ps
+
+        if self.breaker.record_probe_success() and self.on_recover is not None:
+            threading.Thread(target=self.on_recover, name="ollama-recover", daemon=True).start()
+        return True
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.probe()
+
+        def run():
+            while not self.stop_event.wait(self.interval):
+                self.probe()
+
+        self.thread = threading.Thread(target=run, name="ollama-health", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def status_text(self):
+        """One-line status for the UI"""
+        state = self.breaker.state
+        if self.last_probe is None:
+            return "⚪ Ollama: not checked yet"
+        if state == CLOSED:
+            loaded = {True: f", {self.model} loaded", False: f", {self.model} not loaded",
+                      None: ""}[self.model_loaded]
+            version = f" {self.version}" if self.version else ""
+            return f"🟢 Ollama{version} up{loaded}"
+        if state == HALF_OPEN:
+            return "🟡 Ollama: recovering (trial request allowed)"
+        detail = f" ({self.breaker.last_error})" if self.breaker.last_error else ""
+        return f"🔴 Ollama down - serving cached / extractive answers{detail}"
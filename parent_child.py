@@ -0,0 +1,84 @@
+"""
+Parent-child chunking for the Medical Guidelines QA Bot
+Small child chunks (a sentence or two) are embedded and searched, so a match
+is precise; the prompt gets the parent section around each matching child, so
+a recommendation arrives in whole sentences instead of cut mid-sentence at a
+chunk boundary, and without the 200-character overlap repeated between chunks.
+
+Parents are sentence-bounded sections of a page (up to PARENT_CHUNK_SIZE
+characters, no overlap); children are split from their parent. Nothing but
+the children goes into the vector store: each child's metadata carries its
+parent's offset and length on the page (two integers), and parent text is read
+from the compressed chunk text store (see chunk_store.py) only for the final
+top hits.
+"""
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+DEFAULT_PARENT_CHARS = 1000
+DEFAULT_CHILD_CHARS = 250
+DEFAULT_CHILD_OVERLAP = 50
+
+# PDF text has no paragraph breaks and wraps lines mid-sentence, so split at
+# sentence ends first, then at any whitespace
+SENTENCE_SEPARATORS = [r"(?<=[.!?])\s+", r"\s+", ""]
+
+
+def _splitter(chunk_size, chunk_overlap):
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=SENTENCE_SEPARATORS,
+        is_separator_regex=True,
+        keep_separator="end",
+        add_start_index=True,
+    )
+
+
+class ParentChildSplitter:
+    """Drop-in for the ingestion splitter: returns child chunks tagged with their parent"""
+
+    def __init__(self, parent_chars=DEFAULT_PARENT_CHARS, child_chars=DEFAULT_CHILD_CHARS,
+                 child_overlap=DEFAULT_CHILD_OVERLAP):
+        self.parent_splitter = _splitter(parent_chars, 0)
+        self.child_splitter = _splitter(child_chars, child_overlap)
+
+    def split_documents(self, documents):
+        children = []
+        for parent in self.parent_splitter.split_documents(documents):
+            parent_start = parent.metadata["start_index"]
+            for child in self.child_splitter.split_documents([parent]):
+                # Offsets are relative to the page, like ordinary chunks
+                child.metadata["start_index"] += parent_start
+                child.metadata["parent_start"] = parent_start
+                child.metadata["parent_chars"] = len(parent.page_content)
+                children.append(child)
+        return children
+
+
+def parent_documents(children, k):
+    """
+    The distinct parents of ranked child hits, best first, at most `k`.
+    Parents are returned as stored chunks (empty text), to be filled in by
+    ChunkTextStore.hydrate; chunks without a parent are passed through.
+    """
+    parents = []
+    seen = set()
+    for child in children:
+        metadata = child.metadata
+        if "parent_start" not in metadata:
+            parents.append(child)
+        else:
+            key = (metadata.get("source_file"), metadata.get("page"), metadata["parent_start"])
+            if key in seen:
+                continue
+            seen.add(key)
+            parent_metadata = dict(metadata)
+            parent_metadata["start_index"] = metadata["parent_start"]
+            parent_metadata["text_chars"] = metadata["parent_chars"]
+            parents.append(Document(page_content="", metadata=parent_metadata))
+        if len(parents) >= k:
+            break
+    return parents
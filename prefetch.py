@@ -0,0 +1,129 @@
+"""
+Speculative retrieval for the Medical Guidelines QA Bot
+While the user types, the question is embedded and retrieved in the
+background so that retrieval is already done when "Get Answer" is pressed.
+
+- Debounced per browser session: every keystroke replaces the session's
+  pending query and restarts its timer, so superseded text is dropped before
+  any work is done (cancelling costs a dict update).
+- One worker thread runs the due retrievals; results are kept in a small LRU
+  keyed like the answer cache (normalized question, k, retrieval options such
+  as the MMR lambda and collection).
+- clear() drops everything, including retrievals in flight, when the index
+  changes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from query_log import normalize_question
+
+DEFAULT_DEBOUNCE_SECONDS = 0.4
+DEFAULT_MIN_CHARS = 15     # Shorter text is not worth retrieving yet
+DEFAULT_MAX_ENTRIES = 64
+
+
+class RetrievalPrefetcher:
+    """Debounced background retrieval with a result cache"""
+
+    def __init__(self, retrieve, debounce=DEFAULT_DEBOUNCE_SECONDS, min_chars=DEFAULT_MIN_CHARS,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.retrieve = retrieve
+        self.debounce = debounce
+        self.min_chars = min_chars
+        self.max_entries = max_entries
+        self.pending = {}             # session -> (key, query, k, options, due time)
+        self.inflight = {}            # key -> Event set when the retrieval finishes
+        self.results = OrderedDict()  # key -> retrieve() result
+        self.generation = 0           # Bumped by clear(); stale results are discarded
+        self.stats = {"prefetched": 0, "hits": 0, "misses": 0}
+        self.cond = threading.Condition()
+        self.thread = None
+
+    @staticmethod
+    def _key(query, k, options):
+        return normalize_question(query), int(k), tuple(options)
+
+    def submit(self, session, query, k, options=()):
+        """
+        Schedule retrieve(query, k, *options) once the session's text stops
+        changing. `options` must be hashable.
+        """
+        query = (query or "").strip()
+        with self.cond:
+            if len(query) < self.min_chars:
+                self.pending.pop(session, None)
+                return
+            key = self._key(query, k, options)
+            if key in self.results or key in self.inflight:
+                self.pending.pop(session, None)
+                return
+            self.pending[session] = (key, query, int(k), tuple(options),
+                                     time.monotonic() + self.debounce)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="retrieval-prefetch",
+                                               daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def _next_due(self):
+        """Pop the next due pending retrieval, waiting as needed (holds self.cond)"""
+        while True:
+            now = time.monotonic()
+            for session, (key, query, k, options, due) in self.pending.items():
+                if due <= now:
+                    del self.pending[session]
+                    return key, query, k, options
+            next_due = min((item[4] for item in self.pending.values()), default=None)
+            self.cond.wait(None if next_due is None else next_due - now)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                key, query, k, options = self._next_due()
+                if key in self.results or key in self.inflight:
+                    continue
+                done = threading.Event()
+                self.inflight[key] = done
+                generation = self.generation
+            try:
+                result = self.retrieve(query, k, *options)
+            except Exception as e:
+                print(f"Speculative retrieval failed: {e}")
+                result = None
+            with self.cond:
+                self.inflight.pop(key, None)
+                if result is not None and generation == self.generation:
+                    self.results[key] = result
+                    self.results.move_to_end(key)
+                    while len(self.results) > self.max_entries:
+                        self.results.popitem(last=False)
+                    self.stats["prefetched"] += 1
+            done.set()
+
+    def take(self, query, k, options=(), timeout=1.0):
+        """
+        Prefetched result for (query, k, options), or None. A retrieval already running
+        for it is waited on (up to `timeout`) rather than duplicated.
+        """
+        key = self._key(query, k, options)
+        with self.cond:
+            # The question was submitted: its debounced copy is no longer needed
+            for session in [s for s, item in self.pending.items() if item[0] == key]:
+                del self.pending[session]
+            result = self.results.get(key)
+            running = self.inflight.get(key)
+        if result is None and running is not None and running.wait(timeout):
+            with self.cond:
+                result = self.results.get(key)
+        with self.cond:
+            self.stats["hits" if result is not None else "misses"] += 1
+        return result
+
+    def clear(self):
+        """Forget all results and pending work (call whenever the index changes)"""
+        with self.cond:
+            self.pending.clear()
+            self.results.clear()
+            self.generation += 1
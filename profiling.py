@@ -0,0 +1,290 @@
+"""
+On-demand profiling for the Medical Guidelines QA Bot
+Profiles individual answer_question / ingestion calls so a slow request can be
+traced to retrieval, Chroma, LangChain or prompt building.
+
+Modes (env var QABOT_PROFILE, or the toggle in the Manage Documents tab):
+    off       no profiling; the only cost is one global check per request
+    cprofile  deterministic cProfile per request -> <file>.prof (pstats/snakeviz);
+              Python 3.12+ allows only one active cProfile per process, so
+              there this mode falls back to sample
+    sample    stack sampler (QABOT_PROFILE_INTERVAL seconds) -> <file>.collapsed,
+              one "frame;frame;frame count" line per stack, ready for
+              flamegraph.pl or speedscope
+
+Each profile is written to QABOT_PROFILE_DIR (default ./logs/profiles) as
+<timestamp>_<name>_<request id>.*, together with a .txt summary. The request
+ID is also recorded in the query log.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_MODES = ("off", "cprofile", "sample")
+PROFILE_DIR = os.environ.get("QABOT_PROFILE_DIR", "./logs/profiles")
+SAMPLE_INTERVAL = float(os.environ.get("QABOT_PROFILE_INTERVAL", "0.005"))
+SUMMARY_LINES = 40
+# Before 3.12 cProfile hooks sys.setprofile, which is per thread, so every
+# thread segment can run its own profiler. From 3.12 it uses sys.monitoring,
+# which admits one profiler per process.
+CPROFILE_PER_THREAD = sys.version_info < (3, 12)
+
+_mode = os.environ.get("QABOT_PROFILE", "off").strip().lower() or "off"
+if _mode not in PROFILE_MODES:
+    print(f"Unknown QABOT_PROFILE={_mode!r}; profiling disabled")
+    _mode = "off"
+
+_local = threading.local()
+
+
+def get_mode():
+    return _mode
+
+
+def set_mode(mode):
+    """Switch profiling mode at runtime; applies to requests started afterwards"""
+    global _mode
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Profiling mode must be one of {', '.join(PROFILE_MODES)}")
+    _mode = mode
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:12]
+
+
+def session_mode(mode):
+    """The mode a new session actually runs in"""
+    if mode == "cprofile" and not CPROFILE_PER_THREAD:
+        return "sample"
+    return mode
+
+# ============================================================================
+# SESSION
+# ============================================================================
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class ProfileSession:
+    """
+    Profile of one request. Work may hop threads (Gradio resumes generators
+    on pool threads, the Ollama stream and ingestion parser run on their
+    own), so each thread segment attaches itself with enter_thread().
+    """
+
+    def __init__(self, name, request_id, mode, directory=PROFILE_DIR,
+                 interval=SAMPLE_INTERVAL):
+        self.name = name
+        self.request_id = request_id
+        self.mode = mode
+        self.directory = directory
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.threads = {}           # thread ident -> attached segments (sample mode)
+        self.profiles = []          # finished cProfile segments (cprofile mode)
+        self.samples = Counter()    # collapsed stack -> sample count
+        self.stopped = threading.Event()
+        self.sampler = None
+        self.started = None
+        self.elapsed = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.mode == "sample":
+            self.sampler = threading.Thread(target=self._sample, name="profile-sampler",
+                                            daemon=True)
+            self.sampler.start()
+
+    def enter_thread(self):
+        """Attach the calling thread; returns a token for exit_thread()"""
+        previous = getattr(_local, "session", None)
+        _local.session = self
+        profiler = None
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as e:
+                # Another profiler (or debugger/coverage tool) owns the hook:
+                # this segment goes unprofiled rather than failing the request
+                print(f"[profile] {self.request_id}: segment not profiled: {e}")
+                profiler = None
+        else:
+            ident = threading.get_ident()
+            with self.lock:
+                self.threads[ident] = self.threads.get(ident, 0) + 1
+        return previous, profiler
+
+    def exit_thread(self, token):
+        previous, profiler = token
+        if self.mode == "cprofile":
+            if profiler is not None:
+                profiler.disable()
+                with self.lock:
+                    self.profiles.append(profiler)
+        else:
+            ident = threading.get_ident()
+            with self.lock:
+                self.threads[ident] -= 1
+                if not self.threads[ident]:
+                    del self.threads[ident]
+        _local.session = previous
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            with self.lock:
+                idents = [ident for ident in self.threads if ident != own]
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[_collapse(frame)] += 1
+
+    def stop(self):
+        """Stop collecting and write the profile files; returns the base path"""
+        self.elapsed = time.perf_counter() - self.started
+        self.stopped.set()
+        if self.sampler is not None:
+            self.sampler.join()
+        try:
+            path = self.write()
+            print(f"[profile] {self.name} {self.request_id}: {self.elapsed:.2f}s -> {path}")
+            return path
+        except Exception as e:
+            print(f"[profile] could not write profile for {self.request_id}: {e}")
+            return None
+
+    def write(self):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(self.directory, f"{stamp}_{self.name}_{self.request_id}")
+        header = (f"{self.name} request {self.request_id}: {self.elapsed:.3f}s wall, "
+                  f"mode {self.mode}\n\n")
+
+        if self.mode == "cprofile":
+            with self.lock:
+                profiles = list(self.profiles)
+            if not profiles:
+                return None
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(base + ".prof")
+            text = io.StringIO()
+            pstats.Stats(base + ".prof", stream=text).sort_stats("cumulative") \
+                .print_stats(SUMMARY_LINES)
+            summary = text.getvalue()
+            path = base + ".prof"
+        else:
+            samples = self.samples.most_common()
+            with open(base + ".collapsed", "w", encoding="utf-8") as f:
+                for stack, count in samples:
+                    f.write(f"{stack} {count}\n")
+            summary = format_self_time(samples)
+            path = base + ".collapsed"
+
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(header + summary)
+        return path
+
+
+def format_self_time(samples, limit=SUMMARY_LINES):
+    """Leaf frames by sample count: where the time was actually spent"""
+    total = sum(count for _, count in samples)
+    if not total:
+        return "No samples collected\n"
+    leaves = Counter()
+    for stack, count in samples:
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    lines = [f"{total} samples\n", f"{'samples':>8} {'share':>6}  frame"]
+    lines += [f"{count:>8} {count / total:>6.1%}  {frame}"
+              for frame, count in leaves.most_common(limit)]
+    return "\n".join(lines) + "\n"
+
+# ============================================================================
+# HOOKS
+# ============================================================================
+
+@contextmanager
+def profile(name, request_id=None):
+    """Profile the enclosed block (and threads started with bind_thread)"""
+    if _mode == "off" or getattr(_local, "session", None) is not None:
+        yield None
+        return
+    session = ProfileSession(name, request_id or new_request_id(), session_mode(_mode))
+    session.start()
+    token = session.enter_thread()
+    try:
+        yield session
+    finally:
+        session.exit_thread(token)
+        session.stop()
+
+
+def profile_generator(gen, name, request_id):
+    """Profile every resumption of `gen`, whichever thread resumes it"""
+    if _mode == "off":
+        return gen
+    return _profiled(gen, ProfileSession(name, request_id, session_mode(_mode)))
+
+
+def _profiled(gen, session):
+    session.start()
+    try:
+        while True:
+            token = session.enter_thread()
+            try:
+                item = next(gen)
+            except StopIteration:
+                return
+            finally:
+                session.exit_thread(token)
+            yield item
+    finally:
+        gen.close()  # Forward cancellation to the profiled generator
+        session.stop()
+
+
+def bind_thread(target):
+    """Wrap a thread target so it is profiled as part of the caller's session"""
+    session = getattr(_local, "session", None)
+    if session is None:
+        return target
+
+    def run(*args, **kwargs):
+        # Profiling must never take the thread's real work down with it
+        try:
+            token = session.enter_thread()
+        except Exception as e:
+            print(f"[profile] {session.request_id}: thread not profiled: {e}")
+            return target(*args, **kwargs)
+        try:
+            return target(*args, **kwargs)
+        finally:
+            try:
+                session.exit_thread(token)
+            except Exception as e:
+                print(f"[profile] {session.request_id}: {e}")
+    return run
@@ -0,0 +1,244 @@
+"""
+Multi-query expansion for the Medical Guidelines QA Bot
+Clinical questions are often worded differently from the guideline text
+("refer urgently" vs "urgent vascular consultation", "PAD" vs "peripheral
+artery disease"). Instead of raising k, the question is searched in a few
+phrasings and the rankings are fused:
+
+1. Rule-based variants: abbreviations expanded / contracted and common
+   clinical phrasings swapped for guideline wording (no model, microseconds)
+2. Optionally an LLM rewrite into guideline language
+3. The query and its variants embedded in one batch, searched concurrently,
+   fused with reciprocal rank fusion (RRF)
+
+Everything beyond the original query's own search runs under a latency
+budget: variants that are not ready in time are simply left out, and an LLM
+rewrite is skipped while earlier, overrun rewrites still occupy their slots.
+"""
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+DEFAULT_MAX_VARIANTS = 3
+DEFAULT_BUDGET_SECONDS = 0.5
+RRF_K = 60                   # Standard reciprocal rank fusion constant
+REWRITE_BUDGET_SHARE = 0.6   # Share of the budget the LLM rewrite may use
+DEFAULT_MAX_PENDING_REWRITES = 2  # LLM rewrites allowed in flight at once
+
+# Abbreviation -> expansion, as written in the bundled guidelines
+ABBREVIATIONS = {
+    "PAD": "peripheral artery disease",
+    "DFU": "diabetic foot ulcer",
+    "CLTI": "chronic limb-threatening ischaemia",
+    "CLI": "critical limb ischemia",
+    "ALI": "acute limb ischaemia",
+    "IC": "intermittent claudication",
+    "ABI": "ankle-brachial index",
+    "TBI": "toe-brachial index",
+    "TcPO2": "transcutaneous oxygen pressure",
+    "SPP": "skin perfusion pressure",
+    "WIfI": "Wound, Ischemia, and foot Infection classification",
+    "HbA1c": "glycated haemoglobin",
+    "DM": "diabetes mellitus",
+    "SET": "supervised exercise therapy",
+    "SCS": "spinal cord stimulation",
+    "IPC": "intermittent pneumatic compression",
+    "MACE": "major adverse cardiovascular events",
+    "MALE": "major adverse limb events",
+    "GSV": "great saphenous vein",
+    "CTA": "computed tomography angiography",
+    "MRA": "magnetic resonance angiography",
+    "DSA": "digital subtraction angiography",
+}
+
+# Patient / clinician phrasing -> guideline phrasing (regex, replacement)
+SYNONYMS = [
+    (r"\b(be )?referred urgently( for vascular consultation)?\b|\brefer urgently\b",
+     "need urgent vascular consultation"),
+    (r"\burgent(ly)? refer(ral|red)?\b", "urgent vascular consultation"),
+    (r"\bblood sugar\b", "glycaemic control"),
+    (r"\bblood thinners?\b", "antithrombotic therapy"),
+    (r"\bleg pain (when|while) walking\b", "intermittent claudication"),
+    (r"\bpoor circulation\b", "peripheral artery disease"),
+    (r"\bbypass surgery\b", "surgical bypass revascularisation"),
+    (r"\bangioplasty\b|\bstenting\b", "endovascular revascularisation"),
+    (r"\bbedside tests?\b", "non-invasive vascular assessment"),
+    (r"\bscans?\b|(?<!anatomical )\bimaging\b", "anatomical imaging"),
+    (r"\bexamined\b|\bchecked\b|\bscreened\b", "assessed"),
+]
+
+# The guidelines mix British and American spelling
+SPELLINGS = {
+    "ischemia": "ischaemia",
+    "ischemic": "ischaemic",
+    "revascularization": "revascularisation",
+    "hemoglobin": "haemoglobin",
+    "glycemic": "glycaemic",
+    "edema": "oedema",
+}
+SPELLINGS.update({british: american for american, british in list(SPELLINGS.items())})
+
+_ABBREVIATION_PATTERNS = [
+    (re.compile(rf"\b{re.escape(abbr)}\b"), abbr, expansion)
+    for abbr, expansion in ABBREVIATIONS.items()
+]
+_SYNONYM_PATTERNS = [(re.compile(pattern, re.IGNORECASE), replacement)
+                     for pattern, replacement in SYNONYMS]
+_SPELLING_PATTERN = re.compile(r"\b(" + "|".join(SPELLINGS) + r")\b", re.IGNORECASE)
+
+# ============================================================================
+# VARIANTS
+# ============================================================================
+
+def expand_abbreviations(query):
+    """Abbreviations written out, and written-out terms given their abbreviation"""
+    expanded = query
+    for pattern, abbr, expansion in _ABBREVIATION_PATTERNS:
+        spelled_out = re.search(rf"\b{re.escape(expansion)}\b", expanded, re.IGNORECASE)
+        if pattern.search(expanded):
+            if not spelled_out:
+                expanded = pattern.sub(f"{expansion} ({abbr})", expanded)
+        elif spelled_out:
+            expanded = (expanded[:spelled_out.end()] + f" ({abbr})"
+                        + expanded[spelled_out.end():])
+    return expanded
+
+
+def substitute_synonyms(query):
+    """Clinical phrasings replaced by the wording guidelines use"""
+    rewritten = query
+    for pattern, replacement in _SYNONYM_PATTERNS:
+        rewritten = pattern.sub(replacement, rewritten)
+    return rewritten
+
+
+def swap_spelling(query):
+    """British spellings made American and vice versa"""
+    return _SPELLING_PATTERN.sub(lambda m: SPELLINGS[m.group(0).lower()], query)
+
+
+def rule_based_variants(query, max_variants=DEFAULT_MAX_VARIANTS):
+    """Up to `max_variants` distinct rephrasings of `query` (not including it)"""
+    candidates = [
+        expand_abbreviations(query),
+        substitute_synonyms(query),
+        swap_spelling(substitute_synonyms(expand_abbreviations(query))),
+    ]
+    variants = []
+    seen = {" ".join(query.lower().split())}
+    for candidate in candidates:
+        normalized = " ".join(candidate.lower().split())
+        if normalized not in seen:
+            seen.add(normalized)
+            variants.append(candidate)
+    return variants[:max_variants]
+
+# ============================================================================
+# FUSION
+# ============================================================================
+
+def chunk_key(doc):
+    """Identity of a chunk across result lists"""
+    metadata = doc.metadata
+    return (metadata.get("source_file"), metadata.get("page"), metadata.get("start_index"),
+            doc.page_content)
+
+
+def reciprocal_rank_fusion(rankings, k):
+    """Top `k` documents by RRF score; the first ranking wins ties"""
+    scores = {}
+    docs = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = chunk_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            docs.setdefault(key, doc)
+    order = {key: i for i, key in enumerate(docs)}
+    best = sorted(scores, key=lambda key: (-scores[key], order[key]))[:k]
+    return [docs[key] for key in best]
+
+# ============================================================================
+# SEARCH
+# ============================================================================
+
+class MultiQuerySearcher:
+    """Searches a query and its variants concurrently and fuses the results"""
+
+    def __init__(self, max_variants=DEFAULT_MAX_VARIANTS, budget_seconds=DEFAULT_BUDGET_SECONDS,
+                 rewrite=None, max_pending_rewrites=DEFAULT_MAX_PENDING_REWRITES):
+        self.max_variants = max_variants
+        self.budget_seconds = budget_seconds
+        self.rewrite = rewrite  # Optional callable(query) -> str or None (e.g. an LLM rewrite)
+        # Variant searches only: the original query is searched on the calling
+        # thread, so it never queues behind other requests' variants
+        self.executor = ThreadPoolExecutor(max_workers=max_variants + 1,
+                                           thread_name_prefix="multi-query")
+        # Rewrites that overrun the budget are abandoned but keep running;
+        # while this many are still out, new requests skip the rewrite
+        self.rewrite_executor = ThreadPoolExecutor(max_workers=max_pending_rewrites,
+                                                   thread_name_prefix="query-rewrite")
+        self.rewrite_slots = threading.BoundedSemaphore(max_pending_rewrites)
+
+    def _submit_rewrite(self, query):
+        if self.rewrite is None or not self.rewrite_slots.acquire(blocking=False):
+            return None
+        future = self.rewrite_executor.submit(self.rewrite, query)
+        future.add_done_callback(lambda _: self.rewrite_slots.release())
+        return future
+
+    def _rewritten(self, query, rewrite_future, deadline):
+        """The rewrite if it is ready by its share of the budget, else None"""
+        if rewrite_future is None:
+            return None
+        rewrite_deadline = deadline - self.budget_seconds * (1 - REWRITE_BUDGET_SHARE)
+        done, _ = wait([rewrite_future], timeout=max(0.0, rewrite_deadline - time.monotonic()))
+        if not done or rewrite_future.exception() is not None:
+            return None
+        rewritten = (rewrite_future.result() or "").strip()
+        if rewritten and rewritten.lower() != query.lower():
+            return rewritten
+        return None
+
+    def search(self, query, embeddings, search_by_vector, k, fetch_k=None):
+        """
+        Returns (fused top-`k` chunks for `query`, the query's embedding, stats).
+        `search_by_vector(vector, n)` returns the n nearest chunks. The query
+        and its rule-based variants are embedded in one batch; the original
+        query's results are always used, variants only if they finish within
+        the budget.
+        """
+        start = time.monotonic()
+        deadline = start + self.budget_seconds
+        fetch_k = fetch_k or k * 2
+        rewrite_future = self._submit_rewrite(query)
+
+        variants = rule_based_variants(query, self.max_variants)
+        vectors = embeddings.embed_documents([query] + variants)
+        query_vector = vectors[0]
+        futures = [self.executor.submit(search_by_vector, vector, fetch_k)
+                   for vector in vectors[1:]]
+        original = search_by_vector(query_vector, fetch_k)
+
+        rewritten = self._rewritten(query, rewrite_future, deadline)
+        if rewritten is not None and time.monotonic() < deadline:
+            variants = [rewritten] + variants
+            futures.insert(0, self.executor.submit(search_by_vector,
+                                                   embeddings.embed_query(rewritten), fetch_k))
+
+        rankings = [original]
+        done, late = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        for future in late:
+            future.cancel()  # Frees the pool if it has not started yet
+        for future in futures:  # Keep variant order for deterministic tie-breaks
+            if future in done and future.exception() is None:
+                rankings.append(future.result())
+
+        stats = {
+            "variants": variants,
+            "fused": len(rankings) - 1,
+            "late": len(late),
+            "elapsed": time.monotonic() - start,
+        }
+        return reciprocal_rank_fusion(rankings, k), query_vector, stats
@@ -0,0 +1,124 @@
+"""
+Query log for the Medical Guidelines QA Bot
+Append-only JSON-lines record of every question asked, written by a
+background thread so logging never adds latency to an answer.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+
+
+def normalize_question(question):
+    """Canonical form used for cache keys and frequency counts"""
+    return " ".join(question.lower().split())
+
+
+class QueryLog:
+    """Append-only query log with a non-blocking writer"""
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.Queue()
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="query-log-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            batch = [record]
+            # Drain whatever else is queued so bursts become one write
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for item in batch:
+                        f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"Warning: could not write query log: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def log(self, question, k, latency, cache_hit, sources=(), **extra):
+        """
+        Record one answered question (returns immediately).
+
+        Args:
+            question: The question as typed by the user
+            k: Number of sources requested
+            latency: Seconds taken to produce the answer
+            cache_hit: Whether the answer came from the answer cache
+            sources: Iterable of "file p.N" labels used for the answer
+            extra: Additional JSON-serializable fields (e.g. status="timeout")
+        """
+        self._ensure_writer()
+        self._queue.put({
+            "ts": time.time(),
+            "question": question,
+            "k": int(k),
+            "latency": round(latency, 4),
+            "cache_hit": bool(cache_hit),
+            "sources": list(sources),
+            **extra,
+        })
+
+    def flush(self):
+        """Block until all queued records are on disk"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def read_records(self, max_age_days=None, max_records=10000):
+        """Return the most recent log records (newest last)"""
+        if not os.path.exists(self.path):
+            return []
+        cutoff = time.time() - max_age_days * 86400 if max_age_days else None
+        records = deque(maxlen=max_records)
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Tolerate a torn last line
+                if cutoff is None or record.get("ts", 0) >= cutoff:
+                    records.append(record)
+        return list(records)
+
+    def hot_questions(self, limit=10, max_age_days=7):
+        """
+        Most frequently asked recent questions, counted per answer-cache key
+        (question, k, MMR lambda, collection).
+
+        Returns:
+            List of (question, k, mmr_lambda, collection) tuples, most frequent
+            first; mmr_lambda and collection are None where older records lack them
+        """
+        counts = Counter()
+        latest = {}
+        for record in self.read_records(max_age_days=max_age_days):
+            question = normalize_question(record.get("question", ""))
+            if not question:
+                continue
+            entry = (record["question"], record.get("k", 3), record.get("mmr_lambda"),
+                     record.get("collection"))
+            key = (question,) + entry[1:]
+            counts[key] += 1
+            latest[key] = entry
+        return [latest[key] for key, _ in counts.most_common(limit)]
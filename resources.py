@@ -0,0 +1,249 @@
+"""
+CPU resource governor for the Medical Guidelines QA Bot
+On CPU-only machines the embedding model (torch / BLAS / ONNX) and the
+co-located Ollama server both default to one thread per core, so embedding a
+query while Ollama generates oversubscribes the CPU and slows both down.
+
+This module:
+- caps native thread pools (torch intra-op, OpenMP/BLAS, ONNX Runtime)
+- optionally pins this process to a set of cores, leaving the rest to Ollama
+- applies separate thread budgets to query-time and ingestion embedding
+  (CPU embedding only: with EMBEDDING_DEVICE = "cuda" the model runs on the
+  GPU and these pools do not do the work)
+- has a benchmark mode that measures embedding throughput under contention
+
+Usage:
+    python3 resources.py --benchmark --threads 1 2 4 8 --contention burn
+    python3 resources.py --benchmark --contention ollama
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+from langchain_core.embeddings import Embeddings
+
+# Environment variables read by the native thread pools when they start
+# (OpenMP builds of ONNX Runtime also honour OMP_NUM_THREADS)
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+
+def available_cpus():
+    """Cores this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def set_thread_env(threads):
+    """
+    Default thread counts for native libraries. Only effective for libraries
+    not yet initialized, so call it before torch / numpy are imported.
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ.setdefault(name, str(threads))
+
+
+def pin_process(cpus):
+    """
+    Restrict this process (and threads it creates later) to `cpus`.
+    Call early, before worker threads start; no-op where unsupported.
+    """
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        return False
+    os.sched_setaffinity(0, set(cpus))
+    return True
+
+
+def _set_native_threads(threads):
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=threads)
+    except ImportError:
+        pass
+
+
+class ThreadGovernor:
+    """
+    Sets the (process-global) native thread pools to one budget per mode: the
+    ingestion budget while any ingestion run is in progress, the query budget
+    otherwise. The budget changes only when a run starts or ends, not per
+    embedding call, so concurrent queries and ingestion batches do not keep
+    resetting each other's thread count; questions asked during an ingestion
+    run are embedded with the ingestion budget.
+    """
+
+    def __init__(self, query_threads=2, ingest_threads=None):
+        self.budgets = {
+            "query": query_threads or available_cpus(),
+            "ingest": ingest_threads or available_cpus(),
+        }
+        self.runs = 0  # Ingestion runs in progress
+        self.current = None
+        self.lock = threading.Lock()
+
+    def configure(self, query_threads=None, ingest_threads=None):
+        """Set the budgets; None means all cores available to this process"""
+        with self.lock:
+            self.budgets["query"] = query_threads or available_cpus()
+            self.budgets["ingest"] = ingest_threads or available_cpus()
+            self.current = None
+
+    def _apply(self):
+        threads = self.budgets["ingest" if self.runs else "query"]
+        if threads != self.current:
+            _set_native_threads(threads)
+            self.current = threads
+
+    def apply(self):
+        """Bring the native pools to the current mode's budget (a no-op once they are)"""
+        with self.lock:
+            self._apply()
+
+    @contextmanager
+    def ingesting(self):
+        """Run the enclosed ingestion run under the ingestion budget"""
+        with self.lock:
+            self.runs += 1
+            self._apply()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.runs -= 1
+                self._apply()
+
+
+governor = ThreadGovernor()
+
+
+class GovernedEmbeddings(Embeddings):
+    """Embeddings wrapper that makes sure the governor's budget is in place before every call"""
+
+    def __init__(self, base, thread_governor=governor):
+        self.base = base
+        self.governor = thread_governor
+
+    def embed_documents(self, texts):
+        self.governor.apply()
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.governor.apply()
+        return self.base.embed_query(text)
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _burn(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(10000))
+
+
+def _start_burners(workers):
+    """CPU-bound processes standing in for a busy Ollama"""
+    import multiprocessing
+    stop = multiprocessing.Event()
+    procs = [multiprocessing.Process(target=_burn, args=(stop,), daemon=True)
+             for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    return lambda: (stop.set(), [proc.join() for proc in procs])
+
+
+def _start_ollama_load(results):
+    """Keep Ollama generating in the background, recording its tokens/sec"""
+    import local_qabot
+    stop = threading.Event()
+
+    def run():
+        llm = local_qabot.get_local_llm(num_predict=128)
+        handler = local_qabot.OllamaStatsHandler()
+        while not stop.is_set():
+            llm.invoke("Summarize the management of diabetic foot ulcers in detail.",
+                       config={"callbacks": [handler]})
+            stats = handler.stats
+            if stats.get("eval_duration"):
+                results.append(stats["eval_count"] / (stats["eval_duration"] / 1e9))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return lambda: (stop.set(), thread.join())
+
+
+def run_benchmark(thread_counts, contention="none", num_texts=256, burn_workers=None,
+                  rounds=2):
+    """Embedding throughput for each thread count, optionally under CPU contention"""
+    import time
+    import local_qabot
+
+    pages = local_qabot.load_all_pdfs_from_directory(local_qabot.PDF_DIRECTORY)
+    texts = [c.page_content for c in local_qabot.text_splitter_func(pages)][:num_texts]
+    embeddings = local_qabot.get_local_embeddings(device="cpu")
+    embeddings.embed_documents(texts[:8])  # Load weights before timing
+
+    ollama_rates = []
+    stop_load = None
+    if contention == "burn":
+        stop_load = _start_burners(burn_workers or available_cpus())
+    elif contention == "ollama":
+        stop_load = _start_ollama_load(ollama_rates)
+        time.sleep(5)  # Let the model load and start generating
+
+    print(f"\nEmbedding {len(texts)} chunks, contention: {contention}")
+    print(f"{'threads':>8} {'chunks/s':>10} {'query ms':>9}" +
+          (f" {'ollama tok/s':>13}" if contention == "ollama" else ""))
+    try:
+        for threads in thread_counts:
+            _set_native_threads(threads)
+            seen = len(ollama_rates)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                embeddings.embed_documents(texts)
+            rate = rounds * len(texts) / (time.perf_counter() - start)
+            start = time.perf_counter()
+            for question in local_qabot.EXAMPLE_QUESTIONS:
+                embeddings.embed_query(question)
+            query_ms = (time.perf_counter() - start) * 1000 / len(local_qabot.EXAMPLE_QUESTIONS)
+            line = f"{threads:>8} {rate:>10.1f} {query_ms:>9.1f}"
+            if contention == "ollama":
+                recent = ollama_rates[seen:] or ollama_rates[-1:]
+                line += f" {sum(recent) / len(recent):>13.1f}" if recent else f" {'n/a':>13}"
+            print(line)
+    finally:
+        if stop_load is not None:
+            stop_load()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="CPU thread governor benchmark")
+    parser.add_argument("--benchmark", action="store_true", help="Run the throughput benchmark")
+    parser.add_argument("--threads", nargs="+", type=int,
+                        default=sorted({1, 2, 4, available_cpus()}))
+    parser.add_argument("--contention", choices=["none", "burn", "ollama"], default="none",
+                        help="burn: CPU-bound processes; ollama: real background generation")
+    parser.add_argument("--burn-workers", type=int, help="Processes for --contention burn")
+    parser.add_argument("--num-texts", type=int, default=256)
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        return
+    run_benchmark(args.threads, args.contention, args.num_texts, args.burn_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Sharded vector index for the Medical Guidelines QA Bot
+Keeps one Chroma collection per source PDF instead of one collection for the
+whole corpus:
+
+- Adding, changing or removing a guideline rebuilds only that guideline's
+  shard; the others stay untouched.
+- A search fans out to all shards concurrently on a thread pool and the
+  per-shard hits are merged by distance into the global top-k.
+
+All shards live in one persist directory (one Chroma client, one collection
+each). shards.json maps source files to collection names; every shard has its
+own ingestion checkpoint (see ingestion.py).
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_chroma import Chroma
+
+from mmr import query_candidates
+
+MANIFEST_FILENAME = "shards.json"
+CHECKPOINT_DIRNAME = "checkpoints"
+DEFAULT_SEARCH_WORKERS = 8
+
+
+def shard_name(source_file):
+    """Valid, stable Chroma collection name for a source file"""
+    stem = re.sub(r"[^A-Za-z0-9_-]+", "-", os.path.splitext(source_file)[0]).strip("-_")
+    digest = hashlib.sha1(source_file.encode("utf-8")).hexdigest()[:10]
+    return f"shard-{stem[:40]}-{digest}"
+
+
+class ShardedIndex:
+    """
+    A set of per-source-file Chroma collections searched as one index.
+
+    Offers the parts of the langchain Chroma interface the QA pipeline uses
+    (`embeddings`, similarity_search, similarity_search_by_vector) plus
+    query_candidates() for MMR, count() and shard management.
+    """
+
+    def __init__(self, directory, embedding_function, max_workers=DEFAULT_SEARCH_WORKERS):
+        self.directory = directory
+        self.embeddings = embedding_function
+        self.manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+        self.checkpoint_directory = os.path.join(directory, CHECKPOINT_DIRNAME)
+        os.makedirs(self.checkpoint_directory, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="shard-search")
+        self.shards = {}  # source file -> Chroma
+        for source_file in self._read_manifest():
+            self.shards[source_file] = self._open(source_file)
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({source_file: shard_name(source_file) for source_file in list(self.shards)},
+                      f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _open(self, source_file):
+        return Chroma(
+            collection_name=shard_name(source_file),
+            persist_directory=self.directory,
+            embedding_function=self.embeddings,
+            collection_metadata={"source_file": source_file},
+        )
+
+    # ------------------------------------------------------------------------
+    # Shard management
+    # ------------------------------------------------------------------------
+
+    def source_files(self):
+        return set(self.shards)
+
+    def checkpoint_path(self, source_file):
+        return os.path.join(self.checkpoint_directory, shard_name(source_file) + ".json")
+
+    def shard(self, source_file):
+        """The shard for `source_file`, created empty if missing"""
+        if source_file not in self.shards:
+            self.shards[source_file] = self._open(source_file)
+            self._write_manifest()
+        return self.shards[source_file]
+
+    def drop_shard(self, source_file):
+        """Delete a shard's vectors and checkpoint"""
+        vectordb = self.shards.pop(source_file, None) or self._open(source_file)
+        vectordb.delete_collection()
+        checkpoint_path = self.checkpoint_path(source_file)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self._write_manifest()
+
+    def reset_shard(self, source_file):
+        """Empty shard for a rebuild of `source_file`"""
+        self.drop_shard(source_file)
+        return self.shard(source_file)
+
+    def count(self):
+        # Snapshot the shards: an ingest job may add or drop shards meanwhile
+        return sum(vectordb._collection.count() for vectordb in list(self.shards.values()))
+
+    # ------------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------------
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        """Global top-k (Document, distance) pairs across all shards, nearest first"""
+        shards = list(self.shards.values())
+        if not shards:
+            return []
+        if len(shards) == 1:
+            return shards[0].similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+        futures = [
+            self.executor.submit(vectordb.similarity_search_by_vector_with_relevance_scores,
+                                 embedding, k=k)
+            for vectordb in shards
+        ]
+        # Every shard uses the same embedding model and distance, so scores compare directly
+        hits = [hit for future in futures for hit in future.result()]
+        return heapq.nsmallest(k, hits, key=lambda hit: hit[1])
+
+    def query_candidates(self, embedding, fetch_k):
+        """Global nearest `fetch_k` chunks with their vectors, as mmr.query_candidates"""
+        futures = [self.executor.submit(query_candidates, vectordb, embedding, fetch_k)
+                   for vectordb in list(self.shards.values())]
+        hits = []
+        for future in futures:
+            docs, vectors, distances = future.result()
+            hits += zip(distances, docs, vectors)
+        best = heapq.nsmallest(fetch_k, hits, key=lambda hit: hit[0])
+        return ([doc for _, doc, _ in best],
+                np.asarray([vector for _, _, vector in best], dtype=np.float32),
+                [distance for distance, _, _ in best])
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search(self, query, k=4):
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k)
@@ -0,0 +1,315 @@
+"""
+Index snapshots for the Medical Guidelines QA Bot
+Packs the vector database (chunks, vectors, metadata), a manifest of the
+source PDFs and the embedding model identifier into one versioned,
+checksummed, compressed file, so a new node can load a ready index instead
+of re-embedding the corpus.
+
+File layout:
+    8 bytes   magic b"QABOTSNP"
+    2 bytes   format version (uint16, little endian)
+    4 bytes   header length (uint32)
+    N bytes   header (UTF-8 JSON: model, counts, manifest, payload checksum)
+    rest      zlib-compressed payload:
+                  8 bytes  records length (uint64)
+                  M bytes  records (UTF-8 JSON: ids, documents, metadatas)
+                  rest     vectors (float32, count x dimensions)
+
+Usage:
+    python3 snapshot.py export --output index_snapshot.qabot
+    python3 snapshot.py info index_snapshot.qabot
+    python3 snapshot.py import index_snapshot.qabot
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+MAGIC = b"QABOTSNP"
+FORMAT_VERSION = 1
+IMPORT_BATCH_SIZE = 1000  # Records per Chroma upsert
+
+
+class SnapshotError(ValueError):
+    """Raised for corrupt, incompatible or mismatched snapshots"""
+
+# ============================================================================
+# MANIFEST
+# ============================================================================
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pdf_manifest(directory):
+    """Name, size and checksum of every PDF the index was built from"""
+    return [
+        {
+            "file": os.path.basename(path),
+            "bytes": os.path.getsize(path),
+            "sha256": file_sha256(path),
+        }
+        for path in sorted(glob.glob(os.path.join(directory, "*.pdf")))
+    ]
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def export_snapshot(vectordb, path, embedding_model, manifest, extra=None, level=6,
+                    text_store=None):
+    """
+    Write the contents of a Chroma vector store to a snapshot file.
+
+    Args:
+        vectordb: langchain Chroma instance to export
+        path: Output file
+        embedding_model: Identifier of the model that produced the vectors
+        manifest: Source-file manifest (see pdf_manifest)
+        extra: Optional dict of settings to record in the header (chunk size, ...)
+        text_store: ChunkTextStore holding the chunk text, if it is not kept in Chroma
+
+    Returns:
+        The snapshot header
+    """
+    data = vectordb._collection.get(include=["embeddings", "documents", "metadatas"])
+    ids = list(data["ids"])
+    if not ids:
+        raise SnapshotError("Vector database is empty - nothing to export")
+
+    vectors = np.asarray(data["embeddings"], dtype=np.float32)
+    documents = list(data["documents"])
+    if text_store is not None:
+        # Snapshots are self-contained: resolve text kept in the chunk store
+        documents = [
+            text_store.chunk_text(metadata) if not document and "text_chars" in (metadata or {})
+            else document
+            for document, metadata in zip(documents, data["metadatas"])
+        ]
+    records = json.dumps({
+        "ids": ids,
+        "documents": documents,
+        "metadatas": list(data["metadatas"]),
+    }, ensure_ascii=False).encode("utf-8")
+
+    raw = struct.pack("<Q", len(records)) + records + vectors.tobytes()
+    payload = zlib.compress(raw, level)
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "embedding_model": embedding_model,
+        "dimensions": int(vectors.shape[1]),
+        "count": len(ids),
+        "compression": "zlib",
+        "payload_bytes": len(payload),
+        "raw_bytes": len(raw),
+        "payload_sha256": hashlib.sha256(payload).hexdigest(),
+        "manifest": manifest,
+        **(extra or {}),
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<HI", FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(payload)
+    os.replace(tmp_path, path)  # Never leave a half-written snapshot behind
+    return header
+
+# ============================================================================
+# IMPORT
+# ============================================================================
+
+def read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise SnapshotError("Not a QA bot index snapshot")
+    version, header_length = struct.unpack("<HI", f.read(6))
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format version {version} "
+                            f"(expected {FORMAT_VERSION})")
+    return json.loads(f.read(header_length).decode("utf-8"))
+
+
+def read_snapshot_header(path):
+    with open(path, "rb") as f:
+        return read_header(f)
+
+
+def read_snapshot(path, expected_model=None):
+    """
+    Read and verify a snapshot.
+
+    Args:
+        path: Snapshot file
+        expected_model: If given, refuse snapshots built with a different embedding model
+
+    Returns:
+        (header, ids, documents, metadatas, vectors)
+    """
+    with open(path, "rb") as f:
+        header = read_header(f)
+        if expected_model and header["embedding_model"] != expected_model:
+            raise SnapshotError(
+                f"Snapshot was built with embedding model '{header['embedding_model']}' "
+                f"but this node uses '{expected_model}'"
+            )
+        payload = f.read()
+
+    if len(payload) != header["payload_bytes"] or \
+            hashlib.sha256(payload).hexdigest() != header["payload_sha256"]:
+        raise SnapshotError("Snapshot checksum mismatch - file is corrupt or truncated")
+
+    raw = zlib.decompress(payload)
+    (records_length,) = struct.unpack_from("<Q", raw)
+    records = json.loads(raw[8:8 + records_length].decode("utf-8"))
+    vectors = np.frombuffer(raw, dtype=np.float32, offset=8 + records_length)
+    vectors = vectors.reshape(header["count"], header["dimensions"])
+    return header, records["ids"], records["documents"], records["metadatas"], vectors
+
+
+def check_snapshot(header, manifest, settings=None):
+    """
+    Compare a snapshot with the PDFs and ingest settings of this node.
+
+    Args:
+        header: Snapshot header
+        manifest: pdf_manifest() of the local PDF directory
+        settings: Ingest settings this node builds with (None = not checked)
+
+    Returns:
+        Names of local PDFs the snapshot does not cover (to be embedded after import)
+
+    Raises:
+        SnapshotError if the snapshot holds chunks of PDFs that are missing or
+        different here, or was chunked with other settings
+    """
+    if settings is not None:
+        recorded = header.get("ingest_settings")
+        if recorded is None:
+            # Older snapshots record only the chunking
+            recorded = {key: header[key] for key in ("chunk_size", "chunk_overlap") if key in header}
+            settings = {key: settings.get(key) for key in recorded}
+        differing = sorted(key for key in set(recorded) | set(settings)
+                           if recorded.get(key) != settings.get(key))
+        if differing:
+            raise SnapshotError(f"Snapshot was built with other ingest settings "
+                                f"({', '.join(differing)})")
+    local = {item["file"]: item["sha256"] for item in manifest}
+    mismatched = [item["file"] for item in header["manifest"]
+                  if local.get(item["file"]) != item["sha256"]]
+    if mismatched:
+        raise SnapshotError(f"Snapshot was built from PDFs that are missing or different here: "
+                            f"{', '.join(mismatched)}")
+    covered = {item["file"] for item in header["manifest"]}
+    return sorted(name for name in local if name not in covered)
+
+
+def import_snapshot(path, persist_directory, embedding_function, expected_model,
+                    manifest=None, settings=None):
+    """
+    Load a snapshot into a (new) persistent Chroma store without re-embedding.
+    With `manifest` (and `settings`) the snapshot is first checked against
+    this node (see check_snapshot).
+
+    Returns:
+        (vectordb, header, names of local PDFs the snapshot does not cover)
+    """
+    from langchain_chroma import Chroma
+
+    uncovered = []
+    if manifest is not None:
+        # Refuse before decompressing the payload
+        uncovered = check_snapshot(read_snapshot_header(path), manifest, settings)
+    header, ids, documents, metadatas, vectors = read_snapshot(path, expected_model)
+    vectordb = Chroma(persist_directory=persist_directory, embedding_function=embedding_function)
+    for i in range(0, len(ids), IMPORT_BATCH_SIZE):
+        end = i + IMPORT_BATCH_SIZE
+        vectordb._collection.upsert(
+            ids=ids[i:end],
+            embeddings=vectors[i:end].tolist(),
+            documents=documents[i:end],
+            metadatas=metadatas[i:end],
+        )
+    return vectordb, header, uncovered
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+def describe(header):
+    size_mb = header["payload_bytes"] / (1024 * 1024)
+    lines = [
+        f"Format version:  {header['format_version']}",
+        f"Created:         {header['created_at']}",
+        f"Embedding model: {header['embedding_model']} ({header['dimensions']} dims)",
+        f"Chunks:          {header['count']}",
+        f"Payload:         {size_mb:.1f} MB ({header['compression']}, "
+        f"{header['payload_bytes'] / header['raw_bytes']:.0%} of raw)",
+    ]
+    if "chunk_size" in header:
+        lines.append(f"Chunking:        {header['chunk_size']} chars, "
+                     f"{header['chunk_overlap']} overlap")
+    lines.append(f"Source files:    {len(header['manifest'])}")
+    lines += [f"  - {item['file']} ({item['bytes'] / (1024 * 1024):.2f} MB)"
+              for item in header["manifest"]]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export/import vector index snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export", help="Write the current index to a snapshot")
+    export_parser.add_argument("--output", help="Snapshot file (default: SNAPSHOT_PATH)")
+    info_parser = sub.add_parser("info", help="Show a snapshot's header")
+    info_parser.add_argument("path")
+    import_parser = sub.add_parser("import", help="Load a snapshot into VECTOR_DB_DIRECTORY")
+    import_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        print(describe(read_snapshot_header(args.path)))
+        return
+
+    # The app module is only needed (and only imported) for export/import
+    import local_qabot
+
+    if args.command == "export":
+        output = args.output or local_qabot.SNAPSHOT_PATH
+        vectordb = local_qabot.create_or_load_vector_database(force_recreate=False)
+        start = time.perf_counter()
+        header = local_qabot.export_index_snapshot(vectordb, output)
+        print(f"Snapshot written to {output} in {time.perf_counter() - start:.1f}s")
+        print(describe(header))
+    else:
+        if local_qabot.vector_db_exists():
+            raise SystemExit(f"{local_qabot.VECTOR_DB_DIRECTORY} already holds an index; "
+                             "remove it before importing a snapshot")
+        start = time.perf_counter()
+        try:
+            vectordb, header, uncovered = local_qabot.import_index_snapshot(
+                args.path, embedding_function=local_qabot.get_local_embeddings())
+        except SnapshotError as e:
+            raise SystemExit(f"Snapshot refused: {e}")
+        print(f"Imported {vectordb._collection.count()} chunks in "
+              f"{time.perf_counter() - start:.1f}s")
+        print(describe(header))
+        if uncovered:
+            print(f"Not in the snapshot, embedded at the next start: {', '.join(uncovered)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import pytest
+
+local_qabot = pytest.importorskip("local_qabot")
+
+from langchain_core.documents import Document
+
+from ollama_health import CircuitBreaker
+from query_log import QueryLog
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """local_qabot with retrieval and Ollama replaced by fakes"""
+    monkeypatch.setattr(local_qabot, "global_vectordb", object())
+    monkeypatch.setattr(local_qabot, "PREFETCH_ENABLED", False)
+    monkeypatch.setattr(local_qabot, "INSTANT_ANSWER_ENABLED", False)
+    monkeypatch.setattr(local_qabot, "SHOW_LLM_TIMINGS", True)
+    monkeypatch.setattr(local_qabot, "ollama_breaker", CircuitBreaker())
+    monkeypatch.setattr(local_qabot, "query_log", QueryLog(str(tmp_path / "queries.jsonl")))
+    monkeypatch.setattr(local_qabot.collection_registry, "is_loaded",
+                        lambda name: name == local_qabot.DEFAULT_COLLECTION)
+    retrieved = []
+
+    def retrieve_sources(query, k, mmr_lambda, collection):
+        retrieved.append((query, k, mmr_lambda, collection))
+        doc = Document(page_content="Refer within two weeks.",
+                       metadata={"source_file": "g.pdf", "page": 4})
+        return [doc], None
+
+    def stream_llm_tokens(prompt, timeout, cancel_event, callbacks=()):
+        callbacks[0].stats = {"eval_duration": 2e9, "eval_count": 40}
+        yield "Refer urgently."
+
+    monkeypatch.setattr(local_qabot, "retrieve_sources", retrieve_sources)
+    monkeypatch.setattr(local_qabot, "stream_llm_tokens", stream_llm_tokens)
+    local_qabot.clear_answer_cache()
+    yield retrieved
+    local_qabot.clear_answer_cache()
+
+
+def final_answer(*args):
+    return list(local_qabot.answer_question(*args))[-1]
+
+
+def test_cached_answers_do_not_replay_timings(app):
+    first = final_answer("When to refer?", 3)
+    assert "Refer urgently." in first and "_Timing:" in first
+    cached = local_qabot.get_cached_answer("When to refer?", 3)[0]
+    assert "_Timing:" not in cached
+    assert final_answer("when to  refer?", 3) == cached
+    assert len(app) == 1
+
+
+def test_prewarm_replays_the_logged_cache_key(app):
+    log = local_qabot.query_log
+    log.log("When to refer?", 5, 0.1, False, mmr_lambda=0.5,
+            collection=local_qabot.DEFAULT_COLLECTION)
+    log.log("When to refer?", 5, 0.1, False, mmr_lambda=0.5, collection="not-loaded")
+    log.flush()
+    local_qabot.prewarm(log.hot_questions())
+    assert app == [("When to refer?", 5, 0.5, local_qabot.DEFAULT_COLLECTION)]
+    assert local_qabot.get_cached_answer("When to refer?", 5, 0.5) is not None
@@ -0,0 +1,113 @@
+import random
+import threading
+import time
+import urllib.error
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+import batched_embeddings
+from batched_embeddings import BatchedEmbeddings, is_rate_limit_error
+from mock_embedding_server import MockEmbeddingClient, fake_embedding, start_mock_server
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class FlakyEmbeddings:
+    """Fails the first `failures` calls with `error`, then embeds each text as [len(text)]"""
+
+    def __init__(self, failures=0, error=RateLimited("slow down"), delay=0.0):
+        self.failures = failures
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.calls += 1
+            if self.calls <= self.failures:
+                raise self.error
+        time.sleep(random.random() * self.delay)  # Batches finish out of order
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(batched_embeddings.time, "sleep", recorded.append)
+    return recorded
+
+
+def test_output_order_matches_input_across_concurrent_batches():
+    texts = ["x" * n for n in range(1, 101)]
+    embedder = BatchedEmbeddings(FlakyEmbeddings(delay=0.01), batch_size=7, max_concurrency=4)
+    assert embedder.embed_documents(texts) == [[float(n)] for n in range(1, 101)]
+
+
+def test_rate_limited_batches_are_retried_with_capped_backoff(sleeps):
+    base = FlakyEmbeddings(failures=8)
+    embedder = BatchedEmbeddings(base, batch_size=4, max_concurrency=1, max_retries=8,
+                                 backoff_seconds=0.5)
+    assert embedder.embed_documents(["a", "bb"]) == [[1.0], [2.0]]
+    assert embedder.retries == 8 and base.calls == 9
+    # Each delay is the doubled backoff (capped) plus up to 100% jitter
+    expected = [min(0.5 * 2 ** i, batched_embeddings.MAX_BACKOFF_SECONDS) for i in range(8)]
+    assert expected[-1] == batched_embeddings.MAX_BACKOFF_SECONDS
+    for delay, floor in zip(sleeps, expected):
+        assert floor <= delay < 2 * floor
+
+
+def test_retries_give_up_after_max_retries(sleeps):
+    embedder = BatchedEmbeddings(FlakyEmbeddings(failures=10), max_retries=3)
+    with pytest.raises(RateLimited):
+        embedder.embed_documents(["a"])
+    assert embedder.retries == 3 and len(sleeps) == 3
+
+
+def test_other_errors_are_not_retried(sleeps):
+    base = FlakyEmbeddings(failures=1, error=ValueError("bad input"))
+    with pytest.raises(ValueError):
+        BatchedEmbeddings(base).embed_documents(["a"])
+    assert base.calls == 1 and sleeps == []
+
+
+def test_rate_limit_errors_are_recognized():
+    assert is_rate_limit_error(RateLimited())
+    assert is_rate_limit_error(urllib.error.HTTPError("http://x", 429, "Too Many Requests",
+                                                      None, None))
+    assert is_rate_limit_error(Exception("Rate limit exceeded"))
+    assert not is_rate_limit_error(urllib.error.HTTPError("http://x", 400, "Bad Request",
+                                                          None, None))
+
+
+@pytest.fixture
+def server():
+    server = start_mock_server(latency_ms=20, per_text_ms=0, max_concurrent=2, dimensions=8,
+                               max_input_tokens=50)
+    yield server
+    server.shutdown()
+
+
+def test_mock_server_round_trip_under_rate_limiting(server):
+    url = f"http://127.0.0.1:{server.server_port}"
+    texts = [f"guideline chunk {i}" for i in range(60)]
+    embedder = BatchedEmbeddings(MockEmbeddingClient(url), batch_size=5, max_concurrency=6,
+                                 max_retries=50, backoff_seconds=0.005)
+    assert embedder.embed_documents(texts) == [fake_embedding(text, 8) for text in texts]
+    assert server.rejected > 0 and embedder.retries == server.rejected
+    assert server.requests == 12
+
+
+def test_mock_server_rejects_oversized_inputs_without_retry(server):
+    url = f"http://127.0.0.1:{server.server_port}"
+    embedder = BatchedEmbeddings(MockEmbeddingClient(url, truncate_input_tokens=None))
+    with pytest.raises(urllib.error.HTTPError) as error:
+        embedder.embed_documents(["word " * 60])
+    assert error.value.code == 400 and embedder.retries == 0
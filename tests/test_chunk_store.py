@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+from chunk_store import ChunkTextStore, is_stored_chunk
+
+PAGES = ["First page of the guideline. " * 20, "Second page, ischaemia and ulcers. " * 20]
+
+
+def fill(store):
+    for page, text in enumerate(PAGES):
+        store.put_page("g.pdf", page, text)
+
+
+def test_chunks_read_back_from_their_page(tmp_path):
+    store = ChunkTextStore(str(tmp_path))
+    fill(store)
+    metadata = {"source_file": "g.pdf", "page": 1, "start_index": 35, "text_chars": 40}
+    assert store.chunk_text(metadata) == PAGES[1][35:75]
+
+
+def test_text_survives_reopening(tmp_path):
+    fill(ChunkTextStore(str(tmp_path)))
+    store = ChunkTextStore(str(tmp_path))
+    assert [store.page_text("g.pdf", page) for page in range(2)] == PAGES
+
+
+def test_hydrate_fills_only_stored_chunks(tmp_path):
+    store = ChunkTextStore(str(tmp_path))
+    fill(store)
+    stored = Document(page_content="", metadata={"source_file": "g.pdf", "page": 0,
+                                                 "start_index": 0, "text_chars": 10})
+    inline = Document(page_content="kept", metadata={"source_file": "g.pdf", "page": 0})
+    assert is_stored_chunk(stored) and not is_stored_chunk(inline)
+    store.hydrate([stored, inline])
+    assert stored.page_content == PAGES[0][:10]
+    assert inline.page_content == "kept"
+
+
+def test_remove_forgets_a_file(tmp_path):
+    store = ChunkTextStore(str(tmp_path))
+    fill(store)
+    store.remove("g.pdf")
+    assert not list(tmp_path.glob("*.pages"))
@@ -0,0 +1,158 @@
+import threading
+import time
+
+import pytest
+
+from collection_registry import CollectionRegistry, directory_size_mb
+
+
+class FakeIndex:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+
+def make_registry(tmp_path, names=("a", "b", "c"), load_delay=0.0, **kwargs):
+    collections = {}
+    for name in names:
+        directory = tmp_path / name
+        directory.mkdir()
+        (directory / "index.bin").write_bytes(b"x" * 1024 * 1024)  # ~1 MB each
+        collections[name] = {"pdf_directory": str(tmp_path / "pdfs"),
+                             "vector_db_directory": str(directory)}
+    loads = []
+    closed = []
+
+    def load(collection):
+        loads.append(collection.name)
+        time.sleep(load_delay)
+        return FakeIndex(collection.name), f"store-{collection.name}"
+
+    def close(index):
+        index.closed = True
+        closed.append(index.name)
+
+    registry = CollectionRegistry(collections, load, close=close, **kwargs)
+    return registry, loads, closed
+
+
+def test_directory_size_mb(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "f").write_bytes(b"x" * 2 * 1024 * 1024)
+    assert directory_size_mb(tmp_path) == pytest.approx(2.0)
+
+
+def test_concurrent_first_use_loads_once(tmp_path):
+    registry, loads, _ = make_registry(tmp_path, load_delay=0.05)
+    seen = []
+
+    def ask():
+        with registry.use("a") as (index, store):
+            seen.append((index, store))
+
+    threads = [threading.Thread(target=ask) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == ["a"]
+    assert len({id(index) for index, _ in seen}) == 1
+    assert all(store == "store-a" for _, store in seen)
+
+
+def test_unknown_collection(tmp_path):
+    registry, _, _ = make_registry(tmp_path)
+    with pytest.raises(KeyError):
+        with registry.use("missing"):
+            pass
+
+
+def test_lru_eviction_closes_least_recently_used(tmp_path):
+    registry, _, closed = make_registry(tmp_path, max_loaded=2)
+    for name in ("a", "b", "a", "c"):
+        with registry.use(name):
+            pass
+    assert list(registry.resident) == ["a", "c"]
+    assert closed == ["b"]
+    assert not registry.is_loaded("b")
+
+
+def test_memory_cap(tmp_path):
+    registry, _, closed = make_registry(tmp_path, memory_cap_mb=1.5)
+    for name in ("a", "b"):
+        with registry.use(name):
+            pass
+    assert list(registry.resident) == ["b"]
+    assert closed == ["a"]
+
+
+def test_pinned_collection_is_never_evicted(tmp_path):
+    registry, _, closed = make_registry(tmp_path, max_loaded=1, pinned=["a"])
+    for name in ("a", "b", "c"):
+        with registry.use(name):
+            pass
+    assert "a" in registry.resident
+    assert "a" not in closed
+
+
+def test_index_in_use_is_closed_by_its_last_user(tmp_path):
+    registry, _, closed = make_registry(tmp_path, max_loaded=1)
+    with registry.use("a") as (index, _):
+        with registry.use("b"):
+            pass
+        assert not registry.is_loaded("a")
+        assert not index.closed  # Evicted while in use: still usable
+    assert index.closed
+    assert closed == ["a"]
+
+
+def test_set_loaded_registers_an_index(tmp_path):
+    registry, loads, _ = make_registry(tmp_path)
+    index = FakeIndex("a")
+    registry.set_loaded("a", index, "store")
+    with registry.use("a") as (used, store):
+        assert used is index and store == "store"
+    assert loads == []
+
+
+def test_loader_may_read_the_registry(tmp_path):
+    """The loader runs outside the registry lock (a re-entrant call used to deadlock)"""
+    registry, _, _ = make_registry(tmp_path)
+    original_load = registry.load
+
+    def load(collection):
+        registry.status_text()
+        registry.is_loaded("b")
+        return original_load(collection)
+
+    registry.load = load
+    done = threading.Event()
+
+    def ask():
+        with registry.use("a"):
+            done.set()
+
+    threading.Thread(target=ask, daemon=True).start()
+    assert done.wait(5), "use() deadlocked"
+
+
+def test_concurrent_use_and_eviction_never_yields_an_unloaded_index(tmp_path):
+    registry, _, _ = make_registry(tmp_path, max_loaded=1)
+    errors = []
+
+    def ask(name):
+        try:
+            for _ in range(50):
+                with registry.use(name) as (index, store):
+                    assert index is not None and store is not None
+                    assert not index.closed
+        except Exception as e:  # Reported from the main thread
+            errors.append(e)
+
+    threads = [threading.Thread(target=ask, args=(name,)) for name in "abcabc"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert registry.users == {} and registry.retired == {}
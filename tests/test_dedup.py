@@ -0,0 +1,81 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+from dedup import MinHasher, NearDuplicateFilter, deduplicate_chunks
+
+WORDS = ("patients with peripheral artery disease should receive antiplatelet therapy "
+         "statin therapy and supervised exercise and those with chronic limb threatening "
+         "ischemia should be evaluated for revascularization by a vascular specialist "
+         "within two weeks of presentation to reduce the risk of amputation").split()
+
+
+def text(replace=0):
+    """The reference text with its last `replace` words changed"""
+    words = list(WORDS)
+    for i in range(replace):
+        words[-1 - i] = f"changed{i}"
+    return " ".join(words)
+
+
+def doc(content, source_file="a.pdf", page=0):
+    return Document(page_content=content, metadata={"source_file": source_file, "page": page})
+
+
+def estimate(a, b):
+    hasher = MinHasher()
+    return float(np.mean(hasher.signature(a) == hasher.signature(b)))
+
+
+def shingle_jaccard(a, b):
+    def shingles(words):
+        return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+    sa, sb = shingles(a.split()), shingles(b.split())
+    return len(sa & sb) / len(sa | sb)
+
+
+def test_minhash_estimates_shingle_jaccard():
+    for replace in (1, 4, 10):
+        assert abs(estimate(text(), text(replace)) - shingle_jaccard(text(), text(replace))) < 0.1
+    assert estimate(text(), text()) == 1.0
+    assert estimate(text(), "an unrelated sentence about wound care dressings") < 0.1
+
+
+def test_threshold_boundary_is_inclusive():
+    score = estimate(text(), text(1))
+    at = NearDuplicateFilter(threshold=score)
+    assert at.add(doc(text())) and not at.add(doc(text(1)))
+    above = NearDuplicateFilter(threshold=score + 1.0 / 128)
+    assert above.add(doc(text())) and above.add(doc(text(1)))
+
+
+def test_distinct_chunks_are_kept():
+    kept, stats = deduplicate_chunks([doc(text()), doc("Compression therapy for venous ulcers.")])
+    assert len(kept) == 2 and stats["removed_chunks"] == 0
+
+
+def test_provenance_is_merged_into_the_first_occurrence():
+    chunks = [doc(text(), "a.pdf", 0), doc(text(1), "b.pdf", 3), doc(text(), "c.pdf", 7),
+              doc(text(), "a.pdf", 0)]
+    kept, stats = deduplicate_chunks(chunks)
+    assert kept == [chunks[0]]
+    assert kept[0].metadata["duplicate_sources"] == "b.pdf p.3; c.pdf p.7"
+    assert kept[0].metadata["duplicate_count"] == 3
+    assert stats["removed_chunks"] == 3 and stats["chunk_reduction"] == 0.75
+
+
+def test_streaming_filter_reports_each_change_once():
+    dedup_filter = NearDuplicateFilter(keep_documents=False)
+    dedup_filter.add(doc(text(), "a.pdf", 0), key="a0")
+    dedup_filter.add(doc("Compression therapy for venous ulcers.", "a.pdf", 1), key="a1")
+    dedup_filter.add(doc(text(), "b.pdf", 2), key="b2")
+    assert dedup_filter.pop_merged_metadata() == [
+        ("a0", {"duplicate_count": 1, "duplicate_sources": "b.pdf p.2"})]
+    assert dedup_filter.pop_merged_metadata() == []
+    dedup_filter.add(doc(text(), "c.pdf", 5), key="c5")
+    assert dedup_filter.pop_merged_metadata() == [
+        ("a0", {"duplicate_count": 2, "duplicate_sources": "b.pdf p.2; c.pdf p.5"})]
+    assert dedup_filter.kept == [] and dedup_filter.keys == ["a0", "a1"]
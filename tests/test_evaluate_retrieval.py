@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("local_qabot")
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from evaluate_retrieval import evaluate_configuration
+
+VECTORS = {
+    "question": [1.0, 0.0, 0.0],
+    "Compression for venous ulcers.": [1.0, 0.0, 0.0],      # Best match, not relevant
+    "Urgent referral for limb ischaemia.": [0.8, 0.6, 0.0],  # Second, relevant
+    "Foot care education.": [0.0, 0.0, 1.0],
+}
+
+
+class FixedEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [VECTORS[text] for text in texts]
+
+    def embed_query(self, text):
+        return VECTORS[text]
+
+
+def test_mrr_comes_from_the_same_ranking_as_recall():
+    pages = [Document(page_content=text, metadata={"source_file": "g.pdf", "page": page})
+             for page, text in enumerate(list(VECTORS)[1:])]
+    gold = [("question", {("g.pdf", 1)})]
+    rows = evaluate_configuration(pages, FixedEmbeddings(), 1000, 0, [1, 2], gold, dedup=False)
+    by_k = {row["k"]: row for row in rows}
+    assert (by_k[1]["recall@k"], by_k[1]["mrr@k"]) == (0.0, 0.0)
+    assert (by_k[2]["recall@k"], by_k[2]["mrr@k"]) == (1.0, 0.5)
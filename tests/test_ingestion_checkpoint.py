@@ -0,0 +1,161 @@
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("langchain_community")
+pymupdf = pytest.importorskip("pymupdf")
+
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ingestion import IngestCheckpoint, ingest_pdfs
+
+SETTINGS = {"embedding_model": "test", "chunk_size": 200, "chunk_overlap": 0}
+
+
+DISCLOSURE = [f"Disclosure {line}: the authors report grants from the foundation."
+              for line in range(20)]
+
+
+def make_pdf(path, pages, first_page=None):
+    doc = pymupdf.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        lines = [f"{path.stem} page {page_number} line {line}: guideline text." for line in range(20)]
+        if page_number == 0 and first_page is not None:
+            lines = first_page
+        for line, text in enumerate(lines):
+            page.insert_text((40, 40 + 14 * line), text)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+        self.provenance = {}
+        self.upserts = 0
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.upserts += 1
+        for key, document, metadata in zip(ids, documents, metadatas):
+            self.rows[key] = (document, metadata["source_file"], metadata["page"])
+
+    def update(self, ids, metadatas):
+        for key, metadata in zip(ids, metadatas):
+            assert key in self.rows, "provenance written before its chunk"
+            self.provenance[key] = metadata["duplicate_sources"]
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self._collection = FakeCollection()
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text))]
+
+
+def splitter():
+    return RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=0, add_start_index=True)
+
+
+def ingest(pdf_files, vectordb, checkpoint, stop=None, progress=None, dedup_threshold=None):
+    return ingest_pdfs(pdf_files, vectordb, FakeEmbeddings(), splitter(), checkpoint,
+                       batch_size=8, queue_batches=1, progress=progress, stop=stop,
+                       dedup_threshold=dedup_threshold)
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = IngestCheckpoint(path, SETTINGS)
+    checkpoint.completed_files = {"a.pdf": "1:2"}
+    checkpoint.partial_file, checkpoint.partial_pages = "b.pdf", 3
+    checkpoint.save()
+
+    loaded = IngestCheckpoint.load(path, json.loads(json.dumps(SETTINGS)))
+    assert loaded.completed_files == {"a.pdf": "1:2"}
+    assert (loaded.partial_file, loaded.partial_pages, loaded.complete) == ("b.pdf", 3, False)
+    assert loaded.pages_to_skip(str(tmp_path / "b.pdf")) == 3
+    assert loaded.pages_to_skip(str(tmp_path / "a.pdf")) == 0
+
+
+def test_mismatched_settings_are_stale_not_missing(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    assert not IngestCheckpoint.stale(path, SETTINGS)
+    IngestCheckpoint(path, SETTINGS).save()
+    assert not IngestCheckpoint.stale(path, SETTINGS)
+    other = {**SETTINGS, "chunk_size": 500}
+    assert IngestCheckpoint.load(path, other) is None
+    assert IngestCheckpoint.stale(path, other)
+    (tmp_path / "checkpoint.json").write_text("{not json")
+    assert IngestCheckpoint.stale(path, SETTINGS)
+
+
+def test_changed_file_is_not_done(tmp_path):
+    pdf = make_pdf(tmp_path / "a.pdf", 1)
+    checkpoint = IngestCheckpoint(str(tmp_path / "checkpoint.json"), SETTINGS)
+    ingest([pdf], FakeVectorStore(), checkpoint)
+    assert checkpoint.complete and checkpoint.is_done(pdf)
+    make_pdf(tmp_path / "a.pdf", 2)
+    assert not checkpoint.is_done(pdf)
+
+
+def test_interrupted_build_resumes_to_the_same_index(tmp_path):
+    pdfs = [make_pdf(tmp_path / f"{name}.pdf", 4) for name in ("a", "b", "c")]
+    full = FakeVectorStore()
+    ingest(pdfs, full, IngestCheckpoint(str(tmp_path / "full.json"), SETTINGS))
+
+    path = str(tmp_path / "checkpoint.json")
+    partial = FakeVectorStore()
+    stop = threading.Event()
+
+    def stop_after_two_batches(stats):
+        if partial._collection.upserts >= 2:
+            stop.set()
+
+    stats = ingest(pdfs, partial, IngestCheckpoint(path, SETTINGS), stop=stop,
+                   progress=stop_after_two_batches)
+    assert stats.get("stopped")
+    interrupted = IngestCheckpoint.load(path, SETTINGS)
+    assert not interrupted.complete
+    written = len(partial._collection.rows)
+    assert 0 < written < len(full._collection.rows)
+
+    ingest(pdfs, partial, interrupted)
+    assert IngestCheckpoint.load(path, SETTINGS).complete
+    assert partial._collection.rows == full._collection.rows
+
+
+def test_duplicate_provenance_survives_an_interruption(tmp_path):
+    pdfs = [make_pdf(tmp_path / "a.pdf", 2, DISCLOSURE),
+            make_pdf(tmp_path / "b.pdf", 2, DISCLOSURE),
+            make_pdf(tmp_path / "c.pdf", 4)]
+    path = str(tmp_path / "checkpoint.json")
+    vectordb = FakeVectorStore()
+    stop = threading.Event()
+
+    def stop_after_b(stats):
+        if stats["files_done"] >= 2:
+            stop.set()
+
+    stats = ingest(pdfs, vectordb, IngestCheckpoint(path, SETTINGS), stop=stop,
+                   progress=stop_after_b, dedup_threshold=0.85)
+    assert stats.get("stopped")
+    rows = vectordb._collection.rows
+    disclosure_ids = {key for key, (_, source, page) in rows.items()
+                      if page == 0 and source in ("a.pdf", "b.pdf")}
+    assert {rows[key][1] for key in disclosure_ids} == {"a.pdf"}  # b's copies were merged
+    assert vectordb._collection.provenance
+    assert all(sources == "b.pdf p.0" for sources in vectordb._collection.provenance.values())
+    assert set(vectordb._collection.provenance) <= disclosure_ids
+
+    ingest(pdfs, vectordb, IngestCheckpoint.load(path, SETTINGS), dedup_threshold=0.85)
+    assert IngestCheckpoint.load(path, SETTINGS).complete
+    assert all(sources == "b.pdf p.0" for sources in vectordb._collection.provenance.values())
@@ -0,0 +1,78 @@
+import time
+
+from ollama_health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure("down")
+    assert breaker.state == CLOSED and breaker.allow_request()
+    breaker.record_failure("down")
+    assert breaker.state == OPEN and not breaker.allow_request()
+    assert breaker.last_error == "down"
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.record_success() is False
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()  # Only one trial at a time
+    breaker.cancel_trial()
+    assert breaker.allow_request()
+    assert breaker.record_success() is True
+    assert breaker.state == CLOSED
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow_request()
+
+
+def test_probe_success_keeps_answer_path_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure("generation timed out")
+    assert breaker.record_probe_success() is False
+    breaker.record_failure("generation timed out")
+    assert breaker.state == OPEN
+
+
+def test_probe_success_closes_only_as_the_half_open_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.record_probe_success() is False  # Reset timeout not reached
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+    assert breaker.allow_request()  # A real trial request is in flight
+    assert breaker.record_probe_success() is False
+    assert breaker.state == HALF_OPEN
+    breaker.cancel_trial()
+    assert breaker.record_probe_success() is True
+    assert breaker.state == CLOSED and breaker.failures == 0
+
+
+def test_monitor_probe_does_not_reset_failures(monkeypatch):
+    from ollama_health import OllamaHealthMonitor
+
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    monitor = OllamaHealthMonitor("http://localhost:11434", "llama3", breaker=breaker)
+    monkeypatch.setattr(monitor, "_get", lambda path: {"version": "0.1", "models": []})
+    breaker.record_failure("generation timed out")
+    assert monitor.probe() is True
+    breaker.record_failure("generation timed out")
+    assert breaker.state == OPEN
+    assert monitor.probe() is True
+    assert breaker.state == OPEN
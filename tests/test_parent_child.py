@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("langchain_text_splitters")
+
+from langchain_core.documents import Document
+
+from chunk_store import ChunkTextStore
+from parent_child import ParentChildSplitter, parent_documents
+
+SENTENCE = ("Patients with diabetes and a foot ulcer should be assessed for peripheral "
+            "artery disease at every visit.\n")
+
+
+def make_page(page=0, sentences=40):
+    text = "".join(f"{i}. {SENTENCE}" for i in range(sentences))
+    return Document(page_content=text, metadata={"source_file": "g.pdf", "page": page})
+
+
+def test_child_offsets_point_into_the_page_and_their_parent():
+    page = make_page()
+    children = ParentChildSplitter(parent_chars=600, child_chars=150, child_overlap=30) \
+        .split_documents([page])
+    assert len({child.metadata["parent_start"] for child in children}) > 1
+    for child in children:
+        metadata = child.metadata
+        start = metadata["start_index"]
+        assert page.page_content[start:start + len(child.page_content)] == child.page_content
+        parent_start = metadata["parent_start"]
+        parent = page.page_content[parent_start:parent_start + metadata["parent_chars"]]
+        assert parent_start <= start
+        assert start + len(child.page_content) <= parent_start + metadata["parent_chars"]
+        assert metadata["parent_chars"] <= 600
+        assert child.page_content in parent
+
+
+def test_parents_end_at_sentence_boundaries():
+    page = make_page()
+    for child in ParentChildSplitter(parent_chars=600, child_chars=150).split_documents([page]):
+        metadata = child.metadata
+        parent = page.page_content[metadata["parent_start"]:
+                                   metadata["parent_start"] + metadata["parent_chars"]]
+        assert parent.rstrip().endswith(".")
+
+
+def test_parent_documents_dedupes_in_rank_order():
+    def child(parent_start, page=0):
+        return Document(page_content="", metadata={
+            "source_file": "g.pdf", "page": page, "start_index": parent_start + 10,
+            "parent_start": parent_start, "parent_chars": 500, "text_chars": 100,
+        })
+
+    hits = [child(500), child(0), child(500), child(0, page=1), child(1000)]
+    parents = parent_documents(hits, 3)
+    assert [(p.metadata["page"], p.metadata["start_index"]) for p in parents] == \
+        [(0, 500), (0, 0), (1, 0)]
+    assert all(p.metadata["text_chars"] == 500 and p.page_content == "" for p in parents)
+    # The child hits themselves are left untouched
+    assert hits[0].metadata["start_index"] == 510
+
+
+def test_chunks_without_a_parent_pass_through():
+    plain = Document(page_content="text", metadata={"source_file": "g.pdf", "page": 0})
+    assert parent_documents([plain], 3) == [plain]
+
+
+def test_parents_hydrate_from_the_chunk_store(tmp_path):
+    page = make_page()
+    store = ChunkTextStore(str(tmp_path))
+    store.put_page("g.pdf", 0, page.page_content)
+    children = ParentChildSplitter(parent_chars=600, child_chars=150).split_documents([page])
+    stored = [Document(page_content="", metadata={**c.metadata, "text_chars": len(c.page_content)})
+              for c in children]
+    parents = store.hydrate(parent_documents(stored[::-1], 2))
+    for parent in parents:
+        start = parent.metadata["start_index"]
+        assert parent.page_content == page.page_content[start:start + parent.metadata["text_chars"]]
+        assert len(parent.page_content) > 150
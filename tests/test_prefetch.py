@@ -0,0 +1,64 @@
+import threading
+import time
+
+from prefetch import RetrievalPrefetcher
+
+
+def make_prefetcher(delay=0.0):
+    calls = []
+
+    def retrieve(query, k, *options):
+        calls.append((query, k, options))
+        time.sleep(delay)
+        return f"{query}|{k}|{options}"
+
+    return RetrievalPrefetcher(retrieve, debounce=0.05, min_chars=5), calls
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_only_the_settled_text_is_retrieved():
+    prefetcher, calls = make_prefetcher()
+    for text in ("what is", "what is the", "what is the ABI"):
+        prefetcher.submit("session", text, 3, ("vascular",))
+    assert wait_for(lambda: calls)
+    time.sleep(0.1)
+    assert calls == [("what is the ABI", 3, ("vascular",))]
+    assert prefetcher.take("What is the  ABI", 3, ("vascular",)) == "what is the ABI|3|('vascular',)"
+
+
+def test_options_are_part_of_the_key():
+    prefetcher, calls = make_prefetcher()
+    prefetcher.submit("session", "what is the ABI", 3, (0.7,))
+    assert wait_for(lambda: calls)
+    assert prefetcher.take("what is the ABI", 3, (1.0,), timeout=0.1) is None
+    assert prefetcher.take("what is the ABI", 3, (0.7,)) is not None
+
+
+def test_take_waits_for_a_running_retrieval():
+    prefetcher, calls = make_prefetcher(delay=0.2)
+    prefetcher.submit("session", "what is the ABI", 3)
+    assert wait_for(lambda: prefetcher.inflight)
+    assert prefetcher.take("what is the ABI", 3, timeout=2.0) is not None
+    assert len(calls) == 1
+
+
+def test_clear_discards_results_of_retrievals_in_flight():
+    prefetcher, calls = make_prefetcher(delay=0.2)
+    prefetcher.submit("session", "what is the ABI", 3)
+    assert wait_for(lambda: prefetcher.inflight)
+    prefetcher.clear()
+    assert wait_for(lambda: not prefetcher.inflight)
+    assert prefetcher.take("what is the ABI", 3, timeout=0.1) is None
+
+
+def test_short_text_is_ignored():
+    prefetcher, calls = make_prefetcher()
+    prefetcher.submit("session", "abi", 3)
+    time.sleep(0.1)
+    assert calls == [] and prefetcher.thread is None
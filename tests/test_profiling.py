@@ -0,0 +1,80 @@
+import cProfile
+import threading
+
+import pytest
+
+import profiling
+
+
+@pytest.fixture
+def cprofile_mode(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Profiles go to ./logs/profiles
+    monkeypatch.setattr(profiling, "_mode", "cprofile")
+    return tmp_path / "logs" / "profiles"
+
+
+def run_request():
+    """A request whose work continues on a bound thread, like the Ollama stream"""
+    results = []
+
+    def worker():
+        results.append(sum(range(1000)))
+
+    with profiling.profile("answer") as session:
+        thread = threading.Thread(target=profiling.bind_thread(worker))
+        thread.start()
+        thread.join()
+    return session, results
+
+
+def test_bound_thread_is_profiled_with_the_request(cprofile_mode):
+    session, results = run_request()
+    assert results == [499500]
+    assert len(session.profiles) == 2
+    assert list(cprofile_mode.glob("*.prof"))
+
+
+class SingleProfiler(cProfile.Profile):
+    """cProfile as on Python 3.12+: one active profiler per process"""
+    active = 0
+
+    def enable(self, *args, **kwargs):
+        if SingleProfiler.active:
+            raise ValueError("Another profiling tool is already active")
+        SingleProfiler.active += 1
+        self.enabled = True
+        super().enable(*args, **kwargs)
+
+    def disable(self):
+        if getattr(self, "enabled", False):  # pstats disables again
+            SingleProfiler.active -= 1
+            self.enabled = False
+        super().disable()
+
+
+def test_bound_thread_runs_when_its_profiler_cannot_start(cprofile_mode, monkeypatch):
+    monkeypatch.setattr(profiling.cProfile, "Profile", SingleProfiler)
+    session, results = run_request()
+    assert results == [499500]
+    assert len(session.profiles) == 1
+    assert SingleProfiler.active == 0
+
+
+def test_cprofile_falls_back_to_sampling_without_per_thread_profilers(cprofile_mode,
+                                                                      monkeypatch):
+    monkeypatch.setattr(profiling, "CPROFILE_PER_THREAD", False)
+    session, results = run_request()
+    assert results == [499500]
+    assert session.mode == "sample"
+    assert list(cprofile_mode.glob("*.collapsed"))
+
+
+def test_profiled_generator_survives_profiler_conflicts(cprofile_mode, monkeypatch):
+    monkeypatch.setattr(profiling.cProfile, "Profile", SingleProfiler)
+    blocker = SingleProfiler()
+    blocker.enable()  # Held by someone else for the whole request
+    try:
+        gen = profiling.profile_generator((n for n in [1, 2, 3]), "answer", "r1")
+        assert list(gen) == [1, 2, 3]
+    finally:
+        blocker.disable()
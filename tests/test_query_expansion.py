@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+from query_expansion import (
+    MultiQuerySearcher,
+    expand_abbreviations,
+    reciprocal_rank_fusion,
+    rule_based_variants,
+    swap_spelling,
+)
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return [float(len(text))]
+
+
+def doc(name):
+    return Document(page_content=name, metadata={"source_file": "g.pdf", "page": 0})
+
+
+def test_abbreviations_expand_both_ways():
+    assert expand_abbreviations("ABI in PAD") == \
+        "ankle-brachial index (ABI) in peripheral artery disease (PAD)"
+    assert expand_abbreviations("peripheral artery disease") == "peripheral artery disease (PAD)"
+
+
+def test_spelling_swaps_round_trip():
+    assert swap_spelling("Critical limb ischemia") == "Critical limb ischaemia"
+    assert swap_spelling(swap_spelling("ischaemic oedema")) == "ischaemic oedema"
+
+
+def test_variants_are_distinct_and_exclude_the_query():
+    variants = rule_based_variants("Should PAD be referred urgently?", max_variants=3)
+    assert variants and len(variants) == len(set(variants)) <= 3
+    assert "Should PAD be referred urgently?" not in variants
+
+
+def test_rrf_prefers_documents_ranked_by_several_queries():
+    a, b, c = doc("a"), doc("b"), doc("c")
+    fused = reciprocal_rank_fusion([[a, b], [c, b], [b]], k=2)
+    assert [d.page_content for d in fused] == ["b", "a"]
+
+
+def test_query_and_variants_share_one_embedding_batch():
+    searcher = MultiQuerySearcher(budget_seconds=1.0)
+    embeddings = FakeEmbeddings()
+    query = "How is PAD examined in DM?"
+    docs, query_vector, stats = searcher.search(
+        query, embeddings, lambda vector, n: [doc(str(vector[0]))], k=3)
+    assert len(embeddings.calls) == 1 and embeddings.calls[0][0] == query
+    assert query_vector == [float(len(query))]
+    assert stats["fused"] == len(stats["variants"]) > 0
+
+
+def test_slow_rewrites_do_not_break_the_budget_under_load():
+    release = threading.Event()
+
+    def slow_rewrite(query):
+        release.wait(5)
+        return "rewritten"
+
+    searcher = MultiQuerySearcher(budget_seconds=0.2, rewrite=slow_rewrite)
+    latencies = []
+
+    def ask():
+        start = time.monotonic()
+        searcher.search("What is the ABI threshold?", FakeEmbeddings(),
+                        lambda vector, n: [doc("x")], k=3)
+        latencies.append(time.monotonic() - start)
+
+    threads = [threading.Thread(target=ask) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+    assert max(latencies) < 0.6
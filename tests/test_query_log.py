@@ -0,0 +1,18 @@
+from query_log import QueryLog
+
+
+def test_hot_questions_are_counted_per_cache_key(tmp_path):
+    log = QueryLog(str(tmp_path / "queries.jsonl"))
+    for _ in range(3):
+        log.log("What is the ABI?", 3, 0.1, False, mmr_lambda=0.5, collection="vascular")
+    log.log("what is the  ABI?", 5, 0.1, False, mmr_lambda=0.5, collection="vascular")
+    log.log("What is the ABI?", 3, 0.1, True, mmr_lambda=1.0, collection="vascular")
+    log.log("What is the ABI?", 3, 0.1, True, mmr_lambda=1.0, collection="vascular")
+    log.log("Older record", 3, 0.1, False)
+    log.flush()
+    assert log.hot_questions(limit=10) == [
+        ("What is the ABI?", 3, 0.5, "vascular"),
+        ("What is the ABI?", 3, 1.0, "vascular"),
+        ("what is the  ABI?", 5, 0.5, "vascular"),
+        ("Older record", 3, None, None),
+    ]
@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+import resources
+from resources import GovernedEmbeddings, ThreadGovernor
+
+
+class CountingEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(t))] for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text))]
+
+
+@pytest.fixture
+def thread_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(resources, "_set_native_threads", calls.append)
+    return calls
+
+
+def test_budget_changes_only_when_an_ingestion_run_starts_or_ends(thread_calls):
+    governor = ThreadGovernor(query_threads=2, ingest_threads=8)
+    query = GovernedEmbeddings(CountingEmbeddings(), governor)
+    ingest = GovernedEmbeddings(CountingEmbeddings(), governor)
+
+    query.embed_query("before")
+    assert thread_calls == [2]
+
+    with governor.ingesting():
+        for _ in range(3):
+            ingest.embed_documents(["chunk one", "chunk two"])
+            query.embed_query("asked during ingestion")
+    assert thread_calls == [2, 8, 2]
+
+    query.embed_query("after")
+    assert thread_calls == [2, 8, 2]
+
+
+def test_overlapping_ingestion_runs_keep_the_ingest_budget(thread_calls):
+    governor = ThreadGovernor(query_threads=2, ingest_threads=8)
+    first_started = threading.Event()
+    second_done = threading.Event()
+
+    def second_run():
+        first_started.wait()
+        with governor.ingesting():
+            pass
+        second_done.set()
+
+    worker = threading.Thread(target=second_run)
+    worker.start()
+    with governor.ingesting():
+        first_started.set()
+        second_done.wait()
+        assert thread_calls == [8]
+    worker.join()
+    assert thread_calls == [8, 2]
+
+
+def test_configure_reapplies_on_next_call(thread_calls):
+    governor = ThreadGovernor(query_threads=2, ingest_threads=8)
+    embeddings = GovernedEmbeddings(CountingEmbeddings(), governor)
+    embeddings.embed_query("q")
+    governor.configure(query_threads=3, ingest_threads=8)
+    embeddings.embed_query("q")
+    assert thread_calls == [2, 3]
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+pytest.importorskip("langchain_chroma")
+
+from langchain_core.embeddings import Embeddings
+
+from sharding import ShardedIndex
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0, 0.5]
+
+
+def add(index, source_file, texts):
+    index.shard(source_file).add_texts(texts, metadatas=[{"source_file": source_file}] * len(texts))
+
+
+def test_search_merges_shards_by_distance(tmp_path):
+    index = ShardedIndex(str(tmp_path), FakeEmbeddings())
+    add(index, "a.pdf", ["x" * 10, "x" * 50])
+    add(index, "b.pdf", ["x" * 11, "x" * 90])
+    hits = index.similarity_search_by_vector([10.0, 1.0, 0.5], k=2)
+    assert [doc.metadata["source_file"] for doc in hits] == ["a.pdf", "b.pdf"]
+    docs, vectors, distances = index.query_candidates([10.0, 1.0, 0.5], 3)
+    assert len(docs) == 3 and vectors.shape == (3, 3) and distances == sorted(distances)
+    assert index.count() == 4
+
+
+def test_searches_survive_concurrent_shard_changes(tmp_path):
+    index = ShardedIndex(str(tmp_path), FakeEmbeddings())
+    add(index, "base.pdf", ["x" * 10])
+    stop = threading.Event()
+    errors = []
+
+    def churn():
+        for i in range(15):
+            add(index, f"f{i}.pdf", ["x" * i])
+            index.reset_shard(f"f{i}.pdf")
+            index.drop_shard(f"f{i}.pdf")
+        stop.set()
+
+    def search():
+        try:
+            while not stop.is_set():
+                index.count()
+                index.query_candidates([10.0, 1.0, 0.5], 2)
+        except RuntimeError as e:  # "dictionary changed size during iteration"
+            errors.append(e)
+        except Exception:
+            pass  # A shard dropped mid-query may fail at the Chroma level
+
+    threads = [threading.Thread(target=churn)] + [threading.Thread(target=search) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not [e for e in errors if "changed size" in str(e)]
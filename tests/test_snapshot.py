@@ -0,0 +1,148 @@
+import struct
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain_chroma")
+
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from snapshot import (
+    MAGIC,
+    SnapshotError,
+    check_snapshot,
+    export_snapshot,
+    import_snapshot,
+    pdf_manifest,
+    read_snapshot,
+)
+
+MODEL = "test-model"
+SETTINGS = {"embedding_model": MODEL, "chunk_size": 1000, "chunk_overlap": 200}
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0, 0.5]
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    directory = tmp_path / "pdfs"
+    directory.mkdir()
+    (directory / "a.pdf").write_bytes(b"%PDF a")
+    (directory / "b.pdf").write_bytes(b"%PDF b")
+    return directory
+
+
+@pytest.fixture
+def snapshot_path(tmp_path, pdfs):
+    vectordb = Chroma(persist_directory=str(tmp_path / "source"),
+                      embedding_function=FakeEmbeddings())
+    vectordb.add_texts(["first chunk", "second, longer chunk"], ids=["1", "2"],
+                       metadatas=[{"source_file": "a.pdf"}, {"source_file": "b.pdf"}])
+    path = str(tmp_path / "index.qabot")
+    export_snapshot(vectordb, path, MODEL, pdf_manifest(str(pdfs)),
+                    extra={"chunk_size": 1000, "chunk_overlap": 200, "ingest_settings": SETTINGS})
+    return path
+
+
+def test_round_trip(tmp_path, pdfs, snapshot_path):
+    vectordb, header, uncovered = import_snapshot(
+        snapshot_path, str(tmp_path / "target"), FakeEmbeddings(), MODEL,
+        manifest=pdf_manifest(str(pdfs)), settings=SETTINGS)
+    assert header["count"] == 2 and uncovered == []
+    data = vectordb._collection.get(ids=["1", "2"], include=["documents", "embeddings",
+                                                             "metadatas"])
+    assert list(data["documents"]) == ["first chunk", "second, longer chunk"]
+    assert [list(v) for v in data["embeddings"]] == [[11.0, 1.0, 0.5], [20.0, 1.0, 0.5]]
+    assert data["metadatas"][1]["source_file"] == "b.pdf"
+
+
+def corrupt(path, offset_from_end, replacement=None):
+    data = bytearray(open(path, "rb").read())
+    if replacement is None:
+        del data[len(data) - offset_from_end:]  # Truncate
+    else:
+        data[-offset_from_end] ^= replacement
+    open(path, "wb").write(bytes(data))
+
+
+def test_corrupt_payload_is_refused(snapshot_path):
+    corrupt(snapshot_path, 10, 0xFF)
+    with pytest.raises(SnapshotError, match="checksum"):
+        read_snapshot(snapshot_path)
+
+
+def test_truncated_file_is_refused(snapshot_path):
+    corrupt(snapshot_path, 10)
+    with pytest.raises(SnapshotError, match="checksum"):
+        read_snapshot(snapshot_path)
+
+
+def test_other_format_version_is_refused(snapshot_path):
+    data = bytearray(open(snapshot_path, "rb").read())
+    data[len(MAGIC):len(MAGIC) + 2] = struct.pack("<H", 99)
+    open(snapshot_path, "wb").write(bytes(data))
+    with pytest.raises(SnapshotError, match="version 99"):
+        read_snapshot(snapshot_path)
+
+
+def test_other_embedding_model_is_refused(snapshot_path):
+    with pytest.raises(SnapshotError, match="embedding model"):
+        read_snapshot(snapshot_path, expected_model="other-model")
+
+
+def test_other_ingest_settings_are_refused(snapshot_path, tmp_path, pdfs):
+    with pytest.raises(SnapshotError, match="chunk_size"):
+        import_snapshot(snapshot_path, str(tmp_path / "target"), FakeEmbeddings(), MODEL,
+                        manifest=pdf_manifest(str(pdfs)), settings={**SETTINGS, "chunk_size": 500})
+    assert not (tmp_path / "target").exists()
+
+
+def test_changed_or_missing_pdfs_are_refused(snapshot_path, pdfs):
+    header = read_snapshot(snapshot_path)[0]
+    (pdfs / "a.pdf").write_bytes(b"%PDF a, revised")
+    (pdfs / "b.pdf").unlink()
+    with pytest.raises(SnapshotError, match="a.pdf, b.pdf"):
+        check_snapshot(header, pdf_manifest(str(pdfs)), SETTINGS)
+
+
+def test_new_local_pdfs_are_reported_as_uncovered(snapshot_path, pdfs):
+    header = read_snapshot(snapshot_path)[0]
+    (pdfs / "c.pdf").write_bytes(b"%PDF c")
+    assert check_snapshot(header, pdf_manifest(str(pdfs)), SETTINGS) == ["c.pdf"]
+
+
+def test_older_snapshots_are_checked_on_chunking_only(snapshot_path, pdfs):
+    header = dict(read_snapshot(snapshot_path)[0])
+    del header["ingest_settings"]
+    assert check_snapshot(header, pdf_manifest(str(pdfs)), {**SETTINGS, "dedup": 0.9}) == []
+    with pytest.raises(SnapshotError, match="chunk_overlap"):
+        check_snapshot(header, pdf_manifest(str(pdfs)), {**SETTINGS, "chunk_overlap": 0})
+
+
+def test_import_checkpoints_the_covered_pdfs(tmp_path, pdfs):
+    local_qabot = pytest.importorskip("local_qabot")
+    from ingestion import CHECKPOINT_FILENAME, IngestCheckpoint
+
+    source = Chroma(persist_directory=str(tmp_path / "source"), embedding_function=FakeEmbeddings())
+    source.add_texts(["first chunk"], ids=["1"], metadatas=[{"source_file": "a.pdf"}])
+    path = str(tmp_path / "index.qabot")
+    export_snapshot(source, path, local_qabot.EMBEDDING_MODEL, pdf_manifest(str(pdfs)),
+                    extra={"ingest_settings": local_qabot.ingest_settings()})
+    (pdfs / "c.pdf").write_bytes(b"%PDF c")
+
+    target = tmp_path / "target"
+    vectordb, header, uncovered = local_qabot.import_index_snapshot(
+        path, str(target), str(pdfs), FakeEmbeddings())
+    assert uncovered == ["c.pdf"] and vectordb._collection.count() == 1
+    checkpoint = IngestCheckpoint.load(str(target / CHECKPOINT_FILENAME),
+                                       local_qabot.ingest_settings())
+    assert not checkpoint.complete
+    assert checkpoint.is_done(str(pdfs / "a.pdf")) and checkpoint.is_done(str(pdfs / "b.pdf"))
+    assert not checkpoint.is_done(str(pdfs / "c.pdf"))
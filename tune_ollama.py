@@ -0,0 +1,319 @@
+"""
+Ollama model auto-tuner for the Medical Guidelines QA Bot
+Benchmarks every locally installed Ollama model on prompts built from the
+gold questions (the question plus the guideline pages that answer it, in the
+app's prompt format) and measures load time, prompt-eval speed, generation
+speed, time to first token and memory. It then recommends the model,
+num_predict and num_ctx that meet the answer latency SLO, and can write them
+into local_qabot.py.
+
+The recommendation is the largest model (a proxy for answer quality) whose
+p95 time-to-first-token plus a full num_predict answer at its slowest observed
+generation speed fits within the SLO, with num_predict >= --min-num-predict.
+
+Usage:
+    python3 tune_ollama.py
+    python3 tune_ollama.py --models llama2 mistral --slo 20 --write
+    python3 tune_ollama.py --stub        # against an in-process mock_ollama_server.py
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import statistics
+import time
+import urllib.request
+
+GOLD_SET_PATH = "./gold_questions.json"
+PROBE_NUM_PREDICT = 128   # Tokens generated per benchmark request
+MIN_NUM_PREDICT = 256     # Shortest answer budget worth recommending
+MAX_NUM_PREDICT = 1024
+MIN_NUM_CTX = 2048
+
+# ============================================================================
+# OLLAMA CLIENT
+# ============================================================================
+
+class OllamaClient:
+    """Minimal Ollama REST client measuring client-side latency as well"""
+
+    def __init__(self, base_url, timeout=300):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data,
+                                         headers={"Content-Type": "application/json"})
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _get_json(self, path):
+        with self._request(path) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def installed_models(self):
+        """[(name, size in bytes)] of locally installed models"""
+        return [(m["name"], m.get("size", 0)) for m in self._get_json("/api/tags").get("models", [])]
+
+    def memory(self, model):
+        """(total MB, VRAM MB) of a loaded model, or (None, None)"""
+        for m in self._get_json("/api/ps").get("models", []):
+            if m.get("name") == model or m.get("model") == model:
+                return m.get("size", 0) / 2**20, m.get("size_vram", 0) / 2**20
+        return None, None
+
+    def generate(self, model, prompt, options, keep_alive="5m"):
+        """One streamed generation; returns Ollama's timing stats plus ttft/wall seconds"""
+        start = time.perf_counter()
+        ttft = None
+        final = {}
+        payload = {"model": model, "prompt": prompt, "stream": True,
+                   "options": options, "keep_alive": keep_alive}
+        with self._request("/api/generate", payload) as response:
+            for line in response:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if ttft is None and chunk.get("response"):
+                    ttft = time.perf_counter() - start
+                if chunk.get("done"):
+                    final = chunk
+        wall = time.perf_counter() - start
+        return {
+            "ttft": ttft if ttft is not None else wall,
+            "wall": wall,
+            "load": final.get("load_duration", 0) / 1e9,
+            "prompt_tokens": final.get("prompt_eval_count", 0),
+            "prompt_seconds": final.get("prompt_eval_duration", 0) / 1e9,
+            "gen_tokens": final.get("eval_count", 0),
+            "gen_seconds": final.get("eval_duration", 0) / 1e9,
+        }
+
+    def unload(self, model):
+        with self._request("/api/generate", {"model": model, "keep_alive": 0}) as response:
+            response.read()
+
+# ============================================================================
+# PROMPTS
+# ============================================================================
+
+def gold_prompts(prompt_template, pdf_directory, context_chars, limit=None, path=GOLD_SET_PATH):
+    """App-format prompts: each gold question with the pages that answer it as context"""
+    from ingestion import import_pymupdf
+    pymupdf = import_pymupdf()
+
+    with open(path, encoding="utf-8") as f:
+        questions = json.load(f)["questions"][:limit]
+    documents = {}
+    prompts = []
+    for item in questions:
+        pages = []
+        for source_file, page in item["relevant"]:
+            if source_file not in documents:
+                documents[source_file] = pymupdf.open(os.path.join(pdf_directory, source_file))
+            pages.append(documents[source_file][int(page)].get_text())
+        context = "\n\n".join(pages)[:context_chars]
+        prompts.append(prompt_template.format(context=context, question=item["question"]))
+    for doc in documents.values():
+        doc.close()
+    return prompts
+
+def resolve_models(requested, installed):
+    """
+    Installed tags for model names as users type them: "llama2" is listed by
+    /api/tags as "llama2:latest" (tags compared without their ":tag" part, as
+    in ollama_health.py). Unknown names are kept so the benchmark reports them.
+    """
+    resolved = []
+    for name in requested:
+        if name not in installed:
+            matches = [tag for tag in installed if tag.split(":")[0] == name.split(":")[0]]
+            if f"{name}:latest" in matches:
+                name = f"{name}:latest"
+            elif len(matches) == 1 and ":" not in name:
+                name = matches[0]
+        resolved.append(name)
+    return resolved
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def benchmark_model(client, model, prompts, num_ctx, num_predict=PROBE_NUM_PREDICT):
+    """Run every prompt through `model` (after one load/warm-up request)"""
+    options = {"num_predict": num_predict, "num_ctx": num_ctx, "temperature": 0.5}
+    warmup = client.generate(model, prompts[0], options)
+    runs = [client.generate(model, prompt, options) for prompt in prompts]
+    total_mb, vram_mb = client.memory(model)
+
+    gen_rates = [r["gen_tokens"] / r["gen_seconds"] for r in runs if r["gen_seconds"]]
+    prompt_tokens = sum(r["prompt_tokens"] for r in runs)
+    prompt_seconds = sum(r["prompt_seconds"] for r in runs)
+    ttfts = [r["ttft"] for r in runs]
+    return {
+        "model": model,
+        "load_s": warmup["load"],
+        "ttft_p50": statistics.median(ttfts),
+        "ttft_p95": percentile(ttfts, 0.95),
+        "prompt_tps": prompt_tokens / prompt_seconds if prompt_seconds else 0.0,
+        "gen_tps": statistics.median(gen_rates) if gen_rates else 0.0,
+        "gen_tps_p5": percentile(gen_rates, 0.05) if gen_rates else 0.0,
+        # The warm-up request evaluates the full prompt (nothing cached yet)
+        "max_prompt_tokens": max([warmup["prompt_tokens"]] + [r["prompt_tokens"] for r in runs]),
+        "memory_mb": total_mb,
+        "vram_mb": vram_mb,
+    }
+
+
+def recommend_settings(result, slo_seconds, min_num_predict=MIN_NUM_PREDICT,
+                       max_num_predict=MAX_NUM_PREDICT):
+    """num_predict / num_ctx for one model, and whether it meets the SLO"""
+    budget = slo_seconds - result["ttft_p95"]
+    num_predict = int(budget * result["gen_tps_p5"]) if budget > 0 else 0
+    num_predict = min(num_predict, max_num_predict)
+    needed = result["max_prompt_tokens"] + max(num_predict, min_num_predict)
+    num_ctx = max(MIN_NUM_CTX, 2 ** math.ceil(math.log2(needed)))
+    return {
+        "num_predict": num_predict,
+        "num_ctx": num_ctx,
+        "meets_slo": num_predict >= min_num_predict,
+        "full_answer_s": result["ttft_p95"] + (
+            max(num_predict, min_num_predict) / result["gen_tps_p5"]
+            if result["gen_tps_p5"] else float("inf")
+        ),
+    }
+
+
+def choose(results, sizes, slo_seconds, min_num_predict=MIN_NUM_PREDICT):
+    """Largest model meeting the SLO; otherwise the fastest one, flagged as missing it"""
+    candidates = [(r, recommend_settings(r, slo_seconds, min_num_predict)) for r in results]
+    meeting = [c for c in candidates if c[1]["meets_slo"]]
+    if meeting:
+        return max(meeting, key=lambda c: (sizes.get(c[0]["model"], 0), c[0]["gen_tps"]))
+    return max(candidates, key=lambda c: c[0]["gen_tps"]) if candidates else None
+
+
+def format_results(results, sizes, slo_seconds, min_num_predict=MIN_NUM_PREDICT):
+    header = (f"{'model':<28} {'size GB':>7} {'load s':>6} {'TTFT p50':>8} {'TTFT p95':>8} "
+              f"{'prompt t/s':>10} {'gen t/s':>7} {'mem MB':>7} {'num_predict':>11} {'SLO':>4}")
+    lines = [header, "-" * len(header)]
+    for r in results:
+        settings = recommend_settings(r, slo_seconds, min_num_predict)
+        memory = f"{r['memory_mb']:.0f}" if r["memory_mb"] is not None else "n/a"
+        lines.append(
+            f"{r['model']:<28} {sizes.get(r['model'], 0) / 2**30:>7.1f} {r['load_s']:>6.2f} "
+            f"{r['ttft_p50']:>8.2f} {r['ttft_p95']:>8.2f} {r['prompt_tps']:>10.0f} "
+            f"{r['gen_tps']:>7.1f} {memory:>7} {settings['num_predict']:>11} "
+            f"{'yes' if settings['meets_slo'] else 'no':>4}"
+        )
+    return "\n".join(lines)
+
+# ============================================================================
+# WRITE SETTINGS
+# ============================================================================
+
+def write_settings(path, values):
+    """Replace `NAME = value` assignments in a config module, keeping their comments"""
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    for name, value in values.items():
+        pattern = re.compile(rf"^{name} = [^#\n]*?(\s*#.*)?$", re.MULTILINE)
+        if not pattern.search(source):
+            raise ValueError(f"{name} not found in {path}")
+        literal = json.dumps(value) if isinstance(value, str) else repr(value)
+        source = pattern.sub(lambda m: f"{name} = {literal}{m.group(1) or ''}", source, count=1)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main():
+    import local_qabot
+
+    parser = argparse.ArgumentParser(description="Benchmark Ollama models and tune settings")
+    parser.add_argument("--models", nargs="+", help="Models to test (default: all installed)")
+    parser.add_argument("--slo", type=float, default=local_qabot.ANSWER_LATENCY_SLO_SECONDS,
+                        help="Seconds allowed for a full answer")
+    parser.add_argument("--questions", type=int, help="Use only the first N gold questions")
+    parser.add_argument("--min-num-predict", type=int, default=MIN_NUM_PREDICT)
+    parser.add_argument("--write", action="store_true",
+                        help="Write the recommended settings into local_qabot.py")
+    parser.add_argument("--stub", action="store_true",
+                        help="Benchmark the fake models of an in-process mock_ollama_server.py")
+    parser.add_argument("--keep-loaded", action="store_true",
+                        help="Do not unload each model after benchmarking it")
+    args = parser.parse_args()
+
+    base_url = local_qabot.OLLAMA_BASE_URL
+    if args.stub:
+        import mock_ollama_server
+        server = mock_ollama_server.start_mock_server()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+    client = OllamaClient(base_url)
+
+    sizes = dict(client.installed_models())
+    models = resolve_models(args.models, sizes) if args.models else sorted(sizes)
+    if not models:
+        raise SystemExit(f"No Ollama models installed at {base_url} (try: ollama pull mistral)")
+
+    # Same context volume the app sends: k chunks of CHUNK_SIZE characters
+    prompts = gold_prompts(local_qabot.PROMPT_TEMPLATE, local_qabot.PDF_DIRECTORY,
+                           context_chars=3 * local_qabot.CHUNK_SIZE, limit=args.questions)
+    print(f"Benchmarking {len(models)} model(s) on {len(prompts)} gold questions "
+          f"(num_ctx {local_qabot.OLLAMA_NUM_CTX}, {PROBE_NUM_PREDICT} tokens per answer)")
+
+    results = []
+    for model in models:
+        print(f"  {model}...", flush=True)
+        try:
+            results.append(benchmark_model(client, model, prompts, local_qabot.OLLAMA_NUM_CTX))
+        except Exception as e:
+            print(f"  {model} failed: {e}")
+        finally:
+            if not args.keep_loaded:
+                try:
+                    client.unload(model)
+                except Exception:
+                    pass
+
+    print()
+    print(format_results(results, sizes, args.slo, args.min_num_predict))
+    best = choose(results, sizes, args.slo, args.min_num_predict)
+    if best is None:
+        raise SystemExit("No model could be benchmarked")
+    result, settings = best
+
+    print()
+    if settings["meets_slo"]:
+        print(f"Recommended for a {args.slo:g}s SLO: {result['model']}")
+    else:
+        print(f"No model meets a {args.slo:g}s SLO with num_predict >= {args.min_num_predict}; "
+              f"fastest is {result['model']} (~{settings['full_answer_s']:.1f}s per full answer)")
+    num_predict = max(settings["num_predict"], args.min_num_predict)
+    values = {
+        "OLLAMA_MODEL": result["model"],
+        "OLLAMA_NUM_PREDICT": num_predict,
+        "OLLAMA_NUM_CTX": settings["num_ctx"],
+    }
+    for name, value in values.items():
+        print(f"  {name} = {json.dumps(value)}")
+
+    if args.write:
+        if args.stub:
+            print("Not writing settings recommended for stub models")
+        else:
+            write_settings(local_qabot.__file__, values)
+            print(f"Settings written to {local_qabot.__file__}")
+
+
+if __name__ == "__main__":
+    main()